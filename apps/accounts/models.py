@@ -111,6 +111,15 @@ class UserProfile(TimeStampedModel):
     seller_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     total_sales = models.PositiveIntegerField(default=0)
     total_reviews = models.PositiveIntegerField(default=0)
+    
+    # Running rating aggregates, maintained with F() deltas by review signals
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    
     response_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
     response_time_hours = models.PositiveIntegerField(default=24)
     
@@ -132,9 +141,28 @@ class UserProfile(TimeStampedModel):
     class Meta:
         db_table = 'user_profiles'
 
+    # Only ever written with atomic deltas, so full saves must not overwrite them
+    RATING_AGGREGATE_FIELDS = {
+        'seller_rating', 'total_reviews', 'rating_sum', 'rating_1_count',
+        'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count'
+    }
+
     def __str__(self):
         return f"{self.user.email} Profile"
 
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def rating_histogram(self):
+        """Review counts keyed by star rating."""
+        return {str(stars): getattr(self, f'rating_{stars}_count') for stars in range(1, 6)}
+
     @property
     def verification_level(self):
         """Calculate verification level percentage."""
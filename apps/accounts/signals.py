@@ -4,6 +4,7 @@ Signals for accounts app.
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import User, UserProfile, UserPreferences
+from apps.core.utils import bump_cache_version
 
 
 @receiver(post_save, sender=User)
@@ -24,4 +25,14 @@ def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, 'profile'):
         instance.profile.save()
     if hasattr(instance, 'preferences'):
-        instance.preferences.save()
\ No newline at end of file
+        instance.preferences.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+def bump_user_version(sender, instance, **kwargs):
+    """
+    Invalidate validators for payloads that embed the user's profile.
+    """
+    user_id = instance.pk if sender is User else instance.user_id
+    bump_cache_version(f'user:{user_id}')
@@ -15,7 +15,11 @@ from .serializers import (
     UserProfileUpdateSerializer, UserPreferencesSerializer, PasswordChangeSerializer,
     EmailVerificationSerializer, PhoneVerificationSerializer
 )
-from apps.core.utils import generate_verification_token, send_welcome_email, send_verification_email
+from apps.core.mixins import ConditionalRetrieveMixin
+from apps.core.utils import (
+    generate_verification_token, send_welcome_email, send_verification_email,
+    get_cache_versions
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -152,7 +156,7 @@ class UserLogoutView(APIView):
         return ip
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(ConditionalRetrieveMixin, generics.RetrieveUpdateAPIView):
     """
     User profile view and update.
     """
@@ -162,6 +166,16 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    def get_validators(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return None
+        
+        # Profile stats are covered by the user version
+        timestamps = [request.user.updated_at.timestamp()] + get_cache_versions(
+            f'user:{request.user.pk}'
+        )
+        return [request.user.pk] + timestamps, max(timestamps)
+
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return UserProfileUpdateSerializer
@@ -299,11 +313,8 @@ def user_dashboard_stats(request):
     reviews_received = Review.objects.filter(product__seller=user).count()
     
     # Get user's messages
-    from apps.chat.models import Conversation
-    unread_messages = Conversation.objects.filter(
-        participants=user,
-        messages__is_read=False
-    ).exclude(messages__sender=user).distinct().count()
+    from apps.chat.reads import unread_total
+    unread_messages = unread_total(user.id)
     
     stats = {
         'active_listings': active_listings,
@@ -4,6 +4,7 @@ Admin configuration for categories app.
 from django.contrib import admin
 from mptt.admin import MPTTModelAdmin
 from .models import Category, CategoryAttribute, CategoryTag, CategoryTagAssignment
+from apps.core.utils import bump_cache_version
 
 
 @admin.register(Category)
@@ -40,16 +41,19 @@ class CategoryAdmin(MPTTModelAdmin):
 
     def activate_categories(self, request, queryset):
         count = queryset.update(is_active=True)
+        bump_cache_version('categories')
         self.message_user(request, f'{count} categories have been activated.')
     activate_categories.short_description = 'Activate selected categories'
 
     def deactivate_categories(self, request, queryset):
         count = queryset.update(is_active=False)
+        bump_cache_version('categories')
         self.message_user(request, f'{count} categories have been deactivated.')
     deactivate_categories.short_description = 'Deactivate selected categories'
 
     def feature_categories(self, request, queryset):
         count = queryset.update(featured=True)
+        bump_cache_version('categories')
         self.message_user(request, f'{count} categories have been featured.')
     feature_categories.short_description = 'Feature selected categories'
 
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class CategoriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.categories'
-    verbose_name = 'Categories'
\ No newline at end of file
+    verbose_name = 'Categories'
+
+    def ready(self):
+        import apps.categories.signals
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+Compiled validators for listing attributes.
+
+A category's attributes (including those inherited from its ancestors) are
+compiled once per 'category-schemas' version into a list of coercion
+functions, so validating a listing never queries CategoryAttribute. Values are coerced to
+a normalized form (numbers, booleans, canonical choice labels, ISO dates)
+that the GIN index on Product.attributes can match with containment lookups.
+"""
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from .cache import get_category_cache, get_descendant_ids
+
+TRUE_VALUES = {'true', '1', 'yes', 'on'}
+FALSE_VALUES = {'false', '0', 'no', 'off'}
+
+_url_validator = URLValidator()
+
+
+def _coerce_text(attribute):
+    min_length, max_length = attribute['min_length'], attribute['max_length']
+
+    def coerce(value):
+        value = str(value).strip()
+        if min_length is not None and len(value) < min_length:
+            raise ValueError(f"Must be at least {min_length} characters.")
+        if max_length is not None and len(value) > max_length:
+            raise ValueError(f"Must be at most {max_length} characters.")
+        return value
+    return coerce
+
+
+def _coerce_number(attribute):
+    min_value, max_value = attribute['min_value'], attribute['max_value']
+
+    def coerce(value):
+        if isinstance(value, bool):
+            raise ValueError("Must be a number.")
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError("Must be a number.")
+        if min_value is not None and value < min_value:
+            raise ValueError(f"Must be at least {min_value:g}.")
+        if max_value is not None and value > max_value:
+            raise ValueError(f"Must be at most {max_value:g}.")
+        return int(value) if value.is_integer() else value
+    return coerce
+
+
+def _coerce_boolean(attribute):
+    def coerce(value):
+        if isinstance(value, bool):
+            return value
+        value = str(value).strip().lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        raise ValueError("Must be true or false.")
+    return coerce
+
+
+def _coerce_choice(attribute):
+    choices = {str(choice).lower(): choice for choice in attribute['choices']}
+
+    def coerce(value):
+        try:
+            return choices[str(value).strip().lower()]
+        except KeyError:
+            raise ValueError(f"'{value}' is not a valid choice.")
+    return coerce
+
+
+def _coerce_multi_choice(attribute):
+    coerce_one = _coerce_choice(attribute)
+    order = {choice: index for index, choice in enumerate(attribute['choices'])}
+
+    def coerce(value):
+        if isinstance(value, str):
+            value = [item for item in value.split(',') if item.strip()]
+        if not isinstance(value, (list, tuple)):
+            raise ValueError("Must be a list of choices.")
+        return sorted({coerce_one(item) for item in value}, key=order.get)
+    return coerce
+
+
+def _coerce_date(attribute):
+    def coerce(value):
+        try:
+            return date.fromisoformat(str(value).strip()).isoformat()
+        except ValueError:
+            raise ValueError("Must be a date in YYYY-MM-DD format.")
+    return coerce
+
+
+def _coerce_url(attribute):
+    def coerce(value):
+        value = str(value).strip()
+        try:
+            _url_validator(value)
+        except ValidationError:
+            raise ValueError("Must be a valid URL.")
+        return value
+    return coerce
+
+
+COERCERS = {
+    'text': _coerce_text,
+    'number': _coerce_number,
+    'boolean': _coerce_boolean,
+    'choice': _coerce_choice,
+    'multi_choice': _coerce_multi_choice,
+    'date': _coerce_date,
+    'url': _coerce_url,
+}
+
+
+class AttributeSchema:
+    """
+    Compiled attribute rules for one category.
+    """
+
+    def __init__(self, attributes):
+        self.fields = [
+            (attribute['slug'], attribute['is_required'], COERCERS[attribute['attribute_type']](attribute))
+            for attribute in attributes
+        ]
+
+    def clean(self, data):
+        """
+        Return data with every known attribute coerced to its normalized
+        form. Unknown keys are passed through unchanged. Raises
+        ValidationError keyed by attribute slug.
+        """
+        if not isinstance(data, dict):
+            raise ValidationError("Attributes must be an object.")
+
+        cleaned = dict(data)
+        errors = {}
+        for slug, is_required, coerce in self.fields:
+            value = data.get(slug)
+            if value is None or value == '' or value == []:
+                cleaned.pop(slug, None)
+                if is_required:
+                    errors[slug] = ["This attribute is required."]
+                continue
+            try:
+                cleaned[slug] = coerce(value)
+            except ValueError as e:
+                errors[slug] = [str(e)]
+
+        if errors:
+            raise ValidationError(errors)
+        return cleaned
+
+    def normalize(self, slug, value):
+        """Coerce a single filter value, or return it unchanged if unknown."""
+        for field_slug, is_required, coerce in self.fields:
+            if field_slug == slug:
+                return coerce(value)
+        return value
+
+
+def get_attribute_schema(category_id):
+    """
+    Compiled schema for a category, covering its own and inherited attributes.
+    Cached with the category snapshot until the 'category-schemas' version
+    changes.
+    """
+    category_cache = get_category_cache()
+    schemas = category_cache.attribute_schemas
+    if category_id not in schemas:
+        attributes = []
+        node_id = category_id
+        while node_id is not None and node_id in category_cache.rows:
+            attributes = category_cache.attributes.get(node_id, []) + attributes
+            node_id = category_cache.rows[node_id]['parent_id']
+        schemas[category_id] = AttributeSchema(attributes)
+    return schemas[category_id]
+
+
+def normalize_filter_value(category_id, slug, value):
+    """
+    Normalized forms a filter value can take across a category's subtree, or
+    across every category when category_id is None. Descendants may define
+    the same slug with different types, so each schema that knows the
+    attribute contributes its own coercion. Values for attributes no schema
+    defines are passed through unchanged; raises ValueError when every
+    schema defining the attribute rejects the value.
+    """
+    if category_id is None:
+        category_ids = list(get_category_cache().rows)
+    else:
+        category_ids = get_descendant_ids(category_id)
+
+    normalized, errors, known = [], [], False
+    for node_id in category_ids:
+        for field_slug, is_required, coerce in get_attribute_schema(node_id).fields:
+            if field_slug != slug:
+                continue
+            known = True
+            try:
+                candidate = coerce(value)
+            except ValueError as e:
+                errors.append(e)
+            else:
+                if candidate not in normalized:
+                    normalized.append(candidate)
+            break
+
+    if not known:
+        return [value]
+    if not normalized:
+        raise errors[0]
+    return normalized
+
+
+def clean_listing_attributes(category_id, data):
+    """
+    Validate and normalize a listing's attributes for its category.
+    """
+    return get_attribute_schema(category_id).clean(data or {})
@@ -0,0 +1,198 @@
+"""
+In-process cache of category summaries and nested category payloads.
+
+Everything is built from three queries (categories, attributes, tag
+assignments) and kept per process until the shared 'categories' version
+changes. A change of the 'category-counts' version only reloads product
+counts, and compiled attribute schemas are kept until the
+'category-schemas' version changes. The shared versions are re-read at
+most every CATEGORY_CACHE_CHECK_SECONDS, so serializing category data
+costs no database queries in the steady state.
+"""
+import threading
+import time
+from django.core.files.storage import default_storage
+from apps.core.utils import get_cache_versions
+from .models import Category, CategoryAttribute, CategoryTagAssignment
+
+CATEGORY_CACHE_CHECK_SECONDS = 5
+
+SUMMARY_FIELDS = [
+    'id', 'name', 'slug', 'icon', 'image', 'category_type',
+    'product_count', 'subcategory_count', 'featured'
+]
+
+ATTRIBUTE_FIELDS = [
+    'id', 'name', 'slug', 'attribute_type', 'is_required',
+    'is_filterable', 'choices', 'min_value', 'max_value',
+    'min_length', 'max_length'
+]
+
+_lock = threading.Lock()
+_state = {'versions': None, 'checked_at': 0, 'data': None}
+
+
+class CategoryCacheData:
+    """
+    Snapshot of all category data for one categories version.
+    """
+
+    def __init__(self):
+        rows = list(Category.objects.order_by('tree_id', 'lft').values(
+            'id', 'name', 'slug', 'description', 'icon', 'image', 'category_type',
+            'is_active', 'featured', 'product_count', 'level', 'parent_id', 'path'
+        ))
+        self.rows = {row['id']: row for row in rows}
+        self.children = {}
+        for row in rows:
+            self.children.setdefault(row['parent_id'], []).append(row['id'])
+
+        self.attributes = {}
+        for attribute in CategoryAttribute.objects.order_by('sort_order', 'name').values(
+            'category_id', *ATTRIBUTE_FIELDS
+        ):
+            self.attributes.setdefault(attribute.pop('category_id'), []).append(attribute)
+
+        self.tags = {}
+        for assignment in CategoryTagAssignment.objects.values(
+            'category_id', 'tag__id', 'tag__name', 'tag__slug', 'tag__color'
+        ):
+            self.tags.setdefault(assignment['category_id'], []).append({
+                'id': assignment['tag__id'],
+                'name': assignment['tag__name'],
+                'slug': assignment['tag__slug'],
+                'color': assignment['tag__color'],
+            })
+
+        self.slugs = {row['slug']: row['id'] for row in rows}
+        self.paths = {}
+        for row in rows:
+            parent_path = self.paths.get(row['parent_id'])
+            self.paths[row['id']] = f"{parent_path} > {row['name']}" if parent_path else row['name']
+
+        self.summaries = {row['id']: self._build_summary(row) for row in rows}
+        self.details = {}
+        self._descendants = {}
+        self.attribute_schemas = {}
+
+    def refresh_counts(self):
+        """Reload product counts without rebuilding the snapshot."""
+        for category_id, product_count in Category.objects.values_list('id', 'product_count'):
+            if category_id in self.rows:
+                self.rows[category_id]['product_count'] = product_count
+        self.summaries = {category_id: self._build_summary(row) for category_id, row in self.rows.items()}
+        self.details = {}
+
+    def _build_summary(self, row):
+        summary = {field: row[field] for field in SUMMARY_FIELDS if field in row}
+        summary['image'] = default_storage.url(row['image']) if row['image'] else None
+        summary['subcategory_count'] = sum(
+            1 for child_id in self.children.get(row['id'], [])
+            if self.rows[child_id]['is_active']
+        )
+        summary['full_path'] = self.paths[row['id']]
+        return summary
+
+    def get_descendant_ids(self, category_id):
+        """Ids of a category and everything below it."""
+        if category_id not in self._descendants:
+            ids = [category_id]
+            for child_id in self.children.get(category_id, []):
+                ids.extend(self.get_descendant_ids(child_id))
+            self._descendants[category_id] = ids
+        return self._descendants[category_id]
+
+    def get_detail(self, category_id):
+        """Nested category payload matching CategorySerializer."""
+        if category_id not in self.details:
+            row = self.rows[category_id]
+            summary = self.summaries[category_id]
+            self.details[category_id] = {
+                'id': row['id'],
+                'name': row['name'],
+                'slug': row['slug'],
+                'description': row['description'],
+                'icon': row['icon'],
+                'image': summary['image'],
+                'category_type': row['category_type'],
+                'is_active': row['is_active'],
+                'featured': row['featured'],
+                'product_count': row['product_count'],
+                'full_path': summary['full_path'],
+                'level': row['level'],
+                'breadcrumbs': row['path'],
+                'children': [self.get_detail(child_id) for child_id in self.children.get(category_id, [])],
+                'attributes': self.attributes.get(category_id, []),
+                'tags': self.tags.get(category_id, []),
+            }
+        return self.details[category_id]
+
+
+def get_category_cache():
+    """
+    Current category snapshot for this process.
+    """
+    now = time.monotonic()
+    if _state['data'] is not None and now - _state['checked_at'] < CATEGORY_CACHE_CHECK_SECONDS:
+        return _state['data']
+
+    versions = get_cache_versions('categories', 'category-counts', 'category-schemas')
+    with _lock:
+        data, previous = _state['data'], _state['versions']
+        if data is None or previous[0] != versions[0]:
+            _state['data'] = CategoryCacheData()
+            # Schemas only depend on attributes and the shape of the tree
+            if data is not None and previous[2] == versions[2]:
+                _state['data'].attribute_schemas = data.attribute_schemas
+        else:
+            if previous[1] != versions[1]:
+                data.refresh_counts()
+            if previous[2] != versions[2]:
+                data.attribute_schemas = {}
+        _state['versions'] = versions
+        _state['checked_at'] = now
+        return _state['data']
+
+
+def get_category_summary(category_id):
+    """
+    Precomputed summary for a category, or None if it doesn't exist.
+    """
+    return get_category_cache().summaries.get(category_id)
+
+
+def with_absolute_urls(payload, request):
+    """
+    Copy of a cached category payload with absolute image URLs, matching
+    what DRF image fields render for a request.
+    """
+    payload = dict(payload)
+    if request is not None and payload.get('image'):
+        payload['image'] = request.build_absolute_uri(payload['image'])
+    if 'children' in payload:
+        payload['children'] = [with_absolute_urls(child, request) for child in payload['children']]
+    return payload
+
+
+def get_descendant_ids(category_id):
+    """
+    Ids of a category and all of its descendants, falling back to the tree
+    for categories newer than the current snapshot.
+    """
+    category_cache = get_category_cache()
+    if category_id in category_cache.rows:
+        return category_cache.get_descendant_ids(category_id)
+    category = Category.objects.filter(id=category_id).first()
+    if category is None:
+        return []
+    return list(category.get_descendants(include_self=True).values_list('id', flat=True))
+
+
+def get_category_id_by_slug(slug):
+    """
+    Resolve a category slug without a query in the steady state.
+    """
+    category_id = get_category_cache().slugs.get(slug)
+    if category_id is None:
+        category_id = Category.objects.filter(slug=slug).values_list('id', flat=True).first()
+    return category_id
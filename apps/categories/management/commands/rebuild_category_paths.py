@@ -0,0 +1,19 @@
+"""
+Recompute materialized category paths for every tree.
+"""
+from django.core.management.base import BaseCommand
+from apps.categories.models import Category
+from apps.core.utils import bump_cache_version
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored path and slug path of all categories.'
+
+    def handle(self, *args, **options):
+        roots = 0
+        for root in Category.objects.root_nodes():
+            root.update_paths()
+            roots += 1
+        
+        bump_cache_version('categories')
+        self.stdout.write(self.style.SUCCESS(f'Paths rebuilt for {roots} category trees.'))
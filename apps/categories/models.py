@@ -3,11 +3,11 @@ Category models for Evolution Digital Market.
 """
 from django.db import models
 from mptt.models import MPTTModel, TreeForeignKey
-from apps.core.models import TimeStampedModel, SEOModel
+from apps.core.models import TimeStampedModel, SEOModel, TrackedFieldsMixin
 from django.utils.text import slugify
 
 
-class Category(MPTTModel, TimeStampedModel, SEOModel):
+class Category(TrackedFieldsMixin, MPTTModel, TimeStampedModel, SEOModel):
     """
     Hierarchical category model using MPTT.
     """
@@ -42,6 +42,10 @@ class Category(MPTTModel, TimeStampedModel, SEOModel):
     # Statistics
     product_count = models.PositiveIntegerField(default=0)
     
+    # Materialized ancestor path, maintained by update_paths()
+    path = models.JSONField(default=list, blank=True, editable=False)
+    slug_path = models.CharField(max_length=500, blank=True, db_index=True, editable=False)
+    
     class MPTTMeta:
         order_insertion_by = ['sort_order', 'name']
 
@@ -56,25 +60,53 @@ class Category(MPTTModel, TimeStampedModel, SEOModel):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        paths_changed = any(self.field_changed(name) for name in ('name', 'slug', 'parent_id'))
         super().save(*args, **kwargs)
+        if paths_changed:
+            self.update_paths()
+
+    def update_paths(self):
+        """
+        Recompute the materialized path of this category and its whole
+        subtree in one batched update.
+        """
+        paths = {self.parent_id: list(self.get_ancestors().values('name', 'slug'))}
+        nodes = list(self.get_descendants(include_self=True).only('id', 'name', 'slug', 'parent_id'))
+        for node in nodes:
+            node.path = paths[node.parent_id] + [{'name': node.name, 'slug': node.slug}]
+            node.slug_path = '/'.join(item['slug'] for item in node.path)
+            paths[node.id] = node.path
+        Category.objects.bulk_update(nodes, ['path', 'slug_path'])
+        self.path, self.slug_path = nodes[0].path, nodes[0].slug_path
 
     @property
     def full_path(self):
         """Get full category path."""
+        if self.path:
+            return ' > '.join(item['name'] for item in self.path)
         ancestors = self.get_ancestors(include_self=True)
         return ' > '.join([cat.name for cat in ancestors])
 
+    @property
+    def breadcrumbs(self):
+        """Ancestor names and slugs from the root down to this category."""
+        if self.path:
+            return self.path
+        return list(self.get_ancestors(include_self=True).values('name', 'slug'))
+
     def get_absolute_url(self):
         return f"/categories/{self.slug}/"
 
     def update_product_count(self):
         """Update product count for this category."""
         from apps.products.models import Product
-        self.product_count = Product.objects.filter(
+        product_count = Product.objects.filter(
             category=self,
             is_active=True
         ).count()
-        self.save(update_fields=['product_count'])
+        if product_count != self.product_count:
+            self.product_count = product_count
+            self.save(update_fields=['product_count'])
 
 
 class CategoryAttribute(TimeStampedModel):
@@ -3,6 +3,7 @@ Serializers for categories.
 """
 from rest_framework import serializers
 from .models import Category, CategoryAttribute, CategoryTag
+from .cache import get_category_cache, get_category_summary, with_absolute_urls
 
 
 class CategoryAttributeSerializer(serializers.ModelSerializer):
@@ -36,15 +37,23 @@ class CategorySerializer(serializers.ModelSerializer):
     tags = CategoryTagSerializer(many=True, read_only=True, source='tag_assignments.tag')
     full_path = serializers.ReadOnlyField()
     level = serializers.ReadOnlyField()
+    breadcrumbs = serializers.ReadOnlyField()
 
     class Meta:
         model = Category
         fields = [
             'id', 'name', 'slug', 'description', 'icon', 'image',
             'category_type', 'is_active', 'featured', 'product_count',
-            'full_path', 'level', 'children', 'attributes', 'tags'
+            'full_path', 'level', 'breadcrumbs', 'children', 'attributes', 'tags'
         ]
 
+    def to_representation(self, instance):
+        # Serve the nested payload from the category cache when it knows the row
+        category_cache = get_category_cache()
+        if instance.id in category_cache.rows:
+            return with_absolute_urls(category_cache.get_detail(instance.id), self.context.get('request'))
+        return super().to_representation(instance)
+
     def get_children(self, obj):
         if obj.get_children().exists():
             return CategorySerializer(obj.get_children(), many=True, context=self.context).data
@@ -65,21 +74,25 @@ class CategoryListSerializer(serializers.ModelSerializer):
         ]
 
     def get_subcategory_count(self, obj):
+        summary = get_category_summary(obj.id)
+        if summary is not None:
+            return summary['subcategory_count']
         return obj.get_children().filter(is_active=True).count()
 
 
-class CategoryTreeSerializer(serializers.ModelSerializer):
+class CategorySummaryField(serializers.Field):
     """
-    Serializer for category tree structure.
+    Read-only nested category served from the in-process category cache.
+    Use with source set to the foreign key column, e.g. source='category_id'.
     """
-    children = serializers.SerializerMethodField()
 
-    class Meta:
-        model = Category
-        fields = ['id', 'name', 'slug', 'icon', 'level', 'children']
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
 
-    def get_children(self, obj):
-        children = obj.get_children().filter(is_active=True)
-        if children.exists():
-            return CategoryTreeSerializer(children, many=True).data
-        return []
\ No newline at end of file
+    def to_representation(self, value):
+        summary = get_category_summary(value)
+        if summary is None:
+            category = Category.objects.filter(id=value).first()
+            return CategoryListSerializer(category, context=self.context).data if category else None
+        return with_absolute_urls(summary, self.context.get('request'))
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Signals for categories app.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from mptt.signals import node_moved
+from .models import Category, CategoryAttribute, CategoryTag, CategoryTagAssignment
+from apps.core.utils import bump_cache_version
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=CategoryAttribute)
+@receiver(post_delete, sender=CategoryAttribute)
+@receiver(post_save, sender=CategoryTag)
+@receiver(post_delete, sender=CategoryTag)
+@receiver(post_save, sender=CategoryTagAssignment)
+@receiver(post_delete, sender=CategoryTagAssignment)
+def bump_categories_version(sender, instance, signal, created=False, update_fields=None, **kwargs):
+    """
+    Record a change to any category data. Product counts are versioned on
+    their own under 'category-counts', so count refreshes don't rebuild
+    the category tree, and refreshes that leave the count unchanged don't
+    invalidate anything. Attribute and tree shape changes also bump
+    'category-schemas', which compiled attribute schemas depend on.
+    """
+    if sender is Category and update_fields is not None and set(update_fields) <= {'product_count'}:
+        if instance.field_changed('product_count'):
+            bump_cache_version('category-counts')
+        return
+
+    keys = ['categories']
+    if sender is CategoryAttribute or (sender is Category and (
+        created or signal is post_delete or instance.field_changed('parent_id')
+    )):
+        keys.append('category-schemas')
+    bump_cache_version(*keys)
+
+
+@receiver(node_moved, sender=Category)
+def update_moved_category_paths(sender, instance, **kwargs):
+    """
+    Rewrite the materialized paths of a subtree moved with move_to().
+    """
+    instance.update_paths()
+    bump_cache_version('categories', 'category-schemas')
@@ -0,0 +1,61 @@
+"""
+Tests for categories.
+"""
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from apps.core.utils import get_cache_versions
+from apps.products.models import Product
+from . import cache as category_cache
+from .attributes import get_attribute_schema
+from .models import Category, CategoryAttribute
+
+User = get_user_model()
+
+
+@mock.patch.object(category_cache, 'CATEGORY_CACHE_CHECK_SECONDS', 0)
+class CategoryCacheVersionTests(TestCase):
+    """
+    Product counts and attribute schemas are versioned apart from the rest
+    of the category data.
+    """
+
+    def setUp(self):
+        self.phones = Category.objects.create(name='Phones')
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+
+    def test_product_count_change_keeps_tree_version_and_snapshot(self):
+        snapshot = category_cache.get_category_cache()
+        version = get_cache_versions('categories')
+
+        Product.objects.create(
+            title='Used phone',
+            description='Works fine',
+            price='10.00',
+            category=self.phones,
+            condition='used',
+            seller=self.seller
+        )
+
+        self.assertEqual(get_cache_versions('categories'), version)
+        self.assertIs(category_cache.get_category_cache(), snapshot)
+        self.assertEqual(category_cache.get_category_summary(self.phones.id)['product_count'], 1)
+
+    def test_schemas_survive_changes_that_dont_affect_them(self):
+        schema = get_attribute_schema(self.phones.id)
+
+        self.phones.description = 'Mobile phones'
+        self.phones.save()
+        self.assertIs(get_attribute_schema(self.phones.id), schema)
+
+        CategoryAttribute.objects.create(
+            category=self.phones, name='Storage', slug='storage', attribute_type='number'
+        )
+        self.assertEqual([slug for slug, *rest in get_attribute_schema(self.phones.id).fields], ['storage'])
+
+    def test_new_subcategory_inherits_attributes(self):
+        CategoryAttribute.objects.create(
+            category=self.phones, name='Storage', slug='storage', attribute_type='number'
+        )
+        android = Category.objects.create(name='Android', parent=self.phones)
+        self.assertEqual([slug for slug, *rest in get_attribute_schema(android.id).fields], ['storage'])
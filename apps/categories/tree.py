@@ -0,0 +1,61 @@
+"""
+In-memory category tree building for Evolution Digital Market.
+"""
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from apps.core.utils import get_cache_versions
+from .models import Category
+
+CATEGORY_TREE_TIMEOUT = 60 * 60 * 24
+
+
+def build_category_tree():
+    """
+    Build the active menu tree from one query ordered by (tree_id, lft).
+
+    Rows arrive in depth-first order, so every parent is seen before its
+    children. Inactive nodes drop out together with their subtrees.
+    """
+    nodes = {}
+    roots = []
+    
+    categories = Category.objects.filter(is_active=True).order_by('tree_id', 'lft').values(
+        'id', 'name', 'slug', 'icon', 'level', 'parent_id', 'show_in_menu', 'sort_order'
+    )
+    for category in categories:
+        node = {
+            'id': str(category['id']),
+            'name': category['name'],
+            'slug': category['slug'],
+            'icon': category['icon'],
+            'level': category['level'],
+            'children': [],
+        }
+        
+        if category['parent_id'] is None:
+            if not category['show_in_menu']:
+                continue
+            roots.append((category['sort_order'], category['name'], node))
+        elif category['parent_id'] in nodes:
+            nodes[category['parent_id']]['children'].append(node)
+        else:
+            continue
+        nodes[category['id']] = node
+    
+    roots.sort(key=lambda root: (root[0], root[1]))
+    return [node for sort_order, name, node in roots]
+
+
+def get_category_tree_json():
+    """
+    Rendered JSON for the category tree, cached under the current
+    categories version so any category change serves a fresh tree.
+    """
+    version, = get_cache_versions('categories')
+    cache_key = f'category-tree:{version}'
+    
+    content = cache.get(cache_key)
+    if content is None:
+        content = JSONRenderer().render(build_category_tree())
+        cache.set(cache_key, content, CATEGORY_TREE_TIMEOUT)
+    return content
@@ -11,6 +11,7 @@ urlpatterns = [
     path('tree/', views.category_tree, name='category-tree'),
     path('featured/', views.featured_categories, name='featured-categories'),
     path('stats/', views.category_stats, name='category-stats'),
+    path('by-path/<path:slug_path>/', views.CategoryPathDetailView.as_view(), name='category-path-detail'),
     path('<slug:slug>/', views.CategoryDetailView.as_view(), name='category-detail'),
     path('<slug:category_slug>/attributes/', views.category_attributes, name='category-attributes'),
 ]
\ No newline at end of file
@@ -4,11 +4,15 @@ Views for categories.
 from rest_framework import generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import Category, CategoryAttribute, CategoryTag
+from apps.core.mixins import ConditionalRetrieveMixin
+from apps.core.utils import get_cache_versions
+from .tree import get_category_tree_json
 from .serializers import (
-    CategorySerializer, CategoryListSerializer, CategoryTreeSerializer,
+    CategorySerializer, CategoryListSerializer,
     CategoryAttributeSerializer, CategoryTagSerializer
 )
 
@@ -29,7 +33,7 @@ class CategoryListView(generics.ListAPIView):
         return Category.objects.filter(is_active=True)
 
 
-class CategoryDetailView(generics.RetrieveAPIView):
+class CategoryDetailView(ConditionalRetrieveMixin, generics.RetrieveAPIView):
     """
     Retrieve a specific category with full details.
     """
@@ -40,6 +44,28 @@ class CategoryDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return Category.objects.filter(is_active=True)
 
+    def get_validators(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        row = Category.objects.filter(
+            **{self.lookup_field: lookup},
+            is_active=True
+        ).values_list('id', 'updated_at').first()
+        if row is None:
+            return None
+        
+        # Children, attributes, tags and product counts are covered by the
+        # category change versions
+        category_id, updated_at = row
+        timestamps = [updated_at.timestamp()] + get_cache_versions('categories', 'category-counts')
+        return [category_id] + timestamps, max(timestamps)
+
+
+class CategoryPathDetailView(CategoryDetailView):
+    """
+    Retrieve a category by its slug path, e.g. electronics/phones/android.
+    """
+    lookup_field = 'slug_path'
+
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -47,14 +73,7 @@ def category_tree(request):
     """
     Get the complete category tree structure.
     """
-    root_categories = Category.objects.filter(
-        parent=None,
-        is_active=True,
-        show_in_menu=True
-    ).order_by('sort_order', 'name')
-    
-    serializer = CategoryTreeSerializer(root_categories, many=True)
-    return Response(serializer.data)
+    return HttpResponse(get_category_tree_json(), content_type='application/json')
 
 
 @api_view(['GET'])
@@ -0,0 +1,70 @@
+"""
+Coalesced updates of a conversation's last-message columns.
+
+Sending a message doesn't rewrite the conversation row. The first message
+in a window of CHAT_LAST_MESSAGE_WINDOW_SECONDS writes last_message and
+last_message_at with one narrow UPDATE, in the same transaction as the
+message insert. Later messages in the window only schedule a trailing
+flush, which copies the newest message onto the conversation when the
+window closes, so a busy conversation's row is written at most about
+twice per window.
+
+Ordering: last_message_at only moves forward. Every write is guarded by
+last_message_at < the message's created_at, so a late or repeated flush
+never replaces a newer preview with an older one. The preview can lag the
+newest message by up to one window; the messages themselves are always
+ordered by their own created_at.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+
+def activity_key(conversation_id):
+    return f'chat:last-message:{conversation_id}'
+
+
+def write_last_message(conversation_id, content, sent_at):
+    """
+    Set the last message of the conversation and its inbox entries unless
+    a newer one is already stored.
+    """
+    from .inbox import update_inbox_last_message
+    from .models import Conversation
+
+    update_inbox_last_message(conversation_id, content, sent_at)
+    return Conversation.objects.filter(
+        Q(last_message_at__isnull=True) | Q(last_message_at__lt=sent_at),
+        id=conversation_id
+    ).update(last_message=content, last_message_at=sent_at)
+
+
+def touch_conversation(conversation_id, content, sent_at):
+    """
+    Record a new message on its conversation, coalescing writes per window.
+    """
+    from .tasks import flush_last_message
+
+    window = settings.CHAT_LAST_MESSAGE_WINDOW_SECONDS
+    key = activity_key(conversation_id)
+    if cache.add(key, True, window):
+        write_last_message(conversation_id, content, sent_at)
+    elif cache.add(f'{key}:pending', True, window * 2):
+        transaction.on_commit(
+            lambda: flush_last_message.apply_async(args=[str(conversation_id)], countdown=window)
+        )
+
+
+def flush_last_message(conversation_id):
+    """
+    Copy the newest message of a conversation onto the conversation row.
+    """
+    from .models import Message
+
+    cache.delete(f'{activity_key(conversation_id)}:pending')
+    latest = Message.objects.filter(
+        conversation_id=conversation_id
+    ).order_by('-created_at').values('content', 'created_at').first()
+    if latest is not None:
+        write_last_message(conversation_id, latest['content'], latest['created_at'])
\ No newline at end of file
@@ -30,9 +30,9 @@ class MessageAdmin(admin.ModelAdmin):
     """
     list_display = [
         'id', 'conversation', 'sender', 'message_type', 'content_preview',
-        'is_read', 'created_at'
+        'created_at'
     ]
-    list_filter = ['message_type', 'is_read', 'is_edited', 'created_at']
+    list_filter = ['message_type', 'is_edited', 'created_at']
     search_fields = ['content', 'sender__email', 'conversation__title']
     readonly_fields = ['created_at', 'updated_at']
 
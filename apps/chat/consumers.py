@@ -2,25 +2,168 @@
 WebSocket consumers for real-time chat.
 """
 import json
+import uuid
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from .models import Conversation, Message
+from django.utils import timezone
+from .events import conversation_group, user_group
+from .membership import can_send, get_membership, get_memberships, is_member
+from .models import Conversation
+from .typing import TypingIndicator
+from .writebehind import claim_client_id, get_write_queue
 
 User = get_user_model()
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ConversationEventsMixin:
+    """
+    Sending and relaying conversation events, shared by the per-chat and
+    per-user consumers. Outgoing events carry their conversation_id so a
+    socket subscribed to many conversations can route them.
+    """
+
+    async def send_json(self, payload):
+        await self.send(text_data=json.dumps(payload))
+
+    async def send_chat_message(self, conversation_id, membership, data):
+        user = self.scope['user']
+        if not can_send(membership, user.id):
+            await self.send_json({
+                'type': 'error',
+                'conversation_id': conversation_id,
+                'error': 'You cannot send messages in this conversation'
+            })
+            return
+
+        content = data['content']
+        client_id = str(data.get('client_id') or uuid.uuid4())[:64]
+        message_id = str(uuid.uuid4())
+        # Provisional; message_persisted carries the stored created_at
+        created_at = timezone.now()
+
+        # A resent client id is acknowledged again but not rebroadcast
+        claimed_id = await sync_to_async(claim_client_id)(str(user.id), client_id, message_id)
+        if claimed_id == message_id:
+            await self.channel_layer.group_send(
+                conversation_group(conversation_id),
+                {
+                    'type': 'chat_message',
+                    'conversation_id': conversation_id,
+                    'message': {
+                        'id': message_id,
+                        'client_id': client_id,
+                        'content': content,
+                        'sender': {
+                            'id': str(user.id),
+                            'name': user.full_name
+                        },
+                        'created_at': created_at.isoformat(),
+                        'message_type': 'text'
+                    }
+                }
+            )
+
+        await self.send_json({
+            'type': 'message_delivered',
+            'conversation_id': conversation_id,
+            'client_id': client_id,
+            'id': claimed_id
+        })
+
+        # Persist behind the broadcast; duplicates are dropped on insert
+        get_write_queue().put({
+            'id': claimed_id,
+            'client_id': client_id,
+            'conversation_id': conversation_id,
+            'sender_id': str(user.id),
+            'content': content,
+            'reply_channel': self.channel_name,
+        })
+
+    async def send_typing(self, conversation_id, data):
+        # Frames only update the shared state; broadcasts are throttled
+        if not hasattr(self, 'typing_indicators'):
+            self.typing_indicators = {}
+        indicator = self.typing_indicators.get(conversation_id)
+        if indicator is None:
+            async def emit(is_typing):
+                await self.channel_layer.group_send(
+                    conversation_group(conversation_id),
+                    {
+                        'type': 'typing_indicator',
+                        'conversation_id': conversation_id,
+                        'user_id': str(self.scope['user'].id),
+                        'is_typing': is_typing
+                    }
+                )
+            indicator = self.typing_indicators[conversation_id] = TypingIndicator(
+                conversation_id, self.scope['user'].id, self.channel_name, emit
+            )
+        await indicator.update(bool(data.get('is_typing', False)))
+
+    async def stop_typing(self, conversation_id=None):
+        indicators = getattr(self, 'typing_indicators', {})
+        conversation_ids = [conversation_id] if conversation_id else list(indicators)
+        for conversation_id in conversation_ids:
+            indicator = indicators.pop(conversation_id, None)
+            if indicator is not None:
+                await indicator.stop()
+
+    async def chat_message(self, event):
+        await self.send_json({
+            'type': 'chat_message',
+            'conversation_id': event['conversation_id'],
+            'message': event['message']
+        })
+
+    async def typing_indicator(self, event):
+        # Don't send typing indicator to the sender
+        if str(self.scope['user'].id) != event['user_id']:
+            await self.send_json({
+                'type': 'typing_indicator',
+                'conversation_id': event['conversation_id'],
+                'user_id': event['user_id'],
+                'is_typing': event['is_typing']
+            })
+
+    async def offer_updated(self, event):
+        await self.send_json({
+            'type': 'offer_updated',
+            'conversation_id': event['conversation_id'],
+            'offer': event['offer']
+        })
+
+    async def message_persisted(self, event):
+        await self.send_json({
+            'type': 'message_persisted',
+            'client_id': event['client_id'],
+            'id': event['id'],
+            'created_at': event['created_at']
+        })
+
+    async def message_failed(self, event):
+        await self.send_json({
+            'type': 'message_failed',
+            'client_id': event['client_id'],
+            'id': event['id'],
+            'error': event['error']
+        })
+
+
+class ChatConsumer(ConversationEventsMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time chat.
     """
     
     async def connect(self):
         self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
-        self.room_group_name = f'chat_{self.conversation_id}'
+        self.room_group_name = conversation_group(self.conversation_id)
         
-        # Check if user is participant in conversation
-        if await self.is_participant():
+        # Resolve membership once; it's reloaded when invalidated
+        self.membership = await database_sync_to_async(get_membership)(self.conversation_id)
+        if is_member(self.membership, self.scope['user'].id):
             # Join room group
             await self.channel_layer.group_add(
                 self.room_group_name,
@@ -31,6 +174,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
 
     async def disconnect(self, close_code):
+        await self.stop_typing()
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -42,84 +186,106 @@ class ChatConsumer(AsyncWebsocketConsumer):
         message_type = data.get('type')
         
         if message_type == 'chat_message':
-            content = data['content']
-            
-            # Save message to database
-            message = await self.save_message(content)
-            
-            if message:
-                # Send message to room group
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'chat_message',
-                        'message': {
-                            'id': str(message.id),
-                            'content': message.content,
-                            'sender': {
-                                'id': str(message.sender.id),
-                                'name': message.sender.full_name
-                            },
-                            'created_at': message.created_at.isoformat(),
-                            'message_type': message.message_type
-                        }
-                    }
-                )
+            await self.send_chat_message(self.conversation_id, self.membership, data)
         
         elif message_type == 'typing':
-            # Broadcast typing indicator
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'typing_indicator',
-                    'user_id': str(self.scope['user'].id),
-                    'is_typing': data.get('is_typing', False)
-                }
-            )
+            await self.send_typing(self.conversation_id, data)
 
-    async def chat_message(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': event['message']
-        }))
+    async def membership_changed(self, event):
+        # Participants, blocks or archive state changed; reload and drop
+        # the connection if the user was removed
+        self.membership = await database_sync_to_async(get_membership)(self.conversation_id)
+        if not is_member(self.membership, self.scope['user'].id):
+            await self.close()
 
-    async def typing_indicator(self, event):
-        # Don't send typing indicator to the sender
-        if str(self.scope['user'].id) != event['user_id']:
-            await self.send(text_data=json.dumps({
-                'type': 'typing_indicator',
-                'user_id': event['user_id'],
-                'is_typing': event['is_typing']
-            }))
-
-    @database_sync_to_async
-    def is_participant(self):
-        """Check if user is a participant in the conversation."""
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            return conversation.participants.filter(id=self.scope['user'].id).exists()
-        except Conversation.DoesNotExist:
-            return False
-
-    @database_sync_to_async
-    def save_message(self, content):
-        """Save message to database."""
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=self.scope['user'],
-                content=content,
-                message_type='text'
-            )
-            
-            # Update conversation last message
-            conversation.last_message = content
-            conversation.last_message_at = message.created_at
-            conversation.save()
-            
-            return message
-        except Exception as e:
-            print(f"Error saving message: {e}")
-            return None
\ No newline at end of file
+
+class InboxConsumer(ConversationEventsMixin, AsyncWebsocketConsumer):
+    """
+    One WebSocket per user carrying every active conversation, offer
+    update and notification. Subscriptions are managed on the server:
+    the socket joins its user's conversations at connect and is told to
+    join or leave conversations as participants change.
+    """
+
+    async def connect(self):
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.user_group_name = user_group(user.id)
+        self.memberships = await database_sync_to_async(self.load_memberships)()
+
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+        for conversation_id in self.memberships:
+            await self.channel_layer.group_add(conversation_group(conversation_id), self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, 'user_group_name'):
+            return
+        await self.stop_typing()
+        await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+        for conversation_id in self.memberships:
+            await self.channel_layer.group_discard(conversation_group(conversation_id), self.channel_name)
+
+    def load_memberships(self):
+        """Cached membership of every active conversation the user is in."""
+        conversation_ids = [
+            str(conversation_id) for conversation_id in Conversation.objects.filter(
+                participants=self.scope['user'],
+                is_active=True
+            ).values_list('id', flat=True)
+        ]
+        return get_memberships(conversation_ids)
+
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+        message_type = data.get('type')
+        conversation_id = str(data.get('conversation_id', ''))
+
+        if conversation_id not in self.memberships:
+            await self.send_json({
+                'type': 'error',
+                'conversation_id': conversation_id,
+                'error': 'Conversation not found'
+            })
+            return
+
+        if message_type == 'chat_message':
+            await self.send_chat_message(conversation_id, self.memberships[conversation_id], data)
+
+        elif message_type == 'typing':
+            await self.send_typing(conversation_id, data)
+
+    async def subscribe(self, conversation_id):
+        membership = await database_sync_to_async(get_membership)(conversation_id)
+        if is_member(membership, self.scope['user'].id):
+            if conversation_id not in self.memberships:
+                await self.channel_layer.group_add(conversation_group(conversation_id), self.channel_name)
+            self.memberships[conversation_id] = membership
+        else:
+            await self.unsubscribe(conversation_id)
+
+    async def unsubscribe(self, conversation_id):
+        await self.stop_typing(conversation_id)
+        if self.memberships.pop(conversation_id, None) is not None:
+            await self.channel_layer.group_discard(conversation_group(conversation_id), self.channel_name)
+
+    async def conversation_subscribe(self, event):
+        await self.subscribe(event['conversation_id'])
+        await self.send_json({'type': 'conversation_subscribed', 'conversation_id': event['conversation_id']})
+
+    async def conversation_unsubscribe(self, event):
+        await self.unsubscribe(event['conversation_id'])
+        await self.send_json({'type': 'conversation_unsubscribed', 'conversation_id': event['conversation_id']})
+
+    async def membership_changed(self, event):
+        # Reload the conversation's membership, leaving it if the user was removed
+        await self.subscribe(event['conversation_id'])
+
+    async def notification(self, event):
+        await self.send_json({
+            'type': 'notification',
+            'notification': event['notification']
+        })
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""
+Server-side publishing of real-time events to chat and inbox sockets.
+
+Conversation events go to the conversation's group, which both per-chat
+and per-user inbox sockets join. Events addressed to one user (new
+subscriptions, notifications) go to that user's group, which every inbox
+socket of the user joins.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def conversation_group(conversation_id):
+    return f'chat_{conversation_id}'
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def publish(group, event):
+    """
+    Send an event to a channel layer group once the current transaction
+    commits, so receivers never see uncommitted state.
+    """
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(group, event)
+
+    transaction.on_commit(send)
+
+
+def publish_offer(offer):
+    """
+    Tell the offer's conversation that the offer was made or answered.
+    """
+    publish(conversation_group(offer.conversation_id), {
+        'type': 'offer_updated',
+        'conversation_id': str(offer.conversation_id),
+        'offer': {
+            'id': str(offer.id),
+            'status': offer.status,
+            'offered_price': str(offer.offered_price),
+            'offerer_id': str(offer.offerer_id),
+            'recipient_id': str(offer.recipient_id),
+            'expires_at': offer.expires_at.isoformat(),
+            'counter_offer_id': str(offer.counter_offer_id) if offer.counter_offer_id else None,
+        }
+    })
+
+
+def publish_notification(notification):
+    """
+    Push a new notification to its recipient's inbox sockets.
+    """
+    publish(user_group(notification.recipient_id), {
+        'type': 'notification',
+        'notification': {
+            'id': str(notification.id),
+            'title': notification.title,
+            'message': notification.message,
+            'priority': notification.priority,
+            'action_url': notification.action_url,
+            'data': notification.data,
+            'created_at': notification.created_at.isoformat(),
+        }
+    })
\ No newline at end of file
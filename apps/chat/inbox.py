@@ -0,0 +1,116 @@
+"""
+Materialized per-user inbox.
+
+Each ConversationParticipant row doubles as its user's inbox entry. It
+carries the other participant's card, a product stub, the last message
+preview and time, the unread count and the user's own archive flag, so the
+conversation list is one range scan of the (user, is_archived,
+-last_message_at) index with no joins. Entries are kept current on
+message, read, archive, participant, profile and product changes.
+"""
+from django.db.models import Q
+
+PREVIEW_LENGTH = 100
+
+# Fields shown on inbox cards; saves that touch none of them are ignored
+USER_CARD_FIELDS = {'username', 'first_name', 'last_name', 'avatar', 'is_verified'}
+PRODUCT_STUB_FIELDS = {'title', 'slug', 'price'}
+
+
+def message_preview(content):
+    return content[:PREVIEW_LENGTH] + "..." if len(content) > PREVIEW_LENGTH else content
+
+
+def user_card(user):
+    return {
+        'id': str(user.id),
+        'username': user.username,
+        'full_name': user.full_name,
+        'avatar': user.avatar.url if user.avatar else None,
+        'is_verified': user.is_verified,
+    }
+
+
+def product_stub(product, thumbnail=None):
+    return {
+        'id': str(product.id),
+        'title': product.title,
+        'slug': product.slug,
+        'price': str(product.price),
+        'thumbnail': thumbnail,
+    }
+
+
+def product_thumbnail(product):
+    image = product.images.order_by('-is_primary', 'sort_order').first()
+    if image is None:
+        return None
+    return (image.thumbnail or image.image).url
+
+
+def refresh_inbox_entries(*conversation_ids):
+    """
+    Rebuild every inbox entry in the given conversations from the
+    conversation, its participants and its product.
+    """
+    from .models import ConversationParticipant
+
+    memberships = list(ConversationParticipant.objects.filter(
+        conversation_id__in=conversation_ids
+    ).select_related('user', 'conversation__product'))
+
+    by_conversation = {}
+    for membership in memberships:
+        by_conversation.setdefault(membership.conversation_id, []).append(membership)
+
+    stubs = {}
+    for membership in memberships:
+        others = [other for other in by_conversation[membership.conversation_id] if other.user_id != membership.user_id]
+        membership.other_participant = user_card(others[0].user) if others else None
+
+        product = membership.conversation.product
+        if product is not None and product.id not in stubs:
+            stubs[product.id] = product_stub(product, product_thumbnail(product))
+        membership.product = stubs[product.id] if product is not None else None
+
+        # A rebuild copies the conversation as is; only the incremental
+        # update_inbox_last_message() guards against going backwards
+        conversation = membership.conversation
+        membership.last_message_preview = message_preview(conversation.last_message)
+        membership.last_message_at = conversation.last_message_at or conversation.created_at
+
+    ConversationParticipant.objects.bulk_update(memberships, [
+        'other_participant', 'product', 'last_message_preview', 'last_message_at'
+    ])
+
+
+def update_inbox_last_message(conversation_id, content, sent_at):
+    """
+    Copy a conversation's newest message onto its inbox entries, never
+    replacing a newer one.
+    """
+    from .models import ConversationParticipant
+
+    ConversationParticipant.objects.filter(
+        Q(last_message_at__isnull=True) | Q(last_message_at__lt=sent_at),
+        conversation_id=conversation_id
+    ).update(last_message_preview=message_preview(content), last_message_at=sent_at)
+
+
+def update_inbox_user_card(user):
+    """
+    Refresh the card of a user on the inbox entries of the people they talk to.
+    """
+    from .models import ConversationParticipant
+
+    ConversationParticipant.objects.filter(
+        conversation__memberships__user=user
+    ).exclude(user=user).update(other_participant=user_card(user))
+
+
+def update_inbox_product_stub(product):
+    from .models import ConversationParticipant
+
+    ConversationParticipant.objects.filter(conversation__product=product).update(
+        product=product_stub(product, product_thumbnail(product))
+    )
\ No newline at end of file
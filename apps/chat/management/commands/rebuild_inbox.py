@@ -0,0 +1,20 @@
+"""
+Rebuild the materialized inbox entries from conversations.
+"""
+from django.core.management.base import BaseCommand
+from apps.chat.inbox import refresh_inbox_entries
+from apps.chat.models import Conversation
+
+
+class Command(BaseCommand):
+    help = 'Rebuild participant cards, product stubs and last messages on every inbox entry.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        conversation_ids = list(Conversation.objects.values_list('id', flat=True))
+        for start in range(0, len(conversation_ids), batch_size):
+            refresh_inbox_entries(*conversation_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'{len(conversation_ids)} conversations rebuilt.'))
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+Recompute per-participant unread counters from the read cursors.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from apps.chat.models import ConversationParticipant, Message
+from apps.chat.reads import invalidate_unread_totals
+
+
+class Command(BaseCommand):
+    help = 'Fix drift in the unread counters on conversation memberships.'
+
+    def handle(self, *args, **options):
+        # Messages from others past the cursor, or all of them with no cursor yet
+        unread = Message.objects.filter(
+            conversation_id=OuterRef('conversation_id')
+        ).exclude(
+            sender_id=OuterRef('user_id')
+        )
+        drifted = 0
+        for memberships, messages in (
+            (ConversationParticipant.objects.filter(last_read_at__isnull=True), unread),
+            (ConversationParticipant.objects.filter(last_read_at__isnull=False),
+             unread.filter(created_at__gt=OuterRef('last_read_at'))),
+        ):
+            expected = Coalesce(Subquery(
+                messages.values('conversation_id').annotate(count=Count('id')).values('count')
+            ), 0)
+            drifted += memberships.exclude(unread_count=expected).update(unread_count=expected)
+
+        user_ids = ConversationParticipant.objects.values_list('user_id', flat=True).distinct()
+        invalidate_unread_totals(*user_ids)
+        self.stdout.write(self.style.SUCCESS(f'{drifted} unread counters reconciled.'))
\ No newline at end of file
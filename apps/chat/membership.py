@@ -0,0 +1,115 @@
+"""
+Shared cache of conversation membership for the chat consumers.
+
+Membership is resolved from the database once and kept in the shared cache
+until a participant change, block or archive invalidates it. Lookups of
+unknown conversations are cached for MEMBERSHIP_MISS_TIMEOUT only, and
+creating the conversation invalidates them too. Connected
+consumers hold their conversation's membership in memory and are told to
+reload it when it's invalidated, so sending a message does no reads.
+"""
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .events import conversation_group, publish
+
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+# Unknown conversations are remembered only briefly, in case they're created
+MEMBERSHIP_MISS_TIMEOUT = 30
+
+EMPTY_MEMBERSHIP = {'members': [], 'is_active': False, 'is_archived': False, 'blocked': False}
+
+
+def membership_key(conversation_id):
+    return f'chat:membership:{conversation_id}'
+
+
+def load_membership(conversation_id):
+    """
+    Read a conversation's participants and send permissions from the database.
+    """
+    from .models import ChatBlock, Conversation
+
+    try:
+        row = Conversation.objects.filter(id=conversation_id).values_list('is_active', 'is_archived').first()
+    except ValidationError:
+        row = None
+    if row is None:
+        return EMPTY_MEMBERSHIP
+
+    member_ids = [
+        str(user_id) for user_id in Conversation.participants.through.objects.filter(
+            conversation_id=conversation_id
+        ).values_list('user_id', flat=True)
+    ]
+    return {
+        'members': member_ids,
+        'is_active': row[0],
+        'is_archived': row[1],
+        'blocked': ChatBlock.objects.filter(blocker_id__in=member_ids, blocked_id__in=member_ids).exists(),
+    }
+
+
+def membership_timeout(membership):
+    return MEMBERSHIP_MISS_TIMEOUT if membership is EMPTY_MEMBERSHIP else MEMBERSHIP_CACHE_TIMEOUT
+
+
+def get_memberships(conversation_ids):
+    """
+    Cached membership state for several conversations in one cache read.
+    """
+    keys = {membership_key(conversation_id): conversation_id for conversation_id in conversation_ids}
+    cached = cache.get_many(list(keys))
+    memberships = {}
+    missing = {}
+    for key, conversation_id in keys.items():
+        if key in cached:
+            memberships[conversation_id] = cached[key]
+        else:
+            membership = memberships[conversation_id] = load_membership(conversation_id)
+            missing.setdefault(membership_timeout(membership), {})[key] = membership
+    for timeout, entries in missing.items():
+        cache.set_many(entries, timeout)
+    return memberships
+
+
+def get_membership(conversation_id):
+    """
+    Cached membership state for a conversation.
+    """
+    key = membership_key(conversation_id)
+    membership = cache.get(key)
+    if membership is None:
+        membership = load_membership(conversation_id)
+        cache.set(key, membership, membership_timeout(membership))
+    return membership
+
+
+def is_member(membership, user_id):
+    return str(user_id) in membership['members']
+
+
+def can_send(membership, user_id):
+    """Whether the user may post to a conversation with this membership."""
+    return is_member(membership, user_id) and membership['is_active'] and not membership['blocked']
+
+
+def invalidate_membership(*conversation_ids):
+    """
+    Drop cached membership once the current transaction commits and tell
+    connected consumers to reload it.
+    """
+    conversation_ids = [str(conversation_id) for conversation_id in conversation_ids]
+    if not conversation_ids:
+        return
+
+    def invalidate():
+        cache.delete_many([membership_key(conversation_id) for conversation_id in conversation_ids])
+
+    transaction.on_commit(invalidate)
+    for conversation_id in conversation_ids:
+        publish(conversation_group(conversation_id), {
+            'type': 'membership_changed',
+            'conversation_id': conversation_id
+        })
\ No newline at end of file
@@ -3,6 +3,7 @@ Chat models for Evolution Digital Market.
 """
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from apps.core.models import TimeStampedModel
 from apps.products.models import Product
 import uuid
@@ -14,7 +15,11 @@ class Conversation(TimeStampedModel):
     """
     Chat conversations between users.
     """
-    participants = models.ManyToManyField(User, related_name='conversations')
+    participants = models.ManyToManyField(
+        User,
+        related_name='conversations',
+        through='ConversationParticipant'
+    )
     product = models.ForeignKey(
         Product, 
         on_delete=models.SET_NULL, 
@@ -40,14 +45,13 @@ class Conversation(TimeStampedModel):
         participant_names = ', '.join([p.full_name for p in self.participants.all()[:2]])
         return f"Conversation: {participant_names}"
 
-    @property
     def other_participant(self, current_user):
         """Get the other participant in a 2-person conversation."""
         return self.participants.exclude(id=current_user.id).first()
 
     def get_unread_count(self, user):
         """Get unread message count for a specific user."""
-        return self.messages.filter(is_read=False).exclude(sender=user).count()
+        return self.memberships.filter(user=user).values_list('unread_count', flat=True).first() or 0
 
 
 class Message(TimeStampedModel):
@@ -79,37 +83,75 @@ class Message(TimeStampedModel):
     attachment_size = models.PositiveIntegerField(null=True, blank=True)
     
     # Message status
-    is_read = models.BooleanField(default=False)
-    read_at = models.DateTimeField(null=True, blank=True)
     is_edited = models.BooleanField(default=False)
     edited_at = models.DateTimeField(null=True, blank=True)
     
     # Special message data (for offers, etc.)
     metadata = models.JSONField(default=dict, blank=True)
     
+    # Id generated by the sending client, used to deduplicate retries
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+    
     class Meta:
         db_table = 'messages'
         ordering = ['created_at']
         indexes = [
             models.Index(fields=['conversation', 'created_at']),
             models.Index(fields=['sender', 'created_at']),
-            models.Index(fields=['is_read']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['sender', 'client_id'], name='messages_sender_client_id_uniq'),
         ]
 
     def __str__(self):
         return f"Message from {self.sender.full_name} in {self.conversation.id}"
 
-    def mark_as_read(self, user=None):
-        """Mark message as read."""
-        if not self.is_read and (user is None or self.sender != user):
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+class ConversationParticipant(models.Model):
+    """
+    A user's membership in a conversation, with their read cursor.
+    Messages from others created after last_read_at are unread.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    
+    # Read cursor
+    last_read_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    
+    # Messages from others past the cursor, kept in step with inserts and reads
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    # Inbox entry, see apps.chat.inbox
+    other_participant = models.JSONField(null=True, blank=True)
+    product = models.JSONField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=110, blank=True)
+    last_message_at = models.DateTimeField(default=timezone.now)
+    is_archived = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'conversations_participants'
+        unique_together = ['conversation', 'user']
+        indexes = [
+            models.Index(
+                fields=['user', 'is_archived', '-last_message_at', '-id'],
+                name='conv_participants_inbox_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.full_name} in {self.conversation_id}"
 
 
 class MessageRead(TimeStampedModel):
     """
-    Track which users have read which messages.
+    Explicit per-message receipts, for messages that need proof of reading.
+    Ordinary read state lives in ConversationParticipant's read cursor.
     """
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='read_receipts')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -0,0 +1,138 @@
+"""
+Per-participant read cursors and unread counters.
+
+Each ConversationParticipant row stores the newest message its user has
+read. Messages from other senders created after the cursor are unread, so
+marking a conversation read is one UPDATE of one row and no per-message
+read state is written.
+
+The row also keeps unread_count, incremented for every other participant
+when a message is inserted and reset when the cursor moves, and each
+user's total across conversations is cached, so badges never count
+messages.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from apps.core.utils import bump_cache_version, get_cache_versions
+
+UNREAD_TOTAL_TIMEOUT = 60 * 10
+
+
+def unread_version_key(user_id):
+    return f'chat-unread:{user_id}'
+
+
+def invalidate_unread_totals(*user_ids):
+    """
+    Retire cached unread totals once the current transaction commits.
+    Totals are cached under the version read before they were computed, so
+    a total computed from rows older than the change can't outlive it.
+    """
+    keys = [unread_version_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: bump_cache_version(*keys))
+
+
+def mark_read(conversation_id, user, message_id=None):
+    """
+    Move the user's read cursor forward to the given message, or to the
+    newest message in the conversation. Returns whether the cursor moved.
+    """
+    from .models import ConversationParticipant, Message
+
+    if message_id is None:
+        target = Message.objects.filter(
+            conversation_id=OuterRef('conversation_id')
+        ).order_by('-created_at')
+    else:
+        target = Message.objects.filter(conversation_id=OuterRef('conversation_id'), id=message_id)
+    target_at = Subquery(target.values('created_at')[:1])
+
+    if message_id is None:
+        unread_count = Value(0)
+    else:
+        # Messages from others still past the new cursor
+        remaining = Message.objects.filter(
+            conversation_id=OuterRef('conversation_id'),
+            created_at__gt=target_at
+        ).exclude(
+            sender_id=OuterRef('user_id')
+        ).values('conversation_id').annotate(count=Count('id')).values('count')
+        unread_count = Coalesce(Subquery(remaining), 0)
+
+    moved = ConversationParticipant.objects.filter(
+        Q(last_read_at__isnull=True) | Q(last_read_at__lt=target_at),
+        Exists(target),
+        conversation_id=conversation_id,
+        user=user
+    ).update(
+        last_read_message_id=Subquery(target.values('id')[:1]),
+        last_read_at=target_at,
+        unread_count=unread_count
+    )
+    if moved:
+        invalidate_unread_totals(user.id)
+    return bool(moved)
+
+
+def record_new_messages(conversation_id, sender_id, count=1):
+    """
+    Count newly inserted messages as unread for everyone but the sender.
+    """
+    from .models import ConversationParticipant
+
+    recipients = ConversationParticipant.objects.filter(
+        conversation_id=conversation_id
+    ).exclude(user_id=sender_id)
+    recipients.update(unread_count=F('unread_count') + count)
+
+    invalidate_unread_totals(*recipients.values_list('user_id', flat=True))
+
+
+def unread_total(user_id):
+    """
+    Unread messages across all of the user's conversations.
+    """
+    from .models import ConversationParticipant
+
+    # Read the version before counting so a concurrent change retires the result
+    version, = get_cache_versions(unread_version_key(user_id))
+    key = f'chat:unread-total:{user_id}:{version}'
+    total = cache.get(key)
+    if total is None:
+        total = ConversationParticipant.objects.filter(user_id=user_id).aggregate(
+            total=Coalesce(Sum('unread_count'), 0)
+        )['total']
+        cache.add(key, total, UNREAD_TOTAL_TIMEOUT)
+    return total
+
+
+def unread_messages(user):
+    """
+    Messages in the user's conversations that are past their read cursor.
+    """
+    from .models import Message
+
+    # One filter() call so both conditions apply to the same membership row
+    return Message.objects.filter(
+        Q(conversation__memberships__user=user) & (
+            Q(conversation__memberships__last_read_at__isnull=True) |
+            Q(created_at__gt=F('conversation__memberships__last_read_at'))
+        )
+    ).exclude(sender=user)
+
+
+def read_cursors(conversation_id):
+    """
+    Read cursor of every participant, keyed by user id.
+    """
+    from .models import ConversationParticipant
+
+    return {
+        str(user_id): last_read_at
+        for user_id, last_read_at in ConversationParticipant.objects.filter(
+            conversation_id=conversation_id
+        ).values_list('user_id', 'last_read_at')
+    }
\ No newline at end of file
@@ -3,7 +3,10 @@ Serializers for chat.
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Conversation, Message, PriceOffer, ChatReport
+from django.db import transaction
+from .activity import touch_conversation
+from .models import Conversation, ConversationParticipant, Message, PriceOffer, ChatReport
+from .reads import read_cursors
 from apps.accounts.serializers import PublicUserSerializer
 from apps.products.serializers import ProductListSerializer
 
@@ -17,14 +20,15 @@ class MessageSerializer(serializers.ModelSerializer):
     sender = PublicUserSerializer(read_only=True)
     time_ago = serializers.SerializerMethodField()
     attachment_url = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
         fields = [
             'id', 'sender', 'message_type', 'content', 'attachment',
             'attachment_name', 'attachment_size', 'attachment_url',
-            'is_read', 'read_at', 'is_edited', 'edited_at',
-            'metadata', 'created_at', 'time_ago'
+            'is_read', 'is_edited', 'edited_at',
+            'metadata', 'client_id', 'created_at', 'time_ago'
         ]
 
     def get_time_ago(self, obj):
@@ -43,6 +47,20 @@ class MessageSerializer(serializers.ModelSerializer):
         else:
             return obj.created_at.strftime("%b %d, %H:%M")
 
+    def get_is_read(self, obj):
+        # Read once another participant's cursor has reached the message.
+        # Cursors are keyed by conversation and loaded once per conversation
+        # unless the view already supplied them.
+        cursors_by_conversation = self.context.setdefault('read_cursors', {})
+        if obj.conversation_id not in cursors_by_conversation:
+            cursors_by_conversation[obj.conversation_id] = read_cursors(obj.conversation_id)
+        cursors = cursors_by_conversation[obj.conversation_id]
+        return any(
+            last_read_at is not None and last_read_at >= obj.created_at
+            for user_id, last_read_at in cursors.items()
+            if user_id != str(obj.sender_id)
+        )
+
     def get_attachment_url(self, obj):
         if obj.attachment:
             request = self.context.get('request')
@@ -89,25 +107,58 @@ class ConversationSerializer(serializers.ModelSerializer):
         return None
 
 
+class InboxEntrySerializer(serializers.ModelSerializer):
+    """
+    Serializer for a user's materialized inbox entry. Everything is read
+    from the entry itself, so listing the inbox needs no joins.
+    """
+    id = serializers.UUIDField(source='conversation_id', read_only=True)
+    other_participant = serializers.SerializerMethodField()
+    product = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ConversationParticipant
+        fields = [
+            'id', 'other_participant', 'product', 'last_message_preview',
+            'last_message_at', 'unread_count', 'is_archived'
+        ]
+
+    def absolute_url(self, card, field):
+        """Entries store media URLs as given by storage; serve them absolute."""
+        request = self.context.get('request')
+        if not card or not card.get(field) or request is None:
+            return card
+        return {**card, field: request.build_absolute_uri(card[field])}
+
+    def get_other_participant(self, obj):
+        return self.absolute_url(obj.other_participant, 'avatar')
+
+    def get_product(self, obj):
+        return self.absolute_url(obj.product, 'thumbnail')
+
+
 class MessageCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating messages.
     """
     class Meta:
         model = Message
-        fields = ['content', 'message_type', 'attachment', 'metadata']
+        fields = ['content', 'message_type', 'attachment', 'metadata', 'client_id']
 
     def create(self, validated_data):
         validated_data['sender'] = self.context['request'].user
         validated_data['conversation'] = self.context['conversation']
         
-        message = Message.objects.create(**validated_data)
+        # Resending with the same client id returns the stored message
+        client_id = validated_data.get('client_id')
+        if client_id:
+            existing = Message.objects.filter(sender=validated_data['sender'], client_id=client_id).first()
+            if existing is not None:
+                return existing
         
-        # Update conversation last message
-        conversation = message.conversation
-        conversation.last_message = message.content
-        conversation.last_message_at = message.created_at
-        conversation.save()
+        with transaction.atomic():
+            message = Message.objects.create(**validated_data)
+            touch_conversation(message.conversation_id, message.content, message.created_at)
         
         return message
 
@@ -233,10 +284,11 @@ class ConversationCreateSerializer(serializers.Serializer):
             conversation.participants.add(user, product.seller)
         
         # Create initial message
-        Message.objects.create(
+        message = Message.objects.create(
             conversation=conversation,
             sender=user,
             content=validated_data['message']
         )
+        touch_conversation(conversation.id, message.content, message.created_at)
         
         return conversation
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Signals for chat app.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.contrib.auth import get_user_model
+from django.dispatch import receiver
+from apps.products.models import Product
+from .events import publish, publish_offer, user_group
+from .inbox import (
+    PRODUCT_STUB_FIELDS, USER_CARD_FIELDS, refresh_inbox_entries,
+    update_inbox_product_stub, update_inbox_user_card
+)
+from .membership import invalidate_membership
+from .models import ChatBlock, Conversation, Message, PriceOffer
+from .reads import record_new_messages
+
+User = get_user_model()
+
+# Conversation fields that don't affect who may post to it
+ACTIVITY_FIELDS = {'last_message', 'last_message_at', 'updated_at'}
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def invalidate_membership_on_participant_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop cached membership and rebuild inbox entries when participants
+    are added or removed.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        conversation_ids = [instance.pk]
+        pairs = [(instance.pk, user_id) for user_id in pk_set or ()]
+    elif pk_set:
+        conversation_ids = list(pk_set)
+        pairs = [(conversation_id, instance.pk) for conversation_id in pk_set]
+    else:
+        conversation_ids = list(instance.conversations.values_list('id', flat=True))
+        pairs = []
+    invalidate_membership(*conversation_ids)
+    refresh_inbox_entries(*conversation_ids)
+
+    # Inbox sockets of the affected users join or leave the conversation
+    if action in ('post_add', 'post_remove'):
+        event_type = 'conversation_subscribe' if action == 'post_add' else 'conversation_unsubscribe'
+        for conversation_id, user_id in pairs:
+            publish(user_group(user_id), {'type': event_type, 'conversation_id': str(conversation_id)})
+
+
+@receiver(post_save, sender=Conversation)
+@receiver(post_delete, sender=Conversation)
+def invalidate_membership_on_conversation_change(sender, instance, signal, update_fields=None, **kwargs):
+    """
+    Drop cached membership when a conversation is created (replacing a
+    cached miss), archived, deactivated or deleted, and rebuild its inbox
+    entries.
+    """
+    if update_fields and set(update_fields) <= ACTIVITY_FIELDS:
+        return
+    invalidate_membership(instance.pk)
+    if signal is post_save:
+        refresh_inbox_entries(instance.pk)
+
+
+@receiver(post_save, sender=ChatBlock)
+@receiver(post_delete, sender=ChatBlock)
+def invalidate_membership_on_block(sender, instance, **kwargs):
+    """
+    Drop cached membership for every conversation the two users share.
+    """
+    conversation_ids = Conversation.objects.filter(
+        participants=instance.blocker_id
+    ).filter(
+        participants=instance.blocked_id
+    ).values_list('id', flat=True)
+    invalidate_membership(*conversation_ids)
+
+
+@receiver(post_save, sender=PriceOffer)
+def publish_offer_update(sender, instance, **kwargs):
+    """
+    Push new and answered offers to the conversation's sockets.
+    """
+    publish_offer(instance)
+
+
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    """
+    Bump unread counters of the other participants.
+    """
+    if created:
+        record_new_messages(instance.conversation_id, instance.sender_id)
+
+
+@receiver(post_save, sender=User)
+def refresh_inbox_user_card(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the user's card current in other participants' inboxes.
+    """
+    if created or (update_fields is not None and not USER_CARD_FIELDS & set(update_fields)):
+        return
+    update_inbox_user_card(instance)
+
+
+@receiver(post_save, sender=Product)
+def refresh_inbox_product_stub(sender, instance, created, **kwargs):
+    """
+    Keep product stubs current in the inboxes of conversations about it.
+    """
+    if created or not any(instance.field_changed(field) for field in PRODUCT_STUB_FIELDS):
+        return
+    update_inbox_product_stub(instance)
\ No newline at end of file
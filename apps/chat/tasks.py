@@ -0,0 +1,13 @@
+"""
+Celery tasks for chat app.
+"""
+from celery import shared_task
+from . import activity
+
+
+@shared_task
+def flush_last_message(conversation_id):
+    """
+    Trailing write of a conversation's last message after a coalescing window.
+    """
+    activity.flush_last_message(conversation_id)
\ No newline at end of file
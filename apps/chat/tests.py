@@ -0,0 +1,486 @@
+"""
+Tests for chat.
+"""
+import asyncio
+import tracemalloc
+import uuid
+from unittest import mock
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .consumers import InboxConsumer
+from .membership import MEMBERSHIP_MISS_TIMEOUT, get_membership, is_member, membership_key
+from .models import Conversation, ConversationParticipant, Message
+from .reads import mark_read, unread_total
+from .serializers import MessageSerializer
+from .typing import TypingIndicator
+from .writebehind import MessageWriteQueue, claim_client_id, persist_messages
+
+User = get_user_model()
+
+
+class ReadStateTests(TestCase):
+    """
+    Read cursors move only on mark-read and drive is_read.
+    """
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer')
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.seller)
+        self.message = Message.objects.create(
+            conversation=self.conversation, sender=self.buyer, content='Is this available?'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def membership(self, user):
+        return ConversationParticipant.objects.get(conversation=self.conversation, user=user)
+
+    def test_listing_messages_does_not_mark_them_read(self):
+        response = self.client.get(
+            reverse('chat:message-list', kwargs={'conversation_id': self.conversation.id})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['results'][0]['is_read'])
+        self.assertIsNone(self.membership(self.seller).last_read_at)
+        self.assertEqual(self.membership(self.seller).unread_count, 1)
+
+    def test_mark_read_endpoint_moves_cursor(self):
+        response = self.client.post(
+            reverse('chat:mark-conversation-read', kwargs={'conversation_id': self.conversation.id})
+        )
+        self.assertEqual(response.status_code, 200)
+        membership = self.membership(self.seller)
+        self.assertEqual(membership.last_read_message_id, self.message.id)
+        self.assertEqual(membership.unread_count, 0)
+
+    def test_is_read_without_view_context(self):
+        self.assertFalse(MessageSerializer(self.message).data['is_read'])
+
+        mark_read(self.conversation.id, self.seller)
+
+        self.assertTrue(MessageSerializer(self.message).data['is_read'])
+
+    def test_is_read_ignores_the_senders_own_cursor(self):
+        mark_read(self.conversation.id, self.buyer)
+        self.assertFalse(MessageSerializer(self.message).data['is_read'])
+
+    def test_is_read_loads_cursors_once_per_conversation(self):
+        for index in range(4):
+            Message.objects.create(conversation=self.conversation, sender=self.buyer, content=f'{index}')
+        messages = list(Message.objects.filter(conversation=self.conversation).select_related('sender'))
+
+        with CaptureQueriesContext(connection) as queries:
+            MessageSerializer(messages, many=True).data
+        cursor_queries = [
+            query for query in queries.captured_queries
+            if '"conversations_participants"' in query['sql']
+        ]
+        self.assertEqual(len(cursor_queries), 1)
+
+
+class UnreadTotalTests(TestCase):
+    """
+    Cached unread totals never outlive the change that made them stale.
+    """
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer')
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.seller)
+
+    def send(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(conversation=self.conversation, sender=self.buyer, content='Hi')
+
+    def test_total_follows_inserts_and_reads(self):
+        self.assertEqual(unread_total(self.seller.id), 0)
+        self.send()
+        self.send()
+        self.assertEqual(unread_total(self.seller.id), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_read(self.conversation.id, self.seller)
+        self.assertEqual(unread_total(self.seller.id), 0)
+
+    def test_total_counted_before_an_insert_is_not_cached_after_it(self):
+        original_aggregate = QuerySet.aggregate
+
+        def aggregate_then_insert(queryset, *args, **kwargs):
+            result = original_aggregate(queryset, *args, **kwargs)
+            # A message commits between the count and the cache write
+            self.send()
+            return result
+
+        with mock.patch.object(QuerySet, 'aggregate', aggregate_then_insert):
+            self.assertEqual(unread_total(self.seller.id), 0)
+
+        self.assertEqual(unread_total(self.seller.id), 1)
+
+
+class MembershipCacheTests(TestCase):
+    """
+    Membership is read from the database once, dropped when participants
+    change, and unknown conversations are only remembered briefly.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer')
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.conversation = Conversation.objects.create()
+            self.conversation.participants.add(self.buyer)
+
+    def test_cached_membership_needs_no_queries(self):
+        self.assertTrue(is_member(get_membership(self.conversation.id), self.buyer.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_member(get_membership(self.conversation.id), self.buyer.id))
+
+    def test_participant_change_invalidates(self):
+        self.assertFalse(is_member(get_membership(self.conversation.id), self.seller.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.conversation.participants.add(self.seller)
+        self.assertTrue(is_member(get_membership(self.conversation.id), self.seller.id))
+
+    def test_unknown_conversation_is_cached_briefly(self):
+        conversation_id = uuid.uuid4()
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            membership = get_membership(conversation_id)
+        self.assertEqual(membership['members'], [])
+        cache_set.assert_called_once_with(membership_key(conversation_id), membership, MEMBERSHIP_MISS_TIMEOUT)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Conversation.objects.create(id=conversation_id)
+        self.assertTrue(get_membership(conversation_id)['is_active'])
+
+
+class InboxTests(TestCase):
+    """
+    Inbox entries are archived per user, page stably through equal times
+    and serve absolute media URLs.
+    """
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer')
+        self.sellers = [
+            User.objects.create_user(email=f'seller{index}@example.com', username=f'seller{index}')
+            for index in range(3)
+        ]
+        self.conversations = []
+        for seller in self.sellers:
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.buyer, seller)
+            self.conversations.append(conversation)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def inbox_ids(self, **params):
+        response = self.client.get(reverse('chat:conversation-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [entry['id'] for entry in response.data['results']], response.data['next']
+
+    def test_archive_is_per_user(self):
+        conversation = self.conversations[0]
+        response = self.client.post(
+            reverse('chat:archive-conversation', kwargs={'conversation_id': conversation.id})
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # A later conversation save doesn't reset or spread the flag
+        conversation.save()
+        memberships = ConversationParticipant.objects.filter(conversation=conversation)
+        self.assertTrue(memberships.get(user=self.buyer).is_archived)
+        self.assertFalse(memberships.get(user=self.sellers[0]).is_archived)
+
+        self.assertNotIn(str(conversation.id), self.inbox_ids()[0])
+        self.assertEqual(self.inbox_ids(archived='true')[0], [str(conversation.id)])
+
+    def test_pages_through_equal_times_once(self):
+        ConversationParticipant.objects.update(last_message_at=timezone.now())
+
+        seen = []
+        ids, next_url = self.inbox_ids(page_size=1)
+        seen += ids
+        while next_url:
+            response = self.client.get(next_url)
+            seen += [entry['id'] for entry in response.data['results']]
+            next_url = response.data['next']
+
+        self.assertEqual(sorted(seen), sorted(str(conversation.id) for conversation in self.conversations))
+
+    def test_media_urls_are_absolute(self):
+        ConversationParticipant.objects.filter(user=self.buyer).update(
+            other_participant={'id': str(self.sellers[0].id), 'avatar': '/media/avatars/seller.jpg'},
+            product={'id': str(uuid.uuid4()), 'thumbnail': '/media/products/phone.jpg'}
+        )
+        response = self.client.get(reverse('chat:conversation-list'))
+        entry = response.data['results'][0]
+        self.assertEqual(entry['other_participant']['avatar'], 'http://testserver/media/avatars/seller.jpg')
+        self.assertEqual(entry['product']['thumbnail'], 'http://testserver/media/products/phone.jpg')
+
+
+class WriteBehindTests(TransactionTestCase):
+    """
+    Queued messages are stored once per client id, counted once, and
+    acknowledged to their sender with the stored row's values.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer')
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.seller)
+
+    def record(self, client_id, **kwargs):
+        return {
+            'id': str(uuid.uuid4()),
+            'client_id': client_id,
+            'conversation_id': str(self.conversation.id),
+            'sender_id': str(self.buyer.id),
+            'content': 'Is this available?',
+            **kwargs
+        }
+
+    def seller_unread_count(self):
+        return ConversationParticipant.objects.get(conversation=self.conversation, user=self.seller).unread_count
+
+    def test_claim_client_id_keeps_the_first_message_id(self):
+        self.assertEqual(claim_client_id(str(self.buyer.id), 'c1', 'first'), 'first')
+        self.assertEqual(claim_client_id(str(self.buyer.id), 'c1', 'second'), 'first')
+        self.assertEqual(claim_client_id(str(self.seller.id), 'c1', 'third'), 'third')
+
+    def test_retried_client_id_is_stored_and_counted_once(self):
+        first, retry = self.record('c1'), self.record('c1')
+        results = persist_messages([first, retry])
+
+        message = Message.objects.get(sender=self.buyer, client_id='c1')
+        self.assertEqual(results[first['id']][0], str(message.id))
+        self.assertEqual(results[retry['id']], results[first['id']])
+        self.assertEqual(self.seller_unread_count(), 1)
+
+        persist_messages([self.record('c1')])
+        self.assertEqual(Message.objects.filter(sender=self.buyer).count(), 1)
+        self.assertEqual(self.seller_unread_count(), 1)
+
+    def test_rows_lost_to_a_concurrent_insert_are_not_counted(self):
+        original_bulk_create = QuerySet.bulk_create
+
+        def insert_concurrently(queryset, objs, **kwargs):
+            # Another process stores the same client id first
+            Message.objects.create(
+                conversation=self.conversation, sender=self.buyer, client_id='c1', content='Is this available?'
+            )
+            return original_bulk_create(queryset, objs, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', insert_concurrently):
+            persist_messages([self.record('c1')])
+
+        self.assertEqual(Message.objects.filter(sender=self.buyer).count(), 1)
+        self.assertEqual(self.seller_unread_count(), 1)
+        self.conversation.refresh_from_db()
+        self.assertIsNone(self.conversation.last_message_at)
+
+    async def test_sender_is_acknowledged(self):
+        channel_layer = get_channel_layer()
+        reply_channel = await channel_layer.new_channel()
+        write_queue = MessageWriteQueue()
+        try:
+            saved = self.record('c1', reply_channel=reply_channel)
+            failed = self.record('c2', reply_channel=reply_channel, conversation_id=str(uuid.uuid4()))
+            write_queue.put(saved)
+            write_queue.put(failed)
+
+            events = {}
+            for _ in range(2):
+                event = await channel_layer.receive(reply_channel)
+                events[event['client_id']] = event
+        finally:
+            write_queue.worker.cancel()
+
+        message = await Message.objects.aget(sender=self.buyer, client_id='c1')
+        self.assertEqual(events['c1']['type'], 'message.persisted')
+        self.assertEqual(events['c1']['id'], str(message.id))
+        self.assertEqual(events['c1']['created_at'], message.created_at.isoformat())
+        self.assertEqual(events['c2']['type'], 'message.failed')
+        self.assertEqual(events['c2']['id'], failed['id'])
+
+
+@override_settings(CHAT_TYPING_MIN_INTERVAL_MS=100, CHAT_TYPING_TIMEOUT_SECONDS=0.3)
+class TypingIndicatorTests(TestCase):
+    """
+    Typing state is shared by every socket of a user in a conversation and
+    broadcast at most once per interval.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.broadcasts = []
+        conversation_id, user_id = uuid.uuid4(), uuid.uuid4()
+        self.sockets = [
+            TypingIndicator(conversation_id, user_id, f'socket-{index}', self.emit)
+            for index in range(2)
+        ]
+
+    async def emit(self, is_typing):
+        self.broadcasts.append(is_typing)
+
+    async def test_sockets_of_a_user_share_the_state(self):
+        first, second = self.sockets
+        await first.update(True)
+        await second.update(True)
+        self.assertEqual(self.broadcasts, [True])
+        await first.stop()
+        await second.stop()
+
+    async def test_changes_within_the_interval_are_coalesced(self):
+        first, second = self.sockets
+        await first.update(True)
+        await first.update(False)
+        await second.update(True)
+        await second.update(False)
+        self.assertEqual(self.broadcasts, [True])
+
+        await asyncio.sleep(0.15)
+        self.assertEqual(self.broadcasts, [True, False])
+
+    async def test_typing_expires(self):
+        await self.sockets[0].update(True)
+        await asyncio.sleep(0.4)
+        self.assertEqual(self.broadcasts, [True, False])
+
+    async def test_closing_the_reporting_socket_stops_typing(self):
+        first, second = self.sockets
+        await first.update(True)
+        await second.stop()
+        self.assertEqual(self.broadcasts, [True])
+
+        await first.stop()
+        self.assertEqual(self.broadcasts, [True, False])
+
+
+class InboxSocketTests(TransactionTestCase):
+    """
+    An inbox socket follows its user's conversations as participants change
+    and only relays events of the conversations it follows.
+    """
+
+    # Memory one open inbox socket may hold, test communicator included
+    SOCKET_MEMORY_BUDGET = 64 * 1024
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer')
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.outsider = User.objects.create_user(email='outsider@example.com', username='outsider')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.buyer, self.seller)
+        self.other_conversation = Conversation.objects.create()
+        self.other_conversation.participants.add(self.seller, self.outsider)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(InboxConsumer.as_asgi(), '/ws/inbox/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_until(self, communicator, event_type):
+        while True:
+            event = await communicator.receive_json_from(timeout=2)
+            if event['type'] == event_type:
+                return event
+
+    async def send_message(self, communicator, conversation, content):
+        await communicator.send_json_to({
+            'type': 'chat_message',
+            'conversation_id': str(conversation.id),
+            'content': content,
+        })
+        # Let the write-behind insert finish before the test tears down
+        await self.receive_until(communicator, 'message_persisted')
+
+    async def test_messages_are_routed_by_conversation(self):
+        buyer, seller, outsider = [
+            await self.connect(user) for user in (self.buyer, self.seller, self.outsider)
+        ]
+
+        await self.send_message(seller, self.conversation, 'Still available?')
+        event = await buyer.receive_json_from(timeout=2)
+        self.assertEqual(event['type'], 'chat_message')
+        self.assertEqual(event['conversation_id'], str(self.conversation.id))
+        self.assertEqual(event['message']['content'], 'Still available?')
+        self.assertTrue(await outsider.receive_nothing())
+
+        await self.send_message(seller, self.other_conversation, 'Sold, sorry')
+        event = await outsider.receive_json_from(timeout=2)
+        self.assertEqual(event['conversation_id'], str(self.other_conversation.id))
+        self.assertTrue(await buyer.receive_nothing())
+
+        for communicator in (buyer, seller, outsider):
+            await communicator.disconnect()
+
+    async def test_socket_follows_participant_changes(self):
+        buyer = await self.connect(self.buyer)
+        seller = await self.connect(self.seller)
+
+        await database_sync_to_async(self.conversation.participants.remove)(self.buyer)
+        event = await self.receive_until(buyer, 'conversation_unsubscribed')
+        self.assertEqual(event['conversation_id'], str(self.conversation.id))
+        await self.send_message(seller, self.conversation, 'Anyone there?')
+        self.assertTrue(await buyer.receive_nothing())
+
+        await database_sync_to_async(self.other_conversation.participants.add)(self.buyer)
+        event = await self.receive_until(buyer, 'conversation_subscribed')
+        self.assertEqual(event['conversation_id'], str(self.other_conversation.id))
+        await self.send_message(seller, self.other_conversation, 'Welcome')
+        event = await self.receive_until(buyer, 'chat_message')
+        self.assertEqual(event['message']['content'], 'Welcome')
+
+        await buyer.disconnect()
+        await seller.disconnect()
+
+    async def test_disconnect_stops_typing(self):
+        buyer = await self.connect(self.buyer)
+        seller = await self.connect(self.seller)
+
+        await buyer.send_json_to({'type': 'typing', 'conversation_id': str(self.conversation.id), 'is_typing': True})
+        event = await self.receive_until(seller, 'typing_indicator')
+        self.assertTrue(event['is_typing'])
+
+        await buyer.disconnect()
+        event = await self.receive_until(seller, 'typing_indicator')
+        self.assertEqual(event['user_id'], str(self.buyer.id))
+        self.assertFalse(event['is_typing'])
+        await seller.disconnect()
+
+    async def test_memory_per_open_socket(self):
+        # The first socket pays for imports and warm caches
+        sockets = [await self.connect(self.buyer)]
+
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            for _ in range(20):
+                sockets.append(await self.connect(self.buyer))
+            per_socket = (tracemalloc.get_traced_memory()[0] - baseline) / 20
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(per_socket, self.SOCKET_MEMORY_BUDGET)
+        for communicator in sockets:
+            await communicator.disconnect()
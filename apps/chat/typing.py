@@ -0,0 +1,102 @@
+"""
+Server-side throttling of typing indicators.
+
+Clients may send a typing frame per keystroke. Typing state is kept per
+(conversation, user) in the shared cache, so every socket of the user, in
+any process, updates the same state and only its changes are broadcast,
+at most once every CHAT_TYPING_MIN_INTERVAL_MS; a change that arrives
+sooner is coalesced into one delayed broadcast of the latest state.
+Typing that isn't refreshed within CHAT_TYPING_TIMEOUT_SECONDS expires
+into a "stopped typing" broadcast, as does closing the socket that last
+reported it.
+"""
+import asyncio
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+
+def typing_key(conversation_id, user_id):
+    return f'chat:typing:{conversation_id}:{user_id}'
+
+
+class TypingIndicator:
+    """
+    One socket's handle on the shared typing state of one user in one
+    conversation. The socket only keeps the timers for updates it made.
+    """
+
+    def __init__(self, conversation_id, user_id, channel_name, emit):
+        self.key = typing_key(conversation_id, user_id)
+        self.channel_name = channel_name
+        self.emit = emit
+        self.pending = None
+        self.expiry = None
+
+    @property
+    def timeout(self):
+        return settings.CHAT_TYPING_TIMEOUT_SECONDS * 2
+
+    async def update(self, is_typing):
+        """Record the latest client state and broadcast it if due."""
+        await cache.aset(self.key, {'is_typing': is_typing, 'channel': self.channel_name}, self.timeout)
+        if self.expiry is not None:
+            self.expiry.cancel()
+            self.expiry = None
+        if is_typing:
+            self.expiry = asyncio.ensure_future(self.expire())
+        await self.flush()
+
+    async def flush(self):
+        state = await cache.aget(self.key) or {'is_typing': False}
+        emitted = await cache.aget(f'{self.key}:emitted') or {'is_typing': False, 'at': 0}
+        if state['is_typing'] == emitted['is_typing']:
+            return
+
+        interval = settings.CHAT_TYPING_MIN_INTERVAL_MS / 1000
+        # Only one socket may broadcast per interval
+        if not await cache.aadd(f'{self.key}:throttle', True, interval):
+            if self.pending is None:
+                wait = max(emitted['at'] + interval - time.time(), 0.01)
+                self.pending = asyncio.ensure_future(self.flush_later(wait))
+            return
+
+        await self.broadcast(state['is_typing'])
+
+    async def broadcast(self, is_typing):
+        await cache.aset(f'{self.key}:emitted', {'is_typing': is_typing, 'at': time.time()}, self.timeout)
+        await self.emit(is_typing)
+
+    async def flush_later(self, wait):
+        await asyncio.sleep(wait)
+        self.pending = None
+        await self.flush()
+
+    async def expire(self):
+        await asyncio.sleep(settings.CHAT_TYPING_TIMEOUT_SECONDS)
+        self.expiry = None
+        await self.stop_own_state()
+        await self.flush()
+
+    async def stop_own_state(self):
+        """
+        Clear the typing state if this socket reported it last; another
+        socket's later update owns the state and its expiry.
+        """
+        state = await cache.aget(self.key)
+        if state is None or state['channel'] != self.channel_name or not state['is_typing']:
+            return False
+        await cache.aset(self.key, {'is_typing': False, 'channel': self.channel_name}, self.timeout)
+        return True
+
+    async def stop(self):
+        """Cancel timers and broadcast "stopped typing" if needed."""
+        for task in (self.pending, self.expiry):
+            if task is not None:
+                task.cancel()
+        self.pending = self.expiry = None
+        if await self.stop_own_state():
+            emitted = await cache.aget(f'{self.key}:emitted')
+            if emitted and emitted['is_typing']:
+                # Stopping isn't throttled, so it's never lost with the socket
+                await self.broadcast(False)
\ No newline at end of file
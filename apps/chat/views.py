@@ -1,43 +1,41 @@
 """
 Views for chat.
 """
+import uuid
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Prefetch
-from django.utils import timezone
-from .models import Conversation, Message, PriceOffer, ChatBlock, ChatReport
+from django.db.models import Q
+from .models import Conversation, ConversationParticipant, Message, PriceOffer, ChatBlock, ChatReport
+from .reads import mark_read, read_cursors, unread_total
 from .serializers import (
-    ConversationSerializer, MessageSerializer, MessageCreateSerializer,
+    ConversationSerializer, InboxEntrySerializer, MessageSerializer, MessageCreateSerializer,
     PriceOfferSerializer, PriceOfferCreateSerializer, ChatReportSerializer,
     ConversationCreateSerializer
 )
-from apps.core.pagination import CustomPageNumberPagination
+from apps.core.pagination import CustomPageNumberPagination, InboxCursorPagination
 
 
 class ConversationListView(generics.ListCreateAPIView):
     """
-    List user's conversations and create new ones.
+    List user's conversations from their inbox and create new ones.
+    Pass ?archived=true for archived conversations.
     """
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = InboxCursorPagination
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return ConversationCreateSerializer
-        return ConversationSerializer
+        return InboxEntrySerializer
 
     def get_queryset(self):
-        user = self.request.user
-        return Conversation.objects.filter(
-            participants=user,
-            is_active=True
-        ).prefetch_related(
-            'participants',
-            'product',
-            Prefetch('messages', queryset=Message.objects.order_by('-created_at')[:1])
-        ).distinct().order_by('-last_message_at', '-created_at')
+        archived = self.request.query_params.get('archived', '').lower() in ('true', '1')
+        return ConversationParticipant.objects.filter(
+            user=self.request.user,
+            is_archived=archived
+        )
 
 
 class ConversationDetailView(generics.RetrieveAPIView):
@@ -75,15 +73,7 @@ class MessageListView(generics.ListCreateAPIView):
         if not conversation:
             return Message.objects.none()
         
-        # Mark messages as read
-        Message.objects.filter(
-            conversation=conversation,
-            is_read=False
-        ).exclude(sender=self.request.user).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
-        
+        # Reading is a GET, so the cursor only moves through mark-read
         return Message.objects.filter(conversation=conversation).order_by('created_at')
 
     def get_serializer_context(self):
@@ -95,6 +85,7 @@ class MessageListView(generics.ListCreateAPIView):
                 participants=self.request.user
             )
             context['conversation'] = conversation
+            context['read_cursors'] = {conversation.id: read_cursors(conversation.id)}
         except Conversation.DoesNotExist:
             pass
         return context
@@ -274,10 +265,7 @@ def chat_stats(request):
     
     stats = {
         'total_conversations': Conversation.objects.filter(participants=user).count(),
-        'unread_messages': Message.objects.filter(
-            conversation__participants=user,
-            is_read=False
-        ).exclude(sender=user).count(),
+        'unread_messages': unread_total(user.id),
         'active_offers': PriceOffer.objects.filter(
             Q(offerer=user) | Q(recipient=user),
             status='pending'
@@ -292,44 +280,34 @@ def chat_stats(request):
 @permission_classes([permissions.IsAuthenticated])
 def mark_conversation_read(request, conversation_id):
     """
-    Mark all messages in a conversation as read.
+    Mark a conversation as read, up to message_id if given.
     """
+    message_id = request.data.get('message_id')
     try:
-        conversation = Conversation.objects.get(
-            id=conversation_id,
-            participants=request.user
-        )
-        
-        count = Message.objects.filter(
-            conversation=conversation,
-            is_read=False
-        ).exclude(sender=request.user).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
-        
-        return Response({'message': f'{count} messages marked as read'})
-        
-    except Conversation.DoesNotExist:
+        if message_id is not None:
+            message_id = uuid.UUID(str(message_id))
+    except ValueError:
+        return Response({'error': 'Invalid message_id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not ConversationParticipant.objects.filter(conversation_id=conversation_id, user=request.user).exists():
         return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    mark_read(conversation_id, request.user, message_id)
+    return Response({'message': 'Conversation marked as read'})
+
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def archive_conversation(request, conversation_id):
     """
-    Archive a conversation.
+    Archive a conversation in the current user's inbox only.
     """
-    try:
-        conversation = Conversation.objects.get(
-            id=conversation_id,
-            participants=request.user
-        )
-        
-        conversation.is_archived = True
-        conversation.save()
-        
-        return Response({'message': 'Conversation archived'})
-        
-    except Conversation.DoesNotExist:
-        return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+    archived = ConversationParticipant.objects.filter(
+        conversation_id=conversation_id,
+        user=request.user
+    ).update(is_archived=True)
+    
+    if not archived:
+        return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({'message': 'Conversation archived'})
\ No newline at end of file
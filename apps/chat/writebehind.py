@@ -0,0 +1,201 @@
+"""
+Write-behind persistence for messages sent over WebSockets.
+
+The consumer broadcasts a message as soon as it arrives and hands it to
+this process's MessageWriteQueue, which inserts messages in batches of up
+to CHAT_WRITE_BATCH_SIZE or every CHAT_WRITE_BATCH_SECONDS. Each message
+carries its sender's client_id; the (sender, client_id) unique constraint
+makes retried sends idempotent. Once a batch is written every sender gets
+a message.persisted event, or message.failed if its row couldn't be saved.
+
+The created_at in the broadcast is the time the consumer received the
+message and is provisional. The stored row's created_at is authoritative:
+message.persisted carries it, and clients replace the broadcast value.
+
+Messages still queued when a process dies are lost without a persisted
+event; clients resend anything unacknowledged with the same client_id.
+"""
+import asyncio
+import logging
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from .activity import touch_conversation
+from .reads import record_new_messages
+
+logger = logging.getLogger(__name__)
+
+# How long a client id is remembered for deduplicating broadcasts
+CLIENT_ID_TIMEOUT = 60 * 60
+
+
+def claim_client_id(sender_id, client_id, message_id):
+    """
+    Reserve a server message id for a sender's client id. Returns the id
+    reserved by an earlier send of the same client id, or message_id.
+    """
+    key = f'chat:client-message:{sender_id}:{client_id}'
+    if cache.add(key, message_id, CLIENT_ID_TIMEOUT):
+        return message_id
+    return cache.get(key) or message_id
+
+
+def _insert_messages(records):
+    from .models import Message
+
+    # Drop retries of messages that are already stored, by client id or id
+    lookup = Q(id__in=[record['id'] for record in records])
+    for record in records:
+        lookup |= Q(sender_id=record['sender_id'], client_id=record['client_id'])
+    stored = set()
+    for message_id, sender_id, client_id in Message.objects.filter(lookup).values_list('id', 'sender_id', 'client_id'):
+        stored |= {str(message_id), (str(sender_id), client_id)}
+    records = [
+        record for record in records
+        if record['id'] not in stored and (record['sender_id'], record['client_id']) not in stored
+    ]
+    if not records:
+        return
+
+    Message.objects.bulk_create([
+        Message(
+            id=record['id'],
+            conversation_id=record['conversation_id'],
+            sender_id=record['sender_id'],
+            client_id=record['client_id'],
+            content=record['content'],
+            message_type='text'
+        )
+        for record in records
+    ], ignore_conflicts=True)
+
+    # Rows skipped as conflicts with a concurrent insert aren't new, so
+    # only the inserted ones are counted; bulk_create sends no signals,
+    # so count unread messages here
+    inserted = Message.objects.filter(
+        id__in=[record['id'] for record in records]
+    ).order_by('created_at').values_list('conversation_id', 'sender_id', 'content', 'created_at')
+    latest = {}
+    counts = {}
+    for conversation_id, sender_id, content, created_at in inserted:
+        latest[conversation_id] = (content, created_at)
+        counts[(conversation_id, sender_id)] = counts.get((conversation_id, sender_id), 0) + 1
+    for conversation_id, (content, created_at) in latest.items():
+        touch_conversation(conversation_id, content, created_at)
+    for (conversation_id, sender_id), count in counts.items():
+        record_new_messages(conversation_id, sender_id, count)
+
+
+def persist_messages(records):
+    """
+    Insert a batch of messages. Returns {record id: (stored message id,
+    created_at)} for saved records and {record id: None} for failed ones.
+    """
+    from .models import Message
+
+    try:
+        with transaction.atomic():
+            _insert_messages(records)
+        saved = records
+    except DatabaseError:
+        # Retry one by one so a single bad row doesn't fail the whole batch
+        saved = []
+        for record in records:
+            try:
+                with transaction.atomic():
+                    _insert_messages([record])
+                saved.append(record)
+            except DatabaseError as e:
+                logger.error(f"Error saving message {record['client_id']}: {e}")
+
+    # Retried client ids resolve to the message that was stored first
+    stored = {}
+    if saved:
+        lookup = Q()
+        for record in saved:
+            lookup |= Q(sender_id=record['sender_id'], client_id=record['client_id'])
+        for message_id, sender_id, client_id, created_at in Message.objects.filter(lookup).values_list(
+            'id', 'sender_id', 'client_id', 'created_at'
+        ):
+            stored[(str(sender_id), client_id)] = (str(message_id), created_at.isoformat())
+
+    return {
+        record['id']: stored.get((record['sender_id'], record['client_id']))
+        for record in records
+    }
+
+
+class MessageWriteQueue:
+    """
+    Per-process queue that batches message inserts off the send path.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.ensure_future(self.run())
+
+    def put(self, record):
+        self.queue.put_nowait(record)
+
+    async def next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + settings.CHAT_WRITE_BATCH_SECONDS
+        while len(batch) < settings.CHAT_WRITE_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        # Nothing may end this loop: every queued message has already been
+        # acknowledged to its sender
+        while True:
+            batch = await self.next_batch()
+            try:
+                await self.flush(batch)
+            except Exception as e:
+                logger.error(f"Error flushing message batch: {e}")
+
+    async def flush(self, batch):
+        try:
+            results = await database_sync_to_async(persist_messages)(batch)
+        except Exception as e:
+            logger.error(f"Error persisting message batch: {e}")
+            results = {}
+
+        channel_layer = get_channel_layer()
+        for record in batch:
+            stored = results.get(record['id'])
+            if stored is not None:
+                event = {'type': 'message.persisted', 'id': stored[0], 'created_at': stored[1]}
+            else:
+                event = {'type': 'message.failed', 'id': record['id'], 'error': 'Message could not be saved'}
+            try:
+                await channel_layer.send(record['reply_channel'], {**event, 'client_id': record['client_id']})
+            except Exception as e:
+                logger.error(f"Error sending {event['type']} for message {record['client_id']}: {e}")
+
+
+_queues = {}
+
+
+def get_write_queue():
+    """
+    Write queue for the running event loop, started on first use.
+    """
+    loop = asyncio.get_running_loop()
+    write_queue = _queues.get(loop)
+    if write_queue is None:
+        write_queue = _queues[loop] = MessageWriteQueue()
+    elif write_queue.worker.done():
+        # Restart a worker that was cancelled, keeping queued messages
+        write_queue.worker = asyncio.ensure_future(write_queue.run())
+    return write_queue
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+View mixins for Evolution Digital Market.
+"""
+import hashlib
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalRetrieveMixin:
+    """
+    Answer conditional GETs (If-None-Match / If-Modified-Since) with a 304
+    before the object is loaded or serialized.
+
+    Views implement get_validators() with a cheap indexed query returning
+    the parts the ETag is derived from and the last-modified timestamp.
+    ETags are weak and per-user, since payloads include per-user fields
+    and engagement counters that don't invalidate them.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        """Return (etag_parts, last_modified_timestamp), or None if not found."""
+        raise NotImplementedError
+
+    def not_modified(self, request, *args, **kwargs):
+        """Hook for side effects that must run even when a 304 is sent."""
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag_parts, last_modified = validators
+        user_id = request.user.pk if request.user.is_authenticated else 'anonymous'
+        digest = hashlib.md5(
+            ':'.join(str(part) for part in [user_id, *etag_parts]).encode()
+        ).hexdigest()
+        etag = 'W/' + quote_etag(digest)
+        last_modified = int(last_modified)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        else:
+            self.not_modified(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Authorization', 'Cookie'])
+        return response
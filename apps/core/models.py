@@ -2,6 +2,7 @@
 Core models for Evolution Digital Market.
 """
 from django.db import models
+from django.conf import settings
 from django.utils import timezone
 import uuid
 
@@ -18,6 +19,33 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class TrackedFieldsMixin:
+    """
+    Mixin for models that need to know which fields changed since the
+    instance was loaded or last saved.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+        }
+
+    def field_changed(self, field_name):
+        """Whether a field differs from the value last loaded or saved."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or field_name not in loaded:
+            return True
+        return loaded[field_name] != getattr(self, field_name)
+
+
 class SoftDeleteManager(models.Manager):
     """
     Manager that excludes soft-deleted objects by default.
@@ -94,4 +122,52 @@ class SEOModel(models.Model):
     meta_keywords = models.CharField(max_length=255, blank=True, help_text="SEO keywords, comma separated")
     
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
+
+
+class DirectUpload(TimeStampedModel):
+    """
+    Ticket for a file the client uploads straight to storage.
+    """
+    UPLOAD_KINDS = [
+        ('product_image', 'Product Image'),
+        ('review_image', 'Review Image'),
+        ('chat_attachment', 'Chat Attachment'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('confirmed', 'Confirmed'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='direct_uploads'
+    )
+    kind = models.CharField(max_length=20, choices=UPLOAD_KINDS)
+    storage_key = models.CharField(max_length=255, unique=True)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    expires_at = models.DateTimeField()
+    
+    # Object created from the upload on confirmation
+    object_id = models.CharField(max_length=50, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'direct_uploads'
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} upload {self.storage_key}"
+
+    @property
+    def is_expired(self):
+        return timezone.now() > self.expires_at
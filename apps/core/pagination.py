@@ -1,7 +1,7 @@
 """
 Custom pagination classes for Evolution Digital Market.
 """
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 from collections import OrderedDict
 
@@ -41,4 +41,26 @@ class SmallResultsSetPagination(PageNumberPagination):
     """
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 50
\ No newline at end of file
+    max_page_size = 50
+
+
+class HelpfulReviewCursorPagination(CursorPagination):
+    """
+    Cursor pagination over the stored review helpfulness score, so each
+    page is an index range scan instead of an OFFSET.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-helpful_score'
+
+
+class InboxCursorPagination(CursorPagination):
+    """
+    Cursor pagination over a user's inbox entries, newest activity first.
+    The primary key breaks ties between entries with the same time.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-last_message_at', '-id')
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Celery tasks for core app.
+"""
+from celery import shared_task
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from .models import DirectUpload
+from .utils import compute_image_hash, create_thumbnail, generate_unique_filename
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_direct_upload(upload_id):
+    """
+    Post-process a confirmed direct upload outside the request cycle.
+    """
+    try:
+        upload = DirectUpload.objects.get(id=upload_id, status='confirmed')
+    except DirectUpload.DoesNotExist:
+        return
+
+    try:
+        if upload.kind == 'product_image':
+            process_product_image(upload.object_id)
+        upload.status = 'processed'
+        upload.save(update_fields=['status', 'updated_at'])
+    except Exception as e:
+        logger.error(f"Error processing upload {upload_id}: {e}")
+        upload.status = 'failed'
+        upload.error = str(e)
+        upload.save(update_fields=['status', 'error', 'updated_at'])
+
+
+@shared_task
+def cleanup_expired_uploads():
+    """
+    Fail pending uploads that were never confirmed and delete any file the
+    client sent for them.
+    """
+    from .uploads import get_upload_backend
+
+    backend = get_upload_backend()
+    expired = DirectUpload.objects.filter(status='pending', expires_at__lt=timezone.now())
+    for upload in expired:
+        storage = backend.get_storage(upload)
+        try:
+            if storage.exists(upload.storage_key):
+                storage.delete(upload.storage_key)
+        except Exception as e:
+            logger.error(f"Error deleting expired upload {upload.id}: {e}")
+            continue
+        upload.status = 'failed'
+        upload.error = 'Upload expired'
+        upload.save(update_fields=['status', 'error', 'updated_at'])
+
+
+def process_product_image(image_id):
+    """
+    Hash a directly uploaded product image, then either reuse the renditions
+    of an identical image or generate a thumbnail for it. A reused upload's
+    own file is deleted by the products signals once the image is saved.
+    """
+    from apps.products.models import ProductImage
+
+    image = ProductImage.objects.get(id=image_id)
+    with default_storage.open(image.image.name) as stored:
+        image.set_image_hash(compute_image_hash(stored))
+        update_fields = ['image_hash', 'hash_band_0', 'hash_band_1', 'hash_band_2', 'hash_band_3']
+
+        match = []
+        if image.image_hash:
+            match = ProductImage.objects.exclude(id=image.id).find_similar(image.hash_value, max_distance=0)[:1]
+
+        if match:
+            image.image = match[0].image.name
+            image.thumbnail = match[0].thumbnail.name
+        else:
+            thumbnail = create_thumbnail(stored)
+            if thumbnail:
+                image.thumbnail.save(
+                    generate_unique_filename(image.image.name),
+                    thumbnail,
+                    save=False
+                )
+        update_fields += ['image', 'thumbnail']
+
+    image.save(update_fields=update_fields)
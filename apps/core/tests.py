@@ -0,0 +1,140 @@
+"""
+Tests for core app.
+"""
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.chat.models import Conversation, Message
+from .models import DirectUpload
+from .tasks import cleanup_expired_uploads
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    DIRECT_UPLOAD_BACKEND='apps.core.uploads.LocalUploadBackend'
+)
+class DirectUploadTests(TestCase):
+    """
+    Sign, PUT and confirm a chat attachment through the local backend.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='buyer@example.com', username='buyer', password='password'
+        )
+        self.other = User.objects.create_user(
+            email='seller@example.com', username='seller', password='password'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user, self.other)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sign(self):
+        response = self.client.post(reverse('core:direct-upload-create'), {
+            'kind': 'chat_attachment',
+            'filename': 'invoice.pdf',
+            'content_type': 'application/pdf',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def put(self, ticket, body):
+        return APIClient().generic(
+            'PUT', ticket['target']['url'], body, content_type='application/pdf'
+        )
+
+    def confirm(self, ticket):
+        return self.client.post(
+            reverse('core:direct-upload-confirm', kwargs={'pk': ticket['upload_id']}),
+            {'conversation_id': str(self.conversation.id)},
+            format='json'
+        )
+
+    def test_sign_put_confirm(self):
+        ticket = self.sign()
+        self.assertEqual(ticket['target']['method'], 'PUT')
+
+        self.assertEqual(self.put(ticket, b'%PDF-1.4 invoice').status_code, 204)
+
+        response = self.confirm(ticket)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'confirmed')
+
+        upload = DirectUpload.objects.get(id=ticket['upload_id'])
+        self.assertEqual(upload.size, len(b'%PDF-1.4 invoice'))
+        message = Message.objects.get(id=upload.object_id)
+        self.assertEqual(message.attachment.name, upload.storage_key)
+        with default_storage.open(upload.storage_key) as stored:
+            self.assertEqual(stored.read(), b'%PDF-1.4 invoice')
+
+    def test_retried_put_replaces_stored_file(self):
+        ticket = self.sign()
+        self.put(ticket, b'first attempt')
+        self.put(ticket, b'second')
+
+        upload = DirectUpload.objects.get(id=ticket['upload_id'])
+        self.assertEqual(upload.storage_key, ticket['storage_key'])
+        with default_storage.open(upload.storage_key) as stored:
+            self.assertEqual(stored.read(), b'second')
+
+        response = self.confirm(ticket)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(DirectUpload.objects.get(id=upload.id).size, len(b'second'))
+
+    def test_put_records_renamed_storage_key(self):
+        ticket = self.sign()
+        upload = DirectUpload.objects.get(id=ticket['upload_id'])
+        renamed = upload.storage_key.replace('.pdf', '_renamed.pdf')
+
+        original_save = default_storage.save
+        default_storage.save = lambda name, content, **kwargs: original_save(renamed, content, **kwargs)
+        try:
+            self.put(ticket, b'%PDF-1.4')
+        finally:
+            default_storage.save = original_save
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.storage_key, renamed)
+        self.assertEqual(self.confirm(ticket).status_code, 200)
+
+    def test_confirm_before_put_is_rejected(self):
+        ticket = self.sign()
+        response = self.confirm(ticket)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(DirectUpload.objects.get(id=ticket['upload_id']).status, 'pending')
+
+    def test_cleanup_removes_expired_uploads(self):
+        expired = DirectUpload.objects.get(id=self.sign()['upload_id'])
+        default_storage.save(expired.storage_key, ContentFile(b'abandoned'))
+        expired.expires_at = timezone.now() - timezone.timedelta(minutes=1)
+        expired.save(update_fields=['expires_at'])
+
+        active = DirectUpload.objects.get(id=self.sign()['upload_id'])
+        default_storage.save(active.storage_key, ContentFile(b'in progress'))
+
+        cleanup_expired_uploads()
+
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, 'failed')
+        self.assertFalse(default_storage.exists(expired.storage_key))
+
+        active.refresh_from_db()
+        self.assertEqual(active.status, 'pending')
+        self.assertTrue(default_storage.exists(active.storage_key))
@@ -0,0 +1,197 @@
+"""
+Direct-to-storage uploads for Evolution Digital Market.
+
+Clients request an upload ticket, send the file straight to storage using the
+signed target it returns, then confirm the ticket so the API can attach the
+file and enqueue processing. Django workers never hold the file in memory.
+"""
+import os
+import time
+import uuid
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+UPLOAD_SIGNING_SALT = 'apps.core.direct-upload'
+
+UPLOAD_PATHS = {
+    'product_image': 'products/',
+    'review_image': 'reviews/',
+    'chat_attachment': 'chat/attachments/',
+}
+
+ALLOWED_CONTENT_TYPES = {
+    'product_image': ['image/jpeg', 'image/png', 'image/webp'],
+    'review_image': ['image/jpeg', 'image/png', 'image/webp'],
+    'chat_attachment': [
+        'image/jpeg', 'image/png', 'image/webp', 'application/pdf',
+        'application/msword',
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    ],
+}
+
+
+class UploadError(Exception):
+    """
+    Raised when an upload ticket can't be issued or confirmed.
+    """
+
+
+def build_storage_key(kind, filename):
+    """
+    Generate a unique storage key for an upload, preserving the extension.
+    """
+    name, ext = os.path.splitext(filename)
+    return f"{UPLOAD_PATHS[kind]}{uuid.uuid4().hex}{ext.lower()}"
+
+
+class LocalUploadBackend:
+    """
+    Filesystem stand-in for direct uploads.
+
+    The upload target is a signed API URL that streams the request body to
+    default storage in chunks, so the flow works without Cloudinary.
+    """
+
+    def get_upload_target(self, upload, request):
+        token = signing.dumps(str(upload.id), salt=UPLOAD_SIGNING_SALT)
+        url = reverse('core:direct-upload-local', kwargs={'token': token})
+        return {
+            'method': 'PUT',
+            'url': request.build_absolute_uri(url),
+            'fields': {},
+            'headers': {'Content-Type': upload.content_type},
+        }
+
+    def load_token(self, token):
+        """Return the upload id from a signed token, or raise UploadError."""
+        try:
+            return signing.loads(
+                token,
+                salt=UPLOAD_SIGNING_SALT,
+                max_age=settings.DIRECT_UPLOAD_EXPIRY_SECONDS
+            )
+        except signing.BadSignature:
+            raise UploadError("Invalid or expired upload token.")
+
+    def get_storage(self, upload):
+        """Storage the upload's file is written to."""
+        return default_storage
+
+    def get_stored_size(self, upload):
+        """Size of the stored file, or None if nothing was uploaded."""
+        storage = self.get_storage(upload)
+        if not storage.exists(upload.storage_key):
+            return None
+        return storage.size(upload.storage_key)
+
+
+class CloudinaryUploadBackend(LocalUploadBackend):
+    """
+    Signed Cloudinary upload parameters for production.
+    """
+
+    @staticmethod
+    def get_resource_type(upload):
+        return 'image' if upload.content_type.startswith('image/') else 'raw'
+
+    def get_storage(self, upload):
+        # Documents are raw resources, which the image storage can't see
+        from cloudinary_storage.storage import storages_per_type
+        return storages_per_type[self.get_resource_type(upload)]
+
+    def get_upload_target(self, upload, request):
+        import cloudinary.utils
+
+        config = settings.CLOUDINARY_STORAGE
+        resource_type = self.get_resource_type(upload)
+        # Raw public ids keep their extension, as the raw storage expects
+        public_id = upload.storage_key
+        if resource_type == 'image':
+            public_id = os.path.splitext(public_id)[0]
+        params = {
+            'public_id': public_id,
+            'timestamp': int(time.time()),
+        }
+        params['signature'] = cloudinary.utils.api_sign_request(params, config['API_SECRET'])
+        params['api_key'] = config['API_KEY']
+
+        return {
+            'method': 'POST',
+            'url': f"https://api.cloudinary.com/v1_1/{config['CLOUD_NAME']}/{resource_type}/upload",
+            'fields': params,
+            'headers': {},
+        }
+
+
+def get_upload_backend():
+    """
+    Instantiate the configured direct upload backend.
+    """
+    return import_string(settings.DIRECT_UPLOAD_BACKEND)()
+
+
+def attach_upload(upload, data):
+    """
+    Create the object a confirmed upload belongs to.
+    Returns the id of the created object.
+    """
+    if upload.kind == 'product_image':
+        from apps.products.models import Product, ProductImage
+
+        try:
+            product = Product.objects.get(id=data.get('product_id'), seller=upload.user)
+        except (Product.DoesNotExist, ValidationError):
+            raise UploadError("Product not found.")
+
+        existing_count = product.images.count()
+        image = ProductImage.objects.create(
+            product=product,
+            image=upload.storage_key,
+            alt_text=data.get('alt_text', ''),
+            is_primary=existing_count == 0,
+            sort_order=existing_count
+        )
+        return image.id
+
+    if upload.kind == 'review_image':
+        from apps.reviews.models import Review, ReviewImage
+
+        try:
+            review = Review.objects.get(id=data.get('review_id'), reviewer=upload.user)
+        except (Review.DoesNotExist, ValidationError):
+            raise UploadError("Review not found.")
+
+        image = ReviewImage.objects.create(
+            review=review,
+            image=upload.storage_key,
+            caption=data.get('caption', '')
+        )
+        return image.id
+
+    from apps.chat.activity import touch_conversation
+    from apps.chat.models import Conversation, Message
+
+    try:
+        conversation = Conversation.objects.get(
+            id=data.get('conversation_id'),
+            participants=upload.user
+        )
+    except (Conversation.DoesNotExist, ValidationError):
+        raise UploadError("Conversation not found.")
+
+    message = Message.objects.create(
+        conversation=conversation,
+        sender=upload.user,
+        message_type='image' if upload.content_type.startswith('image/') else 'file',
+        content=data.get('content') or upload.filename,
+        attachment=upload.storage_key,
+        attachment_name=upload.filename,
+        attachment_size=upload.size
+    )
+
+    touch_conversation(conversation.id, message.content, message.created_at)
+    return message.id
@@ -0,0 +1,14 @@
+"""
+URL configuration for core app.
+"""
+from django.urls import path
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    # Direct-to-storage uploads
+    path('', views.DirectUploadCreateView.as_view(), name='direct-upload-create'),
+    path('<uuid:pk>/confirm/', views.DirectUploadConfirmView.as_view(), name='direct-upload-confirm'),
+    path('local/<str:token>/', views.LocalDirectUploadView.as_view(), name='direct-upload-local'),
+]
@@ -2,9 +2,11 @@
 Utility functions for Evolution Digital Market.
 """
 import os
+import time
 import uuid
 import hashlib
 from PIL import Image
+from django.core.cache import cache
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.conf import settings
@@ -73,6 +75,71 @@ def create_thumbnail(image, size=(300, 300)):
         return None
 
 
+def compute_image_hash(image, hash_size=8):
+    """
+    Compute a perceptual difference hash (dHash) for an image.
+    Returns an integer of hash_size * hash_size bits, or None if the image can't be read.
+    """
+    try:
+        if hasattr(image, 'seek'):
+            image.seek(0)
+        img = Image.open(image).convert('L')
+        img = img.resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = list(img.getdata())
+        
+        value = 0
+        for row in range(hash_size):
+            offset = row * (hash_size + 1)
+            for col in range(hash_size):
+                value = (value << 1) | int(pixels[offset + col] > pixels[offset + col + 1])
+        return value
+    except Exception as e:
+        logger.error(f"Error computing image hash: {e}")
+        return None
+    finally:
+        if hasattr(image, 'seek'):
+            image.seek(0)
+
+
+def hamming_distance(hash_a, hash_b):
+    """
+    Number of differing bits between two integer hashes.
+    """
+    return bin(hash_a ^ hash_b).count('1')
+
+
+def split_image_hash(value, bands=4, band_bits=16):
+    """
+    Split a 64-bit image hash into fixed-width bands for indexed lookups.
+    Two hashes within (bands - 1) bits of each other share at least one band.
+    """
+    mask = (1 << band_bits) - 1
+    return [(value >> (band_bits * i)) & mask for i in range(bands)]
+
+
+def get_cache_versions(*keys):
+    """
+    Timestamps of the last recorded change for each version key.
+    Unknown keys are initialised to now, so a cache flush only ever makes
+    validators look newer.
+    """
+    cache_keys = {f'version:{key}': key for key in keys}
+    versions = cache.get_many(list(cache_keys))
+    missing = {cache_key: time.time() for cache_key in cache_keys if cache_key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[f'version:{key}'] for key in keys]
+
+
+def bump_cache_version(*keys):
+    """
+    Record a change for each version key.
+    """
+    now = time.time()
+    cache.set_many({f'version:{key}': now for key in keys}, None)
+
+
 def send_notification_email(user, subject, template_name, context):
     """
     Send notification email to user using Resend.
@@ -4,11 +4,20 @@ Core views for Evolution Digital Market.
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
-from django.db import connection
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.db import connection, transaction
 from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
 import redis
+import tempfile
 from django.conf import settings
+from .models import DirectUpload
+from .uploads import (
+    ALLOWED_CONTENT_TYPES, UploadError, attach_upload, build_storage_key,
+    get_upload_backend
+)
 
 
 class HealthCheckView(APIView):
@@ -58,4 +67,137 @@ class HealthCheckView(APIView):
             health_status['services']['celery'] = f'unhealthy: {str(e)}'
 
         response_status = status.HTTP_200_OK if health_status['status'] == 'healthy' else status.HTTP_503_SERVICE_UNAVAILABLE
-        return Response(health_status, status=response_status)
\ No newline at end of file
+        return Response(health_status, status=response_status)
+
+
+class DirectUploadCreateView(APIView):
+    """
+    Issue a signed target for uploading a file straight to storage.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        kind = request.data.get('kind')
+        filename = request.data.get('filename', '')
+        content_type = request.data.get('content_type', '')
+        
+        if kind not in ALLOWED_CONTENT_TYPES:
+            return Response({'error': 'Invalid upload kind'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not filename or content_type not in ALLOWED_CONTENT_TYPES[kind]:
+            return Response(
+                {'error': f"Allowed types: {', '.join(ALLOWED_CONTENT_TYPES[kind])}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        upload = DirectUpload.objects.create(
+            user=request.user,
+            kind=kind,
+            storage_key=build_storage_key(kind, filename),
+            filename=filename[:255],
+            content_type=content_type,
+            expires_at=timezone.now() + timezone.timedelta(
+                seconds=settings.DIRECT_UPLOAD_EXPIRY_SECONDS
+            )
+        )
+        
+        return Response({
+            'upload_id': str(upload.id),
+            'storage_key': upload.storage_key,
+            'max_size': settings.DIRECT_UPLOAD_MAX_SIZE,
+            'expires_at': upload.expires_at.isoformat(),
+            'target': get_upload_backend().get_upload_target(upload, request),
+        }, status=status.HTTP_201_CREATED)
+
+
+class LocalDirectUploadView(APIView):
+    """
+    Receive a direct upload when storage is the local filesystem.
+    The signed token in the URL authorizes the request.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def put(self, request, token):
+        backend = get_upload_backend()
+        try:
+            upload_id = backend.load_token(token)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            upload = DirectUpload.objects.get(id=upload_id, status='pending')
+        except DirectUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Stream the body to a temporary file instead of loading it in memory
+        received = 0
+        with tempfile.TemporaryFile() as buffer:
+            while True:
+                chunk = request.stream.read(64 * 1024) if request.stream else b''
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > settings.DIRECT_UPLOAD_MAX_SIZE:
+                    return Response(
+                        {'error': 'File too large'},
+                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                    )
+                buffer.write(chunk)
+            
+            buffer.seek(0)
+            # A retried PUT replaces the earlier body instead of landing under
+            # a suffixed name that confirm would never look at
+            if default_storage.exists(upload.storage_key):
+                default_storage.delete(upload.storage_key)
+            stored_name = default_storage.save(upload.storage_key, File(buffer))
+        
+        if stored_name != upload.storage_key:
+            upload.storage_key = stored_name
+            upload.save(update_fields=['storage_key', 'updated_at'])
+        
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DirectUploadConfirmView(APIView):
+    """
+    Confirm a finished direct upload, attach it and enqueue processing.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            upload = DirectUpload.objects.get(id=pk, user=request.user)
+        except DirectUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if upload.status != 'pending':
+            return Response({'object_id': upload.object_id, 'status': upload.status})
+        
+        if upload.is_expired:
+            return Response({'error': 'Upload has expired'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        backend = get_upload_backend()
+        size = backend.get_stored_size(upload)
+        if size is None:
+            return Response({'error': 'File has not been uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        if size > settings.DIRECT_UPLOAD_MAX_SIZE:
+            backend.get_storage(upload).delete(upload.storage_key)
+            upload.status = 'failed'
+            upload.error = 'File too large'
+            upload.save(update_fields=['status', 'error', 'updated_at'])
+            return Response({'error': 'File too large'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload.size = size
+        try:
+            with transaction.atomic():
+                upload.object_id = str(attach_upload(upload, request.data))
+                upload.status = 'confirmed'
+                upload.save(update_fields=['size', 'object_id', 'status', 'updated_at'])
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        from .tasks import process_direct_upload
+        transaction.on_commit(lambda: process_direct_upload.delay(str(upload.id)))
+        
+        return Response({'object_id': upload.object_id, 'status': upload.status})
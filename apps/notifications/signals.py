@@ -3,7 +3,7 @@ Signals for notifications app.
 """
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import NotificationPreference
+from .models import Notification, NotificationPreference
 from apps.accounts.models import User
 
 
@@ -13,4 +13,15 @@ def create_notification_preferences(sender, instance, created, **kwargs):
     Create notification preferences when user is created.
     """
     if created:
-        NotificationPreference.objects.get_or_create(user=instance)
\ No newline at end of file
+        NotificationPreference.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created, **kwargs):
+    """
+    Push new notifications to the recipient's inbox sockets.
+    """
+    if not created:
+        return
+    from apps.chat.events import publish_notification
+    publish_notification(instance)
\ No newline at end of file
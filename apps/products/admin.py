@@ -94,9 +94,10 @@ class ProductImageAdmin(admin.ModelAdmin):
     """
     Admin interface for ProductImage model.
     """
-    list_display = ['product', 'is_primary', 'sort_order', 'created_at']
+    list_display = ['product', 'is_primary', 'sort_order', 'image_hash', 'created_at']
     list_filter = ['is_primary', 'created_at']
-    search_fields = ['product__title', 'alt_text']
+    search_fields = ['product__title', 'alt_text', 'image_hash']
+    readonly_fields = ['image_hash']
 
 
 @admin.register(ProductWishlist)
@@ -0,0 +1,206 @@
+"""
+Near-duplicate listing detection with MinHash signatures and LSH buckets.
+
+Each listing's title and description are shingled into word 3-grams and
+reduced to a fixed-size MinHash signature. The signature is split into
+bands; listings that share any band bucket are candidates, and only those
+candidates are compared on estimated Jaccard similarity.
+"""
+import hashlib
+import re
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+SIGNATURE_SIZE = 64
+LSH_BANDS = 16
+LSH_ROWS = SIGNATURE_SIZE // LSH_BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+# Fixed permutation coefficients so signatures are stable across processes
+_PERMUTATIONS = [
+    (_hash(f'a{i}') % (_MERSENNE_PRIME - 1) + 1, _hash(f'b{i}') % _MERSENNE_PRIME)
+    for i in range(SIGNATURE_SIZE)
+]
+
+
+def shingle(text, size=SHINGLE_SIZE):
+    """
+    Normalize text and return its set of word n-gram shingles.
+    """
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(shingles):
+    """
+    Compute the MinHash signature of a set of shingles.
+    """
+    hashes = [_hash(s) & _MAX_HASH for s in shingles]
+    if not hashes:
+        return [_MAX_HASH] * SIGNATURE_SIZE
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def lsh_buckets(signature):
+    """
+    Split a signature into (band, bucket key) pairs.
+    """
+    return [
+        (band, hashlib.md5(
+            ','.join(map(str, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])).encode()
+        ).hexdigest())
+        for band in range(LSH_BANDS)
+    ]
+
+
+def estimate_similarity(signature_a, signature_b):
+    """
+    Estimated Jaccard similarity of two MinHash signatures.
+    """
+    matches = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+    return matches / SIGNATURE_SIZE
+
+
+def listing_signature(title, description):
+    """
+    MinHash signature of a listing's text, or None if it has no words.
+    """
+    shingles = shingle(f"{title} {description}")
+    return minhash_signature(shingles) if shingles else None
+
+
+def index_product(product):
+    """
+    Store the product's signature and replace its LSH bucket entries.
+    Listings without text aren't indexed; they'd all share one signature.
+    """
+    from .models import ProductSignature, ProductLSHBucket
+
+    signature = listing_signature(product.title, product.description)
+    if signature is None:
+        with transaction.atomic():
+            ProductSignature.objects.filter(product=product).delete()
+            ProductLSHBucket.objects.filter(product=product).delete()
+        return None
+
+    with transaction.atomic():
+        ProductSignature.objects.update_or_create(
+            product=product,
+            defaults={'signature': signature}
+        )
+        ProductLSHBucket.objects.filter(product=product).delete()
+        ProductLSHBucket.objects.bulk_create([
+            ProductLSHBucket(product=product, band=band, bucket=bucket)
+            for band, bucket in lsh_buckets(signature)
+        ])
+    return signature
+
+
+def find_similar_listings(signature, threshold=None, exclude_product_id=None, queryset=None):
+    """
+    Return (product_id, similarity) pairs for indexed listings whose
+    estimated similarity to signature is at least threshold, best first.
+    """
+    from .models import ProductSignature, ProductLSHBucket
+
+    if threshold is None:
+        threshold = settings.LISTING_DUPLICATE_THRESHOLD
+
+    bucket_filter = Q()
+    for band, bucket in lsh_buckets(signature):
+        bucket_filter |= Q(band=band, bucket=bucket)
+
+    candidates = ProductLSHBucket.objects.filter(bucket_filter)
+    if exclude_product_id:
+        candidates = candidates.exclude(product_id=exclude_product_id)
+    if queryset is not None:
+        candidates = candidates.filter(product__in=queryset)
+    candidate_ids = set(candidates.values_list('product_id', flat=True))
+
+    results = []
+    for product_id, candidate in ProductSignature.objects.filter(
+        product_id__in=candidate_ids
+    ).values_list('product_id', 'signature'):
+        similarity = estimate_similarity(signature, candidate)
+        if similarity >= threshold:
+            results.append((product_id, similarity))
+    results.sort(key=lambda result: -result[1])
+    return results
+
+
+def duplicate_clusters(threshold=None, limit=50):
+    """
+    Group indexed listings into clusters of near-duplicates.
+    Only buckets holding more than one listing are examined.
+    """
+    from .models import ProductSignature, ProductLSHBucket
+
+    if threshold is None:
+        threshold = settings.LISTING_DUPLICATE_THRESHOLD
+
+    live_buckets = ProductLSHBucket.objects.filter(
+        product__is_active=True,
+        product__is_deleted=False
+    )
+    shared = list(live_buckets.values('band', 'bucket').annotate(
+        size=Count('id')
+    ).filter(size__gt=1))
+    if not shared:
+        return []
+
+    # Match exact (band, bucket) pairs, not every band with every bucket
+    shared_filter = Q()
+    for row in shared:
+        shared_filter |= Q(band=row['band'], bucket=row['bucket'])
+
+    bucket_members = {}
+    for band, bucket, product_id in live_buckets.filter(shared_filter).values_list('band', 'bucket', 'product_id'):
+        bucket_members.setdefault((band, bucket), []).append(product_id)
+
+    product_ids = {pid for members in bucket_members.values() if len(members) > 1 for pid in members}
+    signatures = dict(ProductSignature.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', 'signature'))
+
+    # Union-find over candidate pairs that pass the similarity threshold
+    parent = {pid: pid for pid in signatures}
+
+    def find(pid):
+        while parent[pid] != pid:
+            parent[pid] = parent[parent[pid]]
+            pid = parent[pid]
+        return pid
+
+    checked = set()
+    for members in bucket_members.values():
+        members = [pid for pid in members if pid in signatures]
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                pair = (first, second) if str(first) < str(second) else (second, first)
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                if estimate_similarity(signatures[first], signatures[second]) >= threshold:
+                    parent[find(first)] = find(second)
+
+    clusters = {}
+    for pid in signatures:
+        clusters.setdefault(find(pid), []).append(pid)
+
+    result = [members for members in clusters.values() if len(members) > 1]
+    result.sort(key=len, reverse=True)
+    return result[:limit]
@@ -1,10 +1,22 @@
 """
 Filters for products.
 """
+import operator
+from functools import reduce
 import django_filters
-from django.db.models import Q
-from .models import Product
+from django.db.models import CharField, Case, DecimalField, F, Q, Value, When
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Product, SavedSearch
 from apps.categories.models import Category
+from apps.categories.attributes import normalize_filter_value
+from apps.categories.cache import get_category_id_by_slug, get_descendant_ids
+
+# Values NullBooleanSelect reads as true or false; anything else is ignored
+TRUE_CHOICES = ['True', 'true', '2']
+FALSE_CHOICES = ['False', 'false', '3']
+DECIMAL_PATTERN = r'^\s*-?[0-9]+(\.[0-9]+)?\s*$'
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -16,9 +28,12 @@ class ProductFilter(django_filters.FilterSet):
     max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
     price_range = django_filters.RangeFilter(field_name='price')
     
-    # Category filtering
-    category = django_filters.ModelChoiceFilter(queryset=Category.objects.filter(is_active=True))
-    category_slug = django_filters.CharFilter(field_name='category__slug')
+    # Category filtering, including products filed under subcategories
+    category = django_filters.ModelChoiceFilter(
+        queryset=Category.objects.filter(is_active=True),
+        method='filter_category'
+    )
+    category_slug = django_filters.CharFilter(method='filter_category_slug')
     
     # Condition
     condition = django_filters.ChoiceFilter(choices=Product.CONDITION_CHOICES)
@@ -41,6 +56,9 @@ class ProductFilter(django_filters.FilterSet):
     created_after = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='gte')
     created_before = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='lte')
     
+    # Category attributes as slug:value pairs, e.g. storage:128,color:Black
+    attributes = django_filters.CharFilter(method='filter_attributes')
+    
     # Search in multiple fields
     search = django_filters.CharFilter(method='filter_search')
     
@@ -51,6 +69,49 @@ class ProductFilter(django_filters.FilterSet):
             'delivery_available', 'category', 'seller'
         ]
 
+    def filter_category(self, queryset, name, value):
+        """
+        Match the category and all of its descendants.
+        """
+        return queryset.filter(category_id__in=get_descendant_ids(value.id))
+
+    def filter_category_slug(self, queryset, name, value):
+        """
+        Match the category with this slug and all of its descendants.
+        """
+        category_id = get_category_id_by_slug(value)
+        if category_id is None:
+            return queryset.none()
+        return queryset.filter(category_id__in=get_descendant_ids(category_id))
+
+    def filter_attributes(self, queryset, name, value):
+        """
+        Match normalized attribute values with containment lookups, which
+        the GIN index on attributes serves. Without a leaf category, values
+        are normalized against every schema in the selected subtree (or the
+        whole tree) and any of the resulting forms matches.
+        """
+        category = self.form.cleaned_data.get('category')
+        category_id = category.id if category else None
+        if category_id is None and self.form.cleaned_data.get('category_slug'):
+            category_id = get_category_id_by_slug(self.form.cleaned_data['category_slug'])
+            if category_id is None:
+                return queryset.none()
+
+        for pair in value.split(','):
+            slug, _, raw = pair.partition(':')
+            slug = slug.strip()
+            if not raw:
+                continue
+            try:
+                normalized = normalize_filter_value(category_id, slug, raw)
+            except ValueError:
+                return queryset.none()
+            queryset = queryset.filter(reduce(operator.or_, (
+                Q(attributes__contains={slug: candidate}) for candidate in normalized
+            )))
+        return queryset
+
     def filter_search(self, queryset, name, value):
         """
         Search across multiple fields.
@@ -61,4 +122,145 @@ class ProductFilter(django_filters.FilterSet):
             Q(brand__icontains=value) |
             Q(model__icontains=value) |
             Q(tags__name__icontains=value)
-        ).distinct()
\ No newline at end of file
+        ).distinct()
+
+
+def _unset(name):
+    return Q(**{f'{name}__isnull': True}) | Q(**{name: ''})
+
+
+def _contains_json(value, candidate):
+    """Python counterpart of a JSON containment lookup on one value."""
+    if isinstance(candidate, list):
+        return isinstance(value, list) and all(item in value for item in candidate)
+    return value == candidate
+
+
+def _parsed_datetime(value):
+    value = str(value).strip()
+    parsed = parse_datetime(value)
+    if parsed is None and parse_date(value) is not None:
+        parsed = parse_datetime(f'{value}T00:00:00')
+    return parsed
+
+
+def saved_searches_matching(product, queryset=None):
+    """
+    Active saved searches whose stored ProductFilter criteria (filters plus
+    the free-text query) the product satisfies.
+
+    This is ProductFilter turned around: the product's values are bound as
+    parameters and every stored criterion is compared against them in one
+    query over saved_searches, so the cost doesn't grow with the number of
+    searches. Date and attribute criteria, which need parsing and schema
+    normalization, are checked in Python on the rows that query returns.
+    """
+    if queryset is None:
+        queryset = SavedSearch.objects.filter(is_active=True)
+
+    ancestors = list(product.category.get_ancestors(include_self=True).values_list('id', 'slug', 'is_active'))
+    # The category choice only accepts active categories
+    category_ids = {str(category_id): category_id for category_id, slug, is_active in ancestors if is_active}
+
+    keys = [
+        'min_price', 'max_price', 'price_range_min', 'price_range_max', 'category',
+        'category_slug', 'condition', 'location_city', 'location_state', 'seller',
+        'verified_seller', 'is_boosted', 'is_featured', 'pickup_available',
+        'delivery_available', 'search',
+    ]
+    aliases = {f'saved_{key}': KT(f'filters__{key}') for key in keys}
+
+    price = product.price
+    criteria = Q()
+    for key, compare in [
+        ('min_price', 'lte'), ('price_range_min', 'lte'),
+        ('max_price', 'gte'), ('price_range_max', 'gte'),
+    ]:
+        name = f'saved_{key}'
+        aliases[f'{name}_number'] = Case(
+            When(**{f'{name}__regex': DECIMAL_PATTERN},
+                 then=Cast(name, DecimalField(max_digits=12, decimal_places=2))),
+            default=None
+        )
+        criteria &= _unset(name) | Q(**{f'{name}_number__{compare}': price})
+
+    criteria &= _unset('saved_category') | Q(saved_category__in=list(category_ids))
+    criteria &= _unset('saved_category_slug') | Q(saved_category_slug__in=[slug for category_id, slug, is_active in ancestors])
+    criteria &= _unset('saved_condition') | Q(saved_condition=product.condition)
+    criteria &= _unset('saved_seller') | Q(saved_seller__in=[str(product.seller_id), product.seller_id.hex])
+
+    location = product.location
+    for key, value in [('location_city', location and location.city), ('location_state', location and location.state)]:
+        name = f'saved_{key}'
+        if value:
+            aliases[f'product_{key}'] = Value(value, output_field=CharField())
+            criteria &= _unset(name) | Q(**{f'product_{key}__icontains': F(name)})
+        else:
+            criteria &= _unset(name)
+
+    for key, value in [
+        ('verified_seller', product.seller.is_verified),
+        ('is_boosted', product.is_boosted),
+        ('is_featured', product.is_featured),
+        ('pickup_available', product.pickup_available),
+        ('delivery_available', product.delivery_available),
+    ]:
+        name = f'saved_{key}'
+        criteria &= Q(**{f'{name}__isnull': True}) | ~Q(**{f'{name}__in': FALSE_CHOICES if value else TRUE_CHOICES})
+
+    # Free text must appear in one of the fields filter_search looks at
+    texts = [product.title, product.description, product.brand, product.model, *product.tags.names()]
+    for index, text in enumerate(texts):
+        aliases[f'product_text_{index}'] = Value(text or '', output_field=CharField())
+
+    def text_matches(name):
+        return reduce(operator.or_, (
+            Q(**{f'product_text_{index}__icontains': F(name)}) for index in range(len(texts))
+        ))
+
+    # A saved query takes the place of any search key in the filters
+    criteria &= (
+        Q(query='') & (_unset('saved_search') | text_matches('saved_search')) |
+        ~Q(query='') & text_matches('query')
+    )
+
+    for search in queryset.alias(**aliases).filter(criteria):
+        if _matches_in_python(product, search.filters or {}, category_ids):
+            yield search
+
+
+def _matches_in_python(product, filters, category_ids):
+    """
+    Date and attribute criteria of a saved search that survived the query.
+    """
+    for key, compare in [('created_after', operator.ge), ('created_before', operator.le)]:
+        if filters.get(key) in (None, ''):
+            continue
+        bound = _parsed_datetime(filters[key])
+        if bound is None:
+            return False
+        if bound.tzinfo is None:
+            bound = bound.replace(tzinfo=product.created_at.tzinfo)
+        if not compare(product.created_at, bound):
+            return False
+
+    if filters.get('attributes'):
+        # Normalize against the saved category, as filter_attributes does
+        category_id = None
+        if filters.get('category'):
+            category_id = category_ids[str(filters['category'])]
+        elif filters.get('category_slug'):
+            category_id = get_category_id_by_slug(filters['category_slug'])
+        for pair in str(filters['attributes']).split(','):
+            slug, _, raw = pair.partition(':')
+            slug = slug.strip()
+            if not raw:
+                continue
+            try:
+                normalized = normalize_filter_value(category_id, slug, raw)
+            except ValueError:
+                return False
+            value = (product.attributes or {}).get(slug)
+            if not any(_contains_json(value, candidate) for candidate in normalized):
+                return False
+    return True
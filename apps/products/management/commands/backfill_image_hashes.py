@@ -0,0 +1,29 @@
+"""
+Compute perceptual hashes for product images uploaded before hashing existed.
+"""
+from django.core.management.base import BaseCommand
+from apps.core.utils import compute_image_hash
+from apps.products.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = 'Compute perceptual hashes for product images that are missing one.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        hashed = 0
+        images = ProductImage.objects.filter(image_hash='').exclude(image='')
+        
+        for image in images.iterator(chunk_size=options['batch_size']):
+            value = compute_image_hash(image.image)
+            if value is None:
+                continue
+            image.set_image_hash(value)
+            image.save(update_fields=[
+                'image_hash', 'hash_band_0', 'hash_band_1', 'hash_band_2', 'hash_band_3'
+            ])
+            hashed += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'{hashed} product images hashed.'))
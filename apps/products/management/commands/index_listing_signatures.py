@@ -0,0 +1,26 @@
+"""
+Build MinHash signatures and LSH buckets for existing listings.
+"""
+from django.core.management.base import BaseCommand
+from apps.products.duplicates import index_product
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Index listings for near-duplicate detection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--missing-only', action='store_true')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['missing_only']:
+            products = products.filter(signature__isnull=True)
+        
+        indexed = 0
+        for product in products.iterator(chunk_size=options['batch_size']):
+            index_product(product)
+            indexed += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'{indexed} listings indexed.'))
@@ -0,0 +1,56 @@
+"""
+Rebuild per-category market price aggregates from listings and sales.
+"""
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.products.market import QuantileSketch, stats_keys
+from apps.products.models import MarketPriceStats, Product, ProductSale
+
+
+class Command(BaseCommand):
+    help = 'Recompute market price aggregates from active listings and all sales.'
+
+    def handle(self, *args, **options):
+        aggregates = {}
+
+        def add(category_id, brand, model, kind, price):
+            for brand_key, model_key in stats_keys(brand, model):
+                stats = aggregates.setdefault((category_id, brand_key, model_key), {
+                    kind: {'count': 0, 'total': Decimal('0'), 'sketch': QuantileSketch()}
+                    for kind in ('listing', 'sale')
+                })[kind]
+                stats['count'] += 1
+                stats['total'] += price
+                stats['sketch'].add(price)
+
+        listings = Product.objects.filter(is_active=True).values_list(
+            'category_id', 'brand', 'model', 'price'
+        )
+        for category_id, brand, model, price in listings.iterator():
+            add(category_id, brand, model, 'listing', price)
+
+        sales = ProductSale.objects.values_list(
+            'product__category_id', 'product__brand', 'product__model', 'sale_price'
+        )
+        for category_id, brand, model, price in sales.iterator():
+            add(category_id, brand, model, 'sale', price)
+
+        with transaction.atomic():
+            MarketPriceStats.objects.all().delete()
+            MarketPriceStats.objects.bulk_create([
+                MarketPriceStats(
+                    category_id=category_id,
+                    brand=brand,
+                    model=model,
+                    listing_count=kinds['listing']['count'],
+                    listing_total=kinds['listing']['total'],
+                    listing_sketch=kinds['listing']['sketch'].to_dict(),
+                    sale_count=kinds['sale']['count'],
+                    sale_total=kinds['sale']['total'],
+                    sale_sketch=kinds['sale']['sketch'].to_dict(),
+                )
+                for (category_id, brand, model), kinds in aggregates.items()
+            ], batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(aggregates)} market aggregates rebuilt.'))
@@ -0,0 +1,180 @@
+"""
+Per-category market price aggregates.
+
+Listing and sale prices are folded into MarketPriceStats rows keyed by
+(category, brand, model) as they happen. Each row keeps a count, a running
+total and a KLL quantile sketch per price kind. Sketches merge, so guidance
+for a parent category is the merge of its descendants' rows and never
+touches the products or sales tables.
+
+A listing counts once while it's active: a price change moves it from the
+old price to the new one, and deactivating, selling or deleting it removes
+it from the count and total. Sketches can't forget values, so listing
+quantiles keep superseded prices until the periodic rebuild_market_stats
+run (see CELERY_BEAT_SCHEDULE) recomputes them from active listings.
+"""
+import math
+import random
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+
+PRICE_KINDS = ('listing', 'sale')
+GUIDANCE_QUANTILES = {'p10': 0.1, 'p25': 0.25, 'median': 0.5, 'p75': 0.75, 'p90': 0.9}
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch: a stack of compactors where an item at level h
+    stands for 2**h observations. Mergeable and JSON-serializable.
+    """
+
+    def __init__(self, k=None, compactors=None):
+        self.k = k or settings.MARKET_SKETCH_K
+        self.compactors = compactors or [[]]
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(k=data['k'], compactors=data['compactors'])
+
+    def to_dict(self):
+        return {'k': self.k, 'compactors': self.compactors}
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items = sorted(self.compactors[level])
+                leftover = [items.pop()] if len(items) % 2 else []
+                self.compactors[level + 1].extend(items[random.randint(0, 1)::2])
+                self.compactors[level] = leftover
+            level += 1
+
+    def add(self, value):
+        self.compactors[0].append(float(value))
+        self._compress()
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self._compress()
+
+    def quantiles(self, fractions):
+        """Approximate values at each fraction in [0, 1], or None when empty."""
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+        total = sum(weight for _, weight in weighted)
+        if not total:
+            return [None] * len(fractions)
+
+        results = []
+        for fraction in fractions:
+            target, cumulative = fraction * total, 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    break
+            results.append(value)
+        return results
+
+
+def normalize_label(value):
+    return ' '.join((value or '').lower().split())
+
+
+def stats_keys(brand, model):
+    """
+    (brand, model) scopes a price is recorded under: the whole category,
+    the brand, and the brand and model.
+    """
+    brand, model = normalize_label(brand), normalize_label(model)
+    keys = [('', '')]
+    if brand:
+        keys.append((brand, ''))
+        if model:
+            keys.append((brand, model))
+    return keys
+
+
+def record_price(category_id, brand, model, kind, price, remove=False):
+    """
+    Fold one observed price into the aggregates for every scope it belongs
+    to, or take it out of the count and total when remove is set.
+    """
+    from .models import MarketPriceStats
+
+    price = Decimal(str(price))
+    with transaction.atomic():
+        for brand_key, model_key in stats_keys(brand, model):
+            MarketPriceStats.objects.get_or_create(
+                category_id=category_id, brand=brand_key, model=model_key
+            )
+            stats = MarketPriceStats.objects.select_for_update().get(
+                category_id=category_id, brand=brand_key, model=model_key
+            )
+            if remove:
+                setattr(stats, f'{kind}_count', max(getattr(stats, f'{kind}_count') - 1, 0))
+                setattr(stats, f'{kind}_total', max(getattr(stats, f'{kind}_total') - price, Decimal('0')))
+            else:
+                sketch = QuantileSketch.from_dict(getattr(stats, f'{kind}_sketch'))
+                sketch.add(price)
+                setattr(stats, f'{kind}_sketch', sketch.to_dict())
+                setattr(stats, f'{kind}_count', getattr(stats, f'{kind}_count') + 1)
+                setattr(stats, f'{kind}_total', getattr(stats, f'{kind}_total') + price)
+            stats.save()
+
+
+def price_guidance(category_ids, brand='', model=''):
+    """
+    Merge the aggregates of the given categories into count, mean and
+    quantiles for listing and sale prices.
+    """
+    from .models import MarketPriceStats
+
+    rows = MarketPriceStats.objects.filter(
+        category_id__in=category_ids,
+        brand=normalize_label(brand),
+        model=normalize_label(model) if brand else ''
+    )
+
+    guidance = {}
+    for kind in PRICE_KINDS:
+        count, total, sketch = 0, Decimal('0'), QuantileSketch()
+        for stats in rows:
+            count += getattr(stats, f'{kind}_count')
+            total += getattr(stats, f'{kind}_total')
+            sketch.merge(QuantileSketch.from_dict(getattr(stats, f'{kind}_sketch')))
+
+        values = sketch.quantiles(list(GUIDANCE_QUANTILES.values()))
+        guidance[kind] = {
+            'count': count,
+            'mean': str(round(total / count, 2)) if count else None,
+            **{
+                name: round(value, 2) if value is not None else None
+                for name, value in zip(GUIDANCE_QUANTILES, values)
+            }
+        }
+    return guidance
+
+
+def listing_market_entry(values):
+    """
+    (category_id, brand, model, price) a listing contributes to the listing
+    aggregates, or None while it isn't an active listing.
+    """
+    if not values.get('is_active') or values.get('is_deleted') or values.get('category_id') is None:
+        return None
+    return (str(values['category_id']), values.get('brand') or '', values.get('model') or '', str(values['price']))
\ No newline at end of file
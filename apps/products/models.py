@@ -2,18 +2,23 @@
 Product models for Evolution Digital Market.
 """
 from django.db import models
+from django.db.models import Q
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from taggit.managers import TaggableManager
-from apps.core.models import SoftDeleteModel, Address, SEOModel
+from django_cleanup import cleanup
+from apps.core.models import SoftDeleteModel, Address, SEOModel, TrackedFieldsMixin
+from apps.core.utils import compute_image_hash, hamming_distance, split_image_hash
 from apps.categories.models import Category
 import uuid
 
 User = get_user_model()
 
 
-class Product(SoftDeleteModel, SEOModel):
+class Product(TrackedFieldsMixin, SoftDeleteModel, SEOModel):
     """
     Main product model for marketplace listings.
     """
@@ -73,6 +78,11 @@ class Product(SoftDeleteModel, SEOModel):
     likes = models.PositiveIntegerField(default=0)
     shares = models.PositiveIntegerField(default=0)
     
+    # Review aggregates, maintained with F() deltas by review signals
+    review_count = models.PositiveIntegerField(default=0)
+    review_rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    
     # Timing
     expires_at = models.DateTimeField(null=True, blank=True)
     sold_at = models.DateTimeField(null=True, blank=True)
@@ -90,12 +100,22 @@ class Product(SoftDeleteModel, SEOModel):
             models.Index(fields=['seller', 'status']),
             models.Index(fields=['is_boosted', 'boost_expires_at']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['-average_rating', '-review_count'], name='products_rating_idx'),
+            GinIndex(fields=['attributes'], name='products_attributes_gin', opclasses=['jsonb_path_ops']),
         ]
 
+    REVIEW_AGGREGATE_FIELDS = {'review_count', 'review_rating_sum', 'average_rating'}
+
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            # Review aggregates are only written with atomic deltas
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.REVIEW_AGGREGATE_FIELDS
+            ]
         if not self.slug:
             from django.utils.text import slugify
             base_slug = slugify(self.title)
@@ -145,10 +165,51 @@ class Product(SoftDeleteModel, SEOModel):
         self.views += 1
         self.save(update_fields=['views'])
 
+    def get_image_duplicates(self, max_distance=None):
+        """Other listings that share a near-identical image with this one."""
+        product_ids = set()
+        for image in self.images.exclude(image_hash=''):
+            for match in ProductImage.objects.exclude(product=self).find_similar(
+                image.hash_value, max_distance
+            ):
+                product_ids.add(match.product_id)
+        return Product.objects.filter(id__in=product_ids)
+
+
+class ProductImageQuerySet(models.QuerySet):
+    """
+    QuerySet with perceptual-hash lookups for product images.
+    """
 
-class ProductImage(models.Model):
+    def find_similar(self, image_hash, max_distance=None):
+        """
+        Return images within max_distance bits of image_hash, closest first.
+        Candidates are narrowed with the indexed hash bands before the exact
+        Hamming distance is checked.
+        """
+        if max_distance is None:
+            max_distance = settings.IMAGE_HASH_MAX_DISTANCE
+
+        band_filter = Q()
+        for i, band in enumerate(split_image_hash(image_hash)):
+            band_filter |= Q(**{f'hash_band_{i}': band})
+
+        matches = []
+        for image in self.filter(band_filter).exclude(image_hash=''):
+            distance = hamming_distance(image.hash_value, image_hash)
+            if distance <= max_distance:
+                matches.append((distance, image))
+        matches.sort(key=lambda match: match[0])
+        return [image for distance, image in matches]
+
+
+@cleanup.ignore
+class ProductImage(TrackedFieldsMixin, models.Model):
     """
     Product images with ordering and primary image designation.
+    Files may be shared between identical uploads, so they are removed by
+    the products signals once no image references them, whether the image
+    was deleted or saved with a different file.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -158,10 +219,25 @@ class ProductImage(models.Model):
     is_primary = models.BooleanField(default=False)
     sort_order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    
+    # Perceptual hash (64-bit dHash as hex) and its 16-bit bands for lookups
+    image_hash = models.CharField(max_length=16, blank=True, db_index=True)
+    hash_band_0 = models.PositiveIntegerField(null=True, blank=True)
+    hash_band_1 = models.PositiveIntegerField(null=True, blank=True)
+    hash_band_2 = models.PositiveIntegerField(null=True, blank=True)
+    hash_band_3 = models.PositiveIntegerField(null=True, blank=True)
+
+    objects = ProductImageQuerySet.as_manager()
 
     class Meta:
         db_table = 'product_images'
         ordering = ['sort_order', 'created_at']
+        indexes = [
+            models.Index(fields=['hash_band_0']),
+            models.Index(fields=['hash_band_1']),
+            models.Index(fields=['hash_band_2']),
+            models.Index(fields=['hash_band_3']),
+        ]
 
     def __str__(self):
         return f"Image for {self.product.title}"
@@ -173,8 +249,50 @@ class ProductImage(models.Model):
                 product=self.product,
                 is_primary=True
             ).exclude(id=self.id).update(is_primary=False)
+        
+        # Hash fresh uploads in-process, replacing the hash of any file they
+        # supersede; files already in storage (direct uploads, legacy rows)
+        # are hashed by the upload task or backfill
+        if self.image and not self.image._committed:
+            self.set_image_hash(compute_image_hash(self.image))
+            
+            # Reuse stored renditions only for an identical hash; near matches
+            # are different photos and keep their own files
+            if self.image_hash:
+                match = ProductImage.objects.find_similar(self.hash_value, max_distance=0)[:1]
+                if match:
+                    self.image = match[0].image.name
+                    self.thumbnail = match[0].thumbnail.name
         super().save(*args, **kwargs)
 
+    def previous_file_name(self, field_name):
+        """
+        Name of the file a field held when last loaded or saved, if it has
+        been replaced since.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if not loaded or not loaded.get(field_name):
+            return None
+        previous = loaded[field_name]
+        previous = getattr(previous, 'name', previous)
+        current = getattr(self, field_name).name
+        return previous if previous != current else None
+
+    @property
+    def hash_value(self):
+        return int(self.image_hash, 16) if self.image_hash else None
+
+    def set_image_hash(self, value):
+        """Store the perceptual hash and its lookup bands, or clear them."""
+        if value is None:
+            self.image_hash = ''
+            for i in range(4):
+                setattr(self, f'hash_band_{i}', None)
+            return
+        self.image_hash = f"{value:016x}"
+        for i, band in enumerate(split_image_hash(value)):
+            setattr(self, f'hash_band_{i}', band)
+
 
 class ProductWishlist(models.Model):
     """
@@ -292,4 +410,84 @@ class SavedSearch(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"{self.user.email} - {self.name}"
\ No newline at end of file
+        return f"{self.user.email} - {self.name}"
+
+
+class ProductPriceHistory(models.Model):
+    """
+    Append-only log of listing prices, written only when the price changes.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'product_price_history'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.title} at {self.price}"
+
+
+class ProductSignature(models.Model):
+    """
+    MinHash signature of a listing's title and description.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='signature')
+    signature = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'product_signatures'
+
+    def __str__(self):
+        return f"Signature for {self.product.title}"
+
+
+class ProductLSHBucket(models.Model):
+    """
+    LSH band buckets used to find near-duplicate listing candidates.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='lsh_buckets')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.CharField(max_length=32)
+
+    class Meta:
+        db_table = 'product_lsh_buckets'
+        indexes = [
+            models.Index(fields=['band', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"Band {self.band} bucket for {self.product.title}"
+
+
+class MarketPriceStats(models.Model):
+    """
+    Incremental listing and sale price aggregates for a category, optionally
+    narrowed to a brand or brand and model. Sketches are KLL quantile sketches.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='market_stats')
+    brand = models.CharField(max_length=100, blank=True)
+    model = models.CharField(max_length=100, blank=True)
+    
+    listing_count = models.PositiveIntegerField(default=0)
+    listing_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    listing_sketch = models.JSONField(default=dict, blank=True)
+    
+    sale_count = models.PositiveIntegerField(default=0)
+    sale_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    sale_sketch = models.JSONField(default=dict, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'market_price_stats'
+        unique_together = ['category', 'brand', 'model']
+
+    def __str__(self):
+        scope = ' '.join(filter(None, [self.brand, self.model]))
+        return f"{self.category.name} {scope}".strip()
\ No newline at end of file
@@ -2,10 +2,14 @@
 Serializers for products.
 """
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import Product, ProductImage, ProductWishlist, ProductReport, SavedSearch
+from .duplicates import find_similar_listings, listing_signature
 from apps.accounts.serializers import PublicUserSerializer
-from apps.categories.serializers import CategoryListSerializer
+from apps.categories.attributes import clean_listing_attributes
+from apps.categories.serializers import CategorySummaryField
 
 User = get_user_model()
 
@@ -24,7 +28,7 @@ class ProductListSerializer(serializers.ModelSerializer):
     Serializer for product list views.
     """
     seller = PublicUserSerializer(read_only=True)
-    category = CategoryListSerializer(read_only=True)
+    category = CategorySummaryField(source='category_id')
     main_image = ProductImageSerializer(read_only=True)
     is_wishlisted = serializers.SerializerMethodField()
     distance = serializers.SerializerMethodField()
@@ -34,8 +38,8 @@ class ProductListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'slug', 'price', 'condition', 'location',
             'seller', 'category', 'main_image', 'views', 'likes',
-            'is_boosted', 'is_featured', 'created_at', 'is_wishlisted',
-            'distance'
+            'review_count', 'average_rating', 'is_boosted', 'is_featured',
+            'created_at', 'is_wishlisted', 'distance'
         ]
 
     def get_is_wishlisted(self, obj):
@@ -58,8 +62,8 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     Serializer for detailed product view.
     """
     seller = PublicUserSerializer(read_only=True)
-    category = CategoryListSerializer(read_only=True)
-    subcategory = CategoryListSerializer(read_only=True)
+    category = CategorySummaryField(source='category_id')
+    subcategory = CategorySummaryField(source='subcategory_id', allow_null=True)
     images = ProductImageSerializer(many=True, read_only=True)
     is_wishlisted = serializers.SerializerMethodField()
     is_owner = serializers.SerializerMethodField()
@@ -73,7 +77,8 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'brand', 'model', 'category', 'subcategory', 'seller',
             'location', 'pickup_available', 'delivery_available',
             'shipping_cost', 'status', 'is_active', 'is_featured',
-            'is_boosted', 'views', 'likes', 'shares', 'images',
+            'is_boosted', 'views', 'likes', 'shares', 'review_count',
+            'average_rating', 'images',
             'attributes', 'tags_list', 'created_at', 'updated_at',
             'is_wishlisted', 'is_owner', 'related_products'
         ]
@@ -95,7 +100,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
 
     def get_related_products(self, obj):
         related = Product.objects.filter(
-            category=obj.category,
+            category_id=obj.category_id,
             is_active=True,
             status='active'
         ).exclude(id=obj.id)[:4]
@@ -127,6 +132,42 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
             'images', 'uploaded_images'
         ]
 
+    def validate(self, attrs):
+        if self.instance is None or {'attributes', 'category', 'subcategory'} & set(attrs):
+            attrs['attributes'] = self.clean_attributes(attrs)
+        
+        if settings.BLOCK_DUPLICATE_LISTINGS and self.instance is None:
+            own_listings = Product.objects.filter(
+                seller=self.context['request'].user,
+                is_active=True,
+                status__in=['draft', 'active']
+            )
+            signature = listing_signature(attrs.get('title', ''), attrs.get('description', ''))
+            if signature is not None and find_similar_listings(signature, queryset=own_listings):
+                raise serializers.ValidationError(
+                    "This listing is a near-duplicate of one of your existing listings."
+                )
+        return attrs
+
+    def clean_attributes(self, attrs):
+        """
+        Coerce attributes with the compiled schema of the listing's most
+        specific category.
+        """
+        if 'subcategory' in attrs:
+            subcategory_id = attrs['subcategory'].id if attrs['subcategory'] else None
+        else:
+            subcategory_id = getattr(self.instance, 'subcategory_id', None)
+        category_id = attrs['category'].id if 'category' in attrs else self.instance.category_id
+        data = attrs['attributes'] if 'attributes' in attrs else getattr(self.instance, 'attributes', {})
+        
+        try:
+            return clean_listing_attributes(subcategory_id or category_id, data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({
+                'attributes': e.message_dict if hasattr(e, 'error_dict') else e.messages
+            })
+
     def create(self, validated_data):
         uploaded_images = validated_data.pop('uploaded_images', [])
         validated_data['seller'] = self.context['request'].user
@@ -1,20 +1,85 @@
 """
 Signals for products app.
 """
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Product, ProductSale
+from .models import Product, ProductImage, ProductPriceHistory, ProductSale, ProductWishlist
+from .duplicates import index_product
+from .market import listing_market_entry
+from apps.core.utils import bump_cache_version
+
+# Saves limited to these fields don't change any cached or validated payload
+ENGAGEMENT_FIELDS = {'views', 'likes', 'shares'}
 
 
 @receiver(post_save, sender=Product)
-def update_category_product_count(sender, instance, **kwargs):
+def update_category_product_count(sender, instance, update_fields=None, **kwargs):
     """
     Update category product count when product is saved.
     """
+    if update_fields is not None and set(update_fields) <= ENGAGEMENT_FIELDS:
+        return
     if instance.category:
         instance.category.update_product_count()
 
 
+@receiver(post_save, sender=Product)
+def index_listing_signature(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Refresh the listing's MinHash signature when its text changes.
+    """
+    if update_fields is not None and not {'title', 'description'} & set(update_fields):
+        return
+    if created or instance.field_changed('title') or instance.field_changed('description'):
+        index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def record_price_change(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Append to the price history when the price changes, and fan out
+    price-drop alerts after the transaction commits.
+    """
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    if not created and not instance.field_changed('price'):
+        return
+    
+    ProductPriceHistory.objects.create(product=instance, price=instance.price)
+    
+    previous_price = None if created else getattr(instance, '_loaded_values', {}).get('price')
+    if previous_price is not None and instance.price < previous_price:
+        from .tasks import notify_price_drop
+        product_id, old_price, new_price = str(instance.id), str(previous_price), str(instance.price)
+        transaction.on_commit(lambda: notify_price_drop.delay(product_id, old_price, new_price))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_listing_market_stats(sender, instance, signal, created=False, update_fields=None, **kwargs):
+    """
+    Move the listing's price in the market aggregates when its price,
+    scope or active state changes.
+    """
+    if update_fields is not None and set(update_fields) <= ENGAGEMENT_FIELDS:
+        return
+    
+    fields = ('is_active', 'is_deleted', 'category_id', 'brand', 'model', 'price')
+    current = {name: getattr(instance, name) for name in fields}
+    loaded = getattr(instance, '_loaded_values', {})
+    previous = None if created else listing_market_entry({name: loaded.get(name) for name in fields})
+    new = None if signal is post_delete else listing_market_entry(current)
+    if previous == new:
+        return
+    
+    from .tasks import record_market_price
+    if previous is not None:
+        transaction.on_commit(lambda: record_market_price.delay(*previous[:3], 'listing', previous[3], True))
+    if new is not None:
+        transaction.on_commit(lambda: record_market_price.delay(*new[:3], 'listing', new[3]))
+
+
 @receiver(post_delete, sender=Product)
 def update_category_product_count_on_delete(sender, instance, **kwargs):
     """
@@ -32,4 +97,77 @@ def update_seller_stats(sender, instance, created, **kwargs):
     if created:
         profile = instance.seller.profile
         profile.total_sales += 1
-        profile.save()
\ No newline at end of file
+        profile.save()
+
+
+@receiver(post_save, sender=ProductSale)
+def record_sale_price(sender, instance, created, **kwargs):
+    """
+    Add the sale price to the category market aggregates.
+    """
+    if not created:
+        return
+    
+    from .tasks import record_market_price
+    product = instance.product
+    market_args = (str(product.category_id), product.brand, product.model, 'sale', str(instance.sale_price))
+    transaction.on_commit(lambda: record_market_price.delay(*market_args))
+
+
+def delete_unshared_image_file(field_name, name):
+    """
+    Delete a stored image file unless a product image still references it.
+    """
+    if not ProductImage.objects.filter(**{field_name: name}).exists():
+        ProductImage._meta.get_field(field_name).storage.delete(name)
+
+
+@receiver(post_delete, sender=ProductImage)
+def delete_unshared_image_files(sender, instance, **kwargs):
+    """
+    Delete image files once no other product image reuses them, after the
+    transaction commits so a rolled back delete keeps its files.
+    """
+    for field_name in ('image', 'thumbnail'):
+        field_file = getattr(instance, field_name)
+        if field_file:
+            transaction.on_commit(
+                lambda field_name=field_name, name=field_file.name: delete_unshared_image_file(field_name, name)
+            )
+
+
+@receiver(post_save, sender=ProductImage)
+def delete_replaced_image_files(sender, instance, created, **kwargs):
+    """
+    Delete the files an image was saved away from once nothing reuses them.
+    """
+    if created:
+        return
+    for field_name in ('image', 'thumbnail'):
+        previous_name = instance.previous_file_name(field_name)
+        if previous_name:
+            transaction.on_commit(
+                lambda field_name=field_name, name=previous_name: delete_unshared_image_file(field_name, name)
+            )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_category_products_version(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalidate validators for listings that embed related products.
+    """
+    if update_fields is not None and set(update_fields) <= ENGAGEMENT_FIELDS:
+        return
+    bump_cache_version(f'category-products:{instance.category_id}')
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductWishlist)
+@receiver(post_delete, sender=ProductWishlist)
+def bump_product_version(sender, instance, **kwargs):
+    """
+    Invalidate product validators when nested images or wishlists change.
+    """
+    bump_cache_version(f'product:{instance.product_id}')
@@ -0,0 +1,130 @@
+"""
+Celery tasks for products app.
+"""
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.template import Context, Template
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def saved_search_matches(product):
+    """
+    Ids of users with an active saved search that the product satisfies.
+    """
+    from .filters import saved_searches_matching
+    return {search.user_id for search in saved_searches_matching(product)}
+
+
+def price_drop_recipients(product, new_price):
+    """
+    Users who wishlisted the product or have an active saved search that
+    matches it at its new price.
+    """
+    return User.objects.filter(
+        Q(wishlist__product=product) | Q(id__in=saved_search_matches(product)),
+        is_active=True,
+        notification_preferences__push_price_alerts=True
+    ).exclude(id=product.seller_id).values_list('id', flat=True).distinct()
+
+
+@shared_task
+def notify_price_drop(product_id, old_price, new_price):
+    """
+    Find everyone interested in a product whose price dropped and fan the
+    notifications out in chunks.
+    """
+    from .models import Product
+
+    try:
+        product = Product.objects.select_related('category', 'seller', 'location').get(
+            id=product_id,
+            is_active=True,
+            status='active'
+        )
+    except Product.DoesNotExist:
+        return
+
+    # Skip stale alerts if the price has moved again since the drop
+    if product.price != Decimal(new_price):
+        return
+
+    recipient_ids = [str(user_id) for user_id in price_drop_recipients(product, new_price)]
+    chunk_size = settings.PRICE_DROP_FANOUT_CHUNK_SIZE
+    for start in range(0, len(recipient_ids), chunk_size):
+        send_price_drop_notifications.delay(
+            product_id, recipient_ids[start:start + chunk_size], old_price, new_price
+        )
+
+
+@shared_task
+def send_price_drop_notifications(product_id, recipient_ids, old_price, new_price):
+    """
+    Create price-drop notifications for one chunk of recipients.
+    """
+    from apps.notifications.models import Notification, NotificationTemplate
+    from .models import Product
+
+    template = NotificationTemplate.objects.filter(
+        notification_type='price_drop',
+        is_active=True
+    ).first()
+    if not template:
+        logger.warning("No active price_drop notification template; skipping alerts")
+        return
+
+    try:
+        product = Product.objects.get(id=product_id)
+    except Product.DoesNotExist:
+        return
+
+    context = Context({'product': product, 'old_price': old_price, 'new_price': new_price})
+    title = Template(template.title_template).render(context)[:200]
+    message = Template(template.message_template).render(context)
+
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient_id,
+            template=template,
+            title=title,
+            message=message,
+            content_object=product,
+            data={
+                'product_id': product_id,
+                'old_price': old_price,
+                'new_price': new_price,
+            },
+            action_url=f"{settings.FRONTEND_URL}/products/{product.slug}"
+        )
+        for recipient_id in recipient_ids
+    ])
+
+    # bulk_create skips post_save, so push to inbox sockets here
+    from apps.chat.events import publish_notification
+    for notification in notifications:
+        publish_notification(notification)
+
+
+@shared_task
+def record_market_price(category_id, brand, model, kind, price, remove=False):
+    """
+    Fold a listing or sale price into the category market aggregates, or
+    take a superseded listing price out of them.
+    """
+    from .market import record_price
+    record_price(category_id, brand, model, kind, price, remove=remove)
+
+
+@shared_task
+def rebuild_market_stats():
+    """
+    Periodic full rebuild, which also drops superseded prices from sketches.
+    """
+    from django.core.management import call_command
+    call_command('rebuild_market_stats')
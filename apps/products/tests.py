@@ -0,0 +1,280 @@
+"""
+Tests for products.
+"""
+import io
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from apps.categories import cache as category_cache
+from apps.categories.models import Category
+from apps.core.utils import bump_cache_version
+from .duplicates import duplicate_clusters
+from .filters import ProductFilter
+from .models import Product, ProductImage, ProductSignature, SavedSearch
+from .tasks import saved_search_matches
+
+User = get_user_model()
+
+
+class CategoryFilterTests(TestCase):
+    """
+    Category filters match the whole subtree with one indexed IN lookup.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        cls.electronics = Category.objects.create(name='Electronics')
+        cls.phones = Category.objects.create(name='Phones', parent=cls.electronics)
+        cls.smartphones = Category.objects.create(name='Smartphones', parent=cls.phones)
+        cls.furniture = Category.objects.create(name='Furniture')
+
+        cls.products = {
+            category.name: Product.objects.create(
+                title=f'{category.name} listing',
+                description='For sale',
+                price='10.00',
+                category=category,
+                condition='used',
+                seller=cls.seller,
+                status='active'
+            )
+            for category in [cls.electronics, cls.phones, cls.smartphones, cls.furniture]
+        }
+
+    def setUp(self):
+        # Start from a fresh snapshot rather than one left by another test
+        patcher = mock.patch.object(category_cache, 'CATEGORY_CACHE_CHECK_SECONDS', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        bump_cache_version('categories')
+        category_cache.get_category_cache()
+
+    def filtered_ids(self, data):
+        filterset = ProductFilter(data, queryset=Product.objects.all())
+        # Validating the category choice looks up its row; only count filtering
+        self.assertTrue(filterset.is_valid())
+        with CaptureQueriesContext(connection) as queries:
+            ids = set(filterset.qs.values_list('id', flat=True))
+        return ids, queries.captured_queries
+
+    def assert_single_in_lookup(self, queries):
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"category_id" IN (', sql)
+        self.assertNotIn('"categories"', sql)
+        self.assertNotIn('"lft"', sql)
+
+    def test_category_includes_descendants(self):
+        ids, queries = self.filtered_ids({'category': str(self.electronics.id)})
+        self.assertEqual(ids, {
+            self.products[name].id for name in ['Electronics', 'Phones', 'Smartphones']
+        })
+        self.assert_single_in_lookup(queries)
+
+    def test_category_slug_includes_descendants(self):
+        ids, queries = self.filtered_ids({'category_slug': self.phones.slug})
+        self.assertEqual(ids, {self.products['Phones'].id, self.products['Smartphones'].id})
+        self.assert_single_in_lookup(queries)
+
+    def test_category_column_is_indexed(self):
+        self.assertTrue(Product._meta.get_field('category').db_index)
+
+    @skipUnless(connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL-specific')
+    def test_plan_scans_category_index(self):
+        queryset = ProductFilter({'category_slug': self.electronics.slug}, queryset=Product.objects.all()).qs
+        with connection.cursor() as cursor:
+            # The test tables are tiny, so rule out the sequential scan
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn('Index', plan)
+        self.assertIn('category_id', plan)
+        self.assertNotIn('Recursive', plan)
+
+
+class SavedSearchMatchTests(TestCase):
+    """
+    Saved searches are matched against a product in a fixed number of
+    queries, however many of them there are.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        cls.electronics = Category.objects.create(name='Electronics')
+        cls.phones = Category.objects.create(name='Phones', parent=cls.electronics)
+        cls.furniture = Category.objects.create(name='Furniture')
+        cls.product = Product.objects.create(
+            title='Blue iPhone',
+            description='Barely used',
+            price='90.00',
+            category=cls.phones,
+            condition='used',
+            seller=cls.seller,
+            status='active'
+        )
+
+    def save_search(self, name, query='', **filters):
+        user = User.objects.create_user(email=f'{name}@example.com', username=name)
+        SavedSearch.objects.create(user=user, name=name, query=query, filters=filters)
+        return user.id
+
+    def test_matches_like_product_filter(self):
+        expected = {
+            self.save_search('text', query='iphone', category=str(self.phones.id)),
+            self.save_search('price', category_slug=self.phones.slug, max_price='100'),
+            self.save_search('parent', category_slug=self.electronics.slug),
+            self.save_search('flags', condition='used', is_featured='false'),
+            self.save_search('filter_text', search='blue'),
+        }
+        self.save_search('text_miss', query='samsung', category=str(self.phones.id))
+        self.save_search('price_miss', category_slug=self.phones.slug, max_price='50')
+        self.save_search('other_category', category=str(self.furniture.id))
+        self.save_search('condition_miss', condition='new')
+        self.save_search('flag_miss', is_featured='true')
+
+        self.assertEqual(saved_search_matches(self.product), expected)
+
+    def count_queries(self, prefix, searches):
+        for index in range(searches):
+            self.save_search(f'{prefix}{index}', query='iphone', min_price=str(index))
+        product = Product.objects.select_related('category', 'seller', 'location').get(id=self.product.id)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(saved_search_matches(product)), searches)
+        return len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_searches(self):
+        few = self.count_queries('few', 3)
+        SavedSearch.objects.all().delete()
+        self.assertEqual(self.count_queries('many', 15), few)
+
+
+class DuplicateListingTests(TestCase):
+    """
+    Near-duplicate listings cluster together; listings without text are
+    never indexed.
+    """
+
+    def setUp(self):
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.category = Category.objects.create(name='Phones')
+
+    def create_listing(self, title, description):
+        return Product.objects.create(
+            title=title,
+            description=description,
+            price='10.00',
+            category=self.category,
+            condition='used',
+            seller=self.seller
+        )
+
+    def test_near_duplicates_cluster(self):
+        description = 'Unlocked phone with 128GB storage, original box and charger, no scratches'
+        first = self.create_listing('iPhone 13 blue', description)
+        second = self.create_listing('iPhone 13 blue', description + ' at all')
+        self.create_listing('Oak dining table', 'Solid oak table that seats six people comfortably')
+
+        self.assertEqual([set(cluster) for cluster in duplicate_clusters()], [{first.id, second.id}])
+
+    def test_listings_without_words_are_not_indexed(self):
+        first = self.create_listing('!!!', '')
+        second = self.create_listing('???', ' ')
+
+        self.assertFalse(ProductSignature.objects.filter(product__in=[first, second]).exists())
+        self.assertEqual(duplicate_clusters(), [])
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload(name, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), color).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ProductImageFileTests(TestCase):
+    """
+    Stored image files are shared only between identical uploads and are
+    deleted once no image references them.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.product = Product.objects.create(
+            title='Used phone',
+            description='Works fine',
+            price='10.00',
+            category=Category.objects.create(name='Phones'),
+            condition='used',
+            seller=seller
+        )
+
+    def create_image(self, name, image_hash):
+        with mock.patch('apps.products.models.compute_image_hash', return_value=image_hash):
+            return ProductImage.objects.create(product=self.product, image=image_upload(name, 'red'))
+
+    def test_identical_hash_reuses_stored_file(self):
+        first = self.create_image('first.png', 0xF0F0F0F0F0F0F0F0)
+        second = self.create_image('second.png', 0xF0F0F0F0F0F0F0F0)
+        self.assertEqual(second.image.name, first.image.name)
+
+    def test_near_identical_hash_keeps_its_own_file(self):
+        first = self.create_image('first.png', 0xF0F0F0F0F0F0F0F0)
+        second = self.create_image('second.png', 0xF0F0F0F0F0F0F0F1)
+        self.assertNotEqual(second.image.name, first.image.name)
+        self.assertTrue(default_storage.exists(second.image.name))
+
+    def test_replaced_file_is_deleted(self):
+        image = self.create_image('first.png', 0x1)
+        old_name = image.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('apps.products.models.compute_image_hash', return_value=0x2):
+                image.image = image_upload('second.png', 'blue')
+                image.save()
+
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertTrue(default_storage.exists(image.image.name))
+        self.assertEqual(image.image_hash, f'{0x2:016x}')
+
+    def test_replaced_file_still_shared_is_kept(self):
+        image = self.create_image('first.png', 0x1)
+        sharing = self.create_image('copy.png', 0x1)
+        shared_name = image.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('apps.products.models.compute_image_hash', return_value=0x2):
+                image.image = image_upload('second.png', 'blue')
+                image.save()
+
+        self.assertEqual(sharing.image.name, shared_name)
+        self.assertTrue(default_storage.exists(shared_name))
+
+    def test_deleted_image_file_is_kept_until_commit(self):
+        image = self.create_image('first.png', 0x1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            image.delete()
+        self.assertTrue(callbacks)
+        self.assertTrue(default_storage.exists(image.image.name))
+
+    def test_deleted_image_file_is_removed(self):
+        image = self.create_image('first.png', 0x1)
+        name = image.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(default_storage.exists(name))
@@ -12,6 +12,8 @@ urlpatterns = [
     path('featured/', views.featured_products, name='featured-products'),
     path('trending/', views.trending_products, name='trending-products'),
     path('stats/', views.product_stats, name='product-stats'),
+    path('duplicates/', views.duplicate_listing_clusters, name='duplicate-clusters'),
+    path('price-guidance/', views.price_guidance, name='price-guidance'),
     
     # Product CRUD
     path('create/', views.ProductCreateView.as_view(), name='product-create'),
@@ -19,6 +21,8 @@ urlpatterns = [
     path('<uuid:pk>/update/', views.ProductUpdateView.as_view(), name='product-update'),
     path('<uuid:pk>/delete/', views.ProductDeleteView.as_view(), name='product-delete'),
     path('<uuid:product_id>/sold/', views.mark_as_sold, name='mark-as-sold'),
+    path('<uuid:product_id>/duplicates/', views.product_duplicates, name='product-duplicates'),
+    path('<uuid:product_id>/price-history/', views.product_price_history, name='product-price-history'),
     
     # Product details
     path('<slug:slug>/', views.ProductDetailView.as_view(), name='product-detail'),
@@ -6,17 +6,25 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, F
 from django.utils import timezone
-from .models import Product, ProductWishlist, ProductReport, SavedSearch, ProductView
+from .models import (
+    Product, ProductWishlist, ProductReport, SavedSearch, ProductView, ProductPriceHistory
+)
 from .serializers import (
     ProductListSerializer, ProductDetailSerializer, ProductCreateUpdateSerializer,
     ProductWishlistSerializer, ProductReportSerializer, SavedSearchSerializer
 )
 from .filters import ProductFilter
+from .duplicates import duplicate_clusters, find_similar_listings
+from .market import price_guidance as market_price_guidance
+from apps.categories.cache import get_category_id_by_slug, get_descendant_ids
+from apps.core.mixins import ConditionalRetrieveMixin
 from apps.core.permissions import IsSellerOrReadOnly, CanCreateListing
+from apps.core.utils import get_cache_versions
 from apps.core.pagination import CustomPageNumberPagination
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +38,7 @@ class ProductListView(generics.ListAPIView):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = ProductFilter
     search_fields = ['title', 'description', 'brand', 'model']
-    ordering_fields = ['price', 'created_at', 'views', 'likes']
+    ordering_fields = ['price', 'created_at', 'views', 'likes', 'average_rating', 'review_count']
     ordering = ['-is_boosted', '-created_at']
     pagination_class = CustomPageNumberPagination
 
@@ -41,7 +49,7 @@ class ProductListView(generics.ListAPIView):
         ).select_related('seller', 'category').prefetch_related('images')
 
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductDetailView(ConditionalRetrieveMixin, generics.RetrieveAPIView):
     """
     Retrieve detailed product information.
     """
@@ -54,11 +62,38 @@ class ProductDetailView(generics.RetrieveAPIView):
             is_active=True
         ).select_related('seller', 'category', 'subcategory').prefetch_related('images')
 
+    def get_validators(self, request, *args, **kwargs):
+        row = Product.objects.filter(
+            slug=kwargs['slug'],
+            is_active=True
+        ).values_list('id', 'category_id', 'seller_id', 'updated_at', 'seller__updated_at').first()
+        if row is None:
+            return None
+        
+        product_id, category_id, seller_id, updated_at, seller_updated_at = row
+        self.validated_product_id = product_id
+        
+        # Nested images, wishlist state, seller profile, categories and
+        # related products are covered by change-version timestamps
+        timestamps = [updated_at.timestamp(), seller_updated_at.timestamp()] + get_cache_versions(
+            f'product:{product_id}',
+            f'category-products:{category_id}',
+            f'user:{seller_id}',
+            'categories',
+            'category-counts',
+        )
+        return [product_id] + timestamps, max(timestamps)
+
+    def not_modified(self, request, *args, **kwargs):
+        # A 304 still counts as a view
+        self.track_view(request, self.validated_product_id)
+        Product.objects.filter(id=self.validated_product_id).update(views=F('views') + 1)
+
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         
         # Track view
-        self.track_view(request, instance)
+        self.track_view(request, instance.id)
         
         # Increment view count
         instance.increment_views()
@@ -66,13 +101,13 @@ class ProductDetailView(generics.RetrieveAPIView):
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
-    def track_view(self, request, product):
+    def track_view(self, request, product_id):
         """Track product view for analytics."""
         ip_address = self.get_client_ip(request)
         user_agent = request.META.get('HTTP_USER_AGENT', '')
         
         ProductView.objects.create(
-            product=product,
+            product_id=product_id,
             user=request.user if request.user.is_authenticated else None,
             ip_address=ip_address,
             user_agent=user_agent
@@ -332,6 +367,54 @@ def mark_as_sold(request, product_id):
         return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_price_history(request, product_id):
+    """
+    Get the price history of a product.
+    """
+    history = ProductPriceHistory.objects.filter(
+        product_id=product_id,
+        product__is_active=True
+    ).order_by('created_at').values_list('price', 'created_at')
+    
+    return Response([
+        {'price': str(price), 'changed_at': changed_at.isoformat()}
+        for price, changed_at in history
+    ])
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def price_guidance(request):
+    """
+    Listing and sale price distribution for a category subtree, optionally
+    narrowed by brand and model. Reads only the market aggregates.
+    """
+    category_id = request.query_params.get('category')
+    category_slug = request.query_params.get('category_slug')
+    
+    if category_id:
+        try:
+            category_id = uuid.UUID(category_id)
+        except ValueError:
+            return Response({'error': 'Invalid category'}, status=status.HTTP_400_BAD_REQUEST)
+    elif category_slug:
+        category_id = get_category_id_by_slug(category_slug)
+    else:
+        return Response({'error': 'category or category_slug is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    category_ids = get_descendant_ids(category_id) if category_id else []
+    if not category_ids:
+        return Response({'error': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(market_price_guidance(
+        category_ids,
+        brand=request.query_params.get('brand', ''),
+        model=request.query_params.get('model', '')
+    ))
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def product_stats(request):
@@ -346,4 +429,68 @@ def product_stats(request):
         'boosted_products': Product.objects.filter(is_active=True, is_boosted=True).count(),
     }
     
-    return Response(stats)
\ No newline at end of file
+    return Response(stats)
+
+
+def duplicate_summary(product_ids):
+    """
+    Compact listing rows for moderator duplicate views.
+    """
+    products = Product.objects.filter(id__in=product_ids).select_related('seller')
+    return {
+        product.id: {
+            'id': str(product.id),
+            'title': product.title,
+            'slug': product.slug,
+            'price': str(product.price),
+            'status': product.status,
+            'seller': {'id': str(product.seller_id), 'email': product.seller.email},
+            'created_at': product.created_at.isoformat(),
+        }
+        for product in products
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def duplicate_listing_clusters(request):
+    """
+    Get clusters of near-duplicate listings for moderation.
+    """
+    clusters = duplicate_clusters()
+    summaries = duplicate_summary({pid for cluster in clusters for pid in cluster})
+    
+    return Response([
+        {
+            'size': len(cluster),
+            'products': [summaries[pid] for pid in cluster if pid in summaries],
+        }
+        for cluster in clusters
+    ])
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def product_duplicates(request, product_id):
+    """
+    Get near-duplicates of a listing by text and by image.
+    """
+    try:
+        product = Product.objects.select_related('signature').get(id=product_id)
+    except Product.DoesNotExist:
+        return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    signature = getattr(product, 'signature', None)
+    text_matches = []
+    if signature:
+        text_matches = find_similar_listings(signature.signature, exclude_product_id=product.id)
+    image_ids = set(product.get_image_duplicates().values_list('id', flat=True))
+    summaries = duplicate_summary({pid for pid, similarity in text_matches} | image_ids)
+    
+    return Response({
+        'text_duplicates': [
+            dict(summaries[pid], similarity=round(similarity, 2))
+            for pid, similarity in text_matches if pid in summaries
+        ],
+        'image_duplicates': [summaries[pid] for pid in image_ids if pid in summaries],
+    })
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Incremental review aggregates.
+
+Review writes are turned into deltas (a rating added, a rating removed)
+and applied with a single UPDATE of F() expressions, so maintaining the
+aggregates costs O(1) per write regardless of how many reviews exist.
+"""
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
+from apps.core.utils import bump_cache_version
+
+RATINGS = range(1, 6)
+
+
+def rating_average(sum_expression, count_expression):
+    """
+    Rounded average of two expressions, or 0 when the count is zero.
+    """
+    return Cast(
+        Coalesce(
+            Round(Cast(sum_expression, FloatField()) / NullIf(count_expression, 0), 2),
+            Value(0.0)
+        ),
+        DecimalField(max_digits=3, decimal_places=2)
+    )
+
+
+def update_profile_rating(user_id, added=None, removed=None):
+    """
+    Apply a review being added, removed or re-rated to the reviewee's
+    profile aggregates in one UPDATE.
+    """
+    from apps.accounts.models import UserProfile
+
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = (added or 0) - (removed or 0)
+    # Profiles that predate the aggregates start at zero, so a removal must
+    # not drive a counter negative
+    total_reviews = Greatest(F('total_reviews') + count_delta, 0)
+    rating_sum = Greatest(F('rating_sum') + sum_delta, 0)
+    changes = {
+        'total_reviews': total_reviews,
+        'rating_sum': rating_sum,
+        'seller_rating': rating_average(rating_sum, total_reviews),
+    }
+    if added is not None:
+        changes[f'rating_{added}_count'] = F(f'rating_{added}_count') + 1
+    if removed is not None:
+        changes[f'rating_{removed}_count'] = Greatest(F(f'rating_{removed}_count') - 1, 0)
+
+    UserProfile.objects.filter(user_id=user_id).update(**changes)
+    bump_cache_version(f'user:{user_id}')
+
+
+def rating_aggregates(reviews, group_by):
+    """
+    Count, rating sum and histogram per group in one conditional aggregate.
+    """
+    return reviews.values(group_by).annotate(
+        review_count=Count('id'),
+        rating_total=Sum('rating'),
+        **{f'rating_{stars}': Count('id', filter=Q(rating=stars)) for stars in RATINGS}
+    )
+
+
+# Summary column prefix for each optional detailed rating
+DETAIL_RATINGS = {
+    'communication': 'communication_rating',
+    'delivery': 'delivery_rating',
+    'description': 'item_description_rating',
+}
+
+SUMMARY_SOURCE_FIELDS = {
+    'product_id', 'reviewee_id', 'rating', 'is_verified', *DETAIL_RATINGS.values()
+}
+
+
+def review_contribution(values):
+    """
+    Summary columns contributed by one review, given its field values.
+    """
+    contribution = {
+        'review_count': 1,
+        'verified_count': int(bool(values['is_verified'])),
+        'rating_sum': values['rating'],
+        f"rating_{values['rating']}_count": 1,
+    }
+    for prefix, field in DETAIL_RATINGS.items():
+        if values[field] is not None:
+            contribution[f'{prefix}_sum'] = values[field]
+            contribution[f'{prefix}_count'] = 1
+    return contribution
+
+
+def negate(contribution):
+    return {field: -value for field, value in contribution.items()}
+
+
+def apply_summary_delta(delta, product_id=None, user_id=None, create=False):
+    """
+    Add a delta to a product or user summary row in one UPDATE. With
+    create, a missing row is built from the reviews, which already include
+    this write. Removals leave missing rows for the first read to build,
+    since the product or user may itself be being deleted.
+    """
+    from .models import ReviewSummary
+
+    delta = {field: value for field, value in delta.items() if value}
+    if not delta:
+        return
+
+    lookup = {'product_id': product_id} if product_id else {'user_id': user_id}
+    changes = {field: F(field) + value for field, value in delta.items()}
+    with transaction.atomic():
+        if ReviewSummary.objects.filter(**lookup).update(**changes) or not create:
+            return
+        summary, created = get_or_build_review_summary(**lookup)
+        if not created:
+            # Built concurrently from reviews that didn't include this write
+            ReviewSummary.objects.filter(**lookup).update(**changes)
+
+
+def update_product_rating(product_id, count_delta, sum_delta):
+    """
+    Apply a review count and rating sum delta to the product's denormalized
+    review columns in one UPDATE.
+    """
+    from apps.products.models import Product
+
+    if not count_delta and not sum_delta:
+        return
+    Product.all_objects.filter(id=product_id).update(
+        review_count=F('review_count') + count_delta,
+        review_rating_sum=F('review_rating_sum') + sum_delta,
+        average_rating=rating_average(F('review_rating_sum') + sum_delta, F('review_count') + count_delta),
+    )
+    category_id = Product.all_objects.filter(id=product_id).values_list('category_id', flat=True).first()
+    bump_cache_version(f'product:{product_id}', f'category-products:{category_id}')
+
+
+def apply_review_change(old=None, new=None):
+    """
+    Move a review's contribution between summaries and the product's review
+    columns. old and new are the review's field values before and after the
+    write; either may be None.
+    """
+    changes = []
+    if old is not None:
+        changes.append((old, negate(review_contribution(old))))
+    if new is not None:
+        changes.append((new, review_contribution(new)))
+
+    # A re-rated review with the same targets becomes a single net delta
+    if len(changes) == 2 and (old['product_id'], old['reviewee_id']) == (new['product_id'], new['reviewee_id']):
+        delta = changes[1][1]
+        for field, value in changes[0][1].items():
+            delta[field] = delta.get(field, 0) + value
+        changes = [(new, delta)]
+
+    for values, delta in changes:
+        apply_summary_delta(delta, product_id=values['product_id'], create=values is new)
+        apply_summary_delta(delta, user_id=values['reviewee_id'], create=values is new)
+        update_product_rating(values['product_id'], delta.get('review_count', 0), delta.get('rating_sum', 0))
+
+
+def get_or_build_review_summary(product_id=None, user_id=None):
+    """
+    Summary row for a product or user, built from its reviews with a single
+    conditional aggregate if it doesn't exist. A row created concurrently
+    wins, since deltas already keep it current. Returns (summary, created).
+    """
+    from .models import Review, ReviewSummary
+
+    lookup = {'product_id': product_id} if product_id else {'user_id': user_id}
+    reviews = Review.objects.filter(product_id=product_id) if product_id else Review.objects.filter(reviewee_id=user_id)
+
+    aggregates = {
+        'review_count': Count('id'),
+        'verified_count': Count('id', filter=Q(is_verified=True)),
+        'response_count': Count('response'),
+        'rating_sum': Coalesce(Sum('rating'), 0),
+        **{f'rating_{stars}_count': Count('id', filter=Q(rating=stars)) for stars in RATINGS},
+    }
+    for prefix, field in DETAIL_RATINGS.items():
+        aggregates[f'{prefix}_sum'] = Coalesce(Sum(field), 0)
+        aggregates[f'{prefix}_count'] = Count(field)
+
+    return ReviewSummary.objects.get_or_create(**lookup, defaults=reviews.aggregate(**aggregates))
\ No newline at end of file
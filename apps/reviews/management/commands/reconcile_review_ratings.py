@@ -0,0 +1,84 @@
+"""
+Recompute profile rating aggregates from the reviews table.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Extract, Log
+from apps.accounts.models import UserProfile
+from apps.core.utils import bump_cache_version
+from apps.products.models import Product
+from apps.reviews.aggregates import RATINGS, rating_aggregates
+from apps.reviews.models import HELPFUL_SCORE_DECAY_SECONDS, Review, ReviewSummary
+
+
+class Command(BaseCommand):
+    help = 'Fix drift in the running review rating aggregates on user profiles and products.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--summaries', action='store_true',
+            help='Also drop review summary rows so they are rebuilt on next read.'
+        )
+
+    def handle(self, *args, **options):
+        totals = {
+            row['reviewee']: row
+            for row in rating_aggregates(Review.objects.all(), 'reviewee')
+        }
+        
+        fields = ['seller_rating', 'total_reviews', 'rating_sum'] + [f'rating_{stars}_count' for stars in RATINGS]
+        drifted = []
+        for profile in UserProfile.objects.only('id', 'user_id', *fields).iterator(chunk_size=options['batch_size']):
+            row = totals.get(profile.user_id, {})
+            count = row.get('review_count', 0)
+            expected = {
+                'total_reviews': count,
+                'rating_sum': row.get('rating_total') or 0,
+                'seller_rating': round((row.get('rating_total') or 0) / count, 2) if count else 0,
+                **{f'rating_{stars}_count': row.get(f'rating_{stars}', 0) for stars in RATINGS}
+            }
+            if any(float(getattr(profile, name)) != float(value) for name, value in expected.items()):
+                for name, value in expected.items():
+                    setattr(profile, name, value)
+                drifted.append(profile)
+        
+        UserProfile.objects.bulk_update(drifted, fields, batch_size=options['batch_size'])
+        if drifted:
+            bump_cache_version(*[f'user:{profile.user_id}' for profile in drifted])
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} profiles reconciled.'))
+        
+        product_totals = {
+            row['product']: row
+            for row in rating_aggregates(Review.objects.all(), 'product')
+        }
+        product_fields = ['review_count', 'review_rating_sum', 'average_rating']
+        drifted_products = []
+        for product in Product.all_objects.only('id', *product_fields).iterator(chunk_size=options['batch_size']):
+            row = product_totals.get(product.id, {})
+            count, total = row.get('review_count', 0), row.get('rating_total') or 0
+            expected = {
+                'review_count': count,
+                'review_rating_sum': total,
+                'average_rating': round(total / count, 2) if count else 0,
+            }
+            if any(float(getattr(product, name)) != float(value) for name, value in expected.items()):
+                for name, value in expected.items():
+                    setattr(product, name, value)
+                drifted_products.append(product)
+        
+        Product.all_objects.bulk_update(drifted_products, product_fields, batch_size=options['batch_size'])
+        if drifted_products:
+            bump_cache_version(*[f'product:{product.id}' for product in drifted_products])
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted_products)} products reconciled.'))
+        
+        # Helpfulness scores mirror helpful_score() in apps.reviews.models
+        rescored = Review.objects.update(helpful_score=(
+            Log(10, F('helpful_count') + 1) +
+            Cast(Extract('created_at', 'epoch'), FloatField()) / float(HELPFUL_SCORE_DECAY_SECONDS)
+        ))
+        self.stdout.write(self.style.SUCCESS(f'{rescored} review scores recomputed.'))
+        
+        if options['summaries']:
+            deleted, _ = ReviewSummary.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'{deleted} review summaries queued for rebuild.'))
\ No newline at end of file
@@ -1,17 +1,30 @@
 """
 Review models for Evolution Digital Market.
 """
-from django.db import models
+from django.db import connection, models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
-from apps.core.models import TimeStampedModel
+from django.utils import timezone
+from apps.core.models import TimeStampedModel, TrackedFieldsMixin
 from apps.products.models import Product
+import math
 import uuid
 
 User = get_user_model()
 
+# Seconds of recency worth a tenfold increase in helpful votes (30 days)
+HELPFUL_SCORE_DECAY_SECONDS = 30 * 24 * 60 * 60
 
-class Review(TimeStampedModel):
+
+def helpful_score(helpful_count, created_at):
+    """
+    Log-scaled helpful votes plus a recency term fixed at creation time, so
+    the score only changes when a vote lands.
+    """
+    return math.log10(helpful_count + 1) + created_at.timestamp() / HELPFUL_SCORE_DECAY_SECONDS
+
+
+class Review(TrackedFieldsMixin, TimeStampedModel):
     """
     Product and seller reviews.
     """
@@ -54,6 +67,7 @@ class Review(TimeStampedModel):
     
     # Engagement
     helpful_count = models.PositiveIntegerField(default=0)
+    helpful_score = models.FloatField(default=0)
     
     class Meta:
         db_table = 'reviews'
@@ -63,11 +77,31 @@ class Review(TimeStampedModel):
             models.Index(fields=['reviewee', 'rating']),
             models.Index(fields=['product', 'rating']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['product', '-helpful_score'], name='reviews_product_helpful_idx'),
+            models.Index(fields=['-helpful_score'], name='reviews_helpful_idx'),
         ]
 
+    VOTE_AGGREGATE_FIELDS = {'helpful_count', 'helpful_score'}
+
     def __str__(self):
         return f"Review by {self.reviewer.email} for {self.product.title}"
 
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            # Helpful votes are only written with atomic statements
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.VOTE_AGGREGATE_FIELDS
+            ]
+        self.helpful_score = helpful_score(self.helpful_count, self.created_at or timezone.now())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'helpful_count' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'helpful_score'}
+        # Commit the summary deltas applied by post_save with the row, so a
+        # summary built concurrently never sees the review without its delta
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     @property
     def average_detailed_rating(self):
         """Calculate average of detailed ratings."""
@@ -96,6 +130,57 @@ class ReviewImage(TimeStampedModel):
         return f"Image for review {self.review.id}"
 
 
+class ReviewHelpfulManager(models.Manager):
+    """
+    Helpful votes written together with the review's helpful_count and
+    helpful_score in a single statement, so concurrent and retried votes
+    stay consistent. The score expression mirrors helpful_score().
+    """
+
+    def _execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def add_vote(self, user_id, review_id):
+        """
+        Record a vote and increment the count. Returns the new count, or None
+        if the user had already voted.
+        """
+        return self._execute(f"""
+            WITH inserted AS (
+                INSERT INTO {self.model._meta.db_table} (id, user_id, review_id, created_at, updated_at)
+                VALUES (%s, %s, %s, NOW(), NOW())
+                ON CONFLICT (user_id, review_id) DO NOTHING
+                RETURNING review_id
+            )
+            UPDATE {Review._meta.db_table} SET
+                helpful_count = helpful_count + 1,
+                helpful_score = LOG(helpful_count + 2) + EXTRACT(EPOCH FROM created_at) / %s
+            WHERE id IN (SELECT review_id FROM inserted)
+            RETURNING helpful_count
+        """, [uuid.uuid4(), user_id, review_id, HELPFUL_SCORE_DECAY_SECONDS])
+
+    def remove_vote(self, user_id, review_id):
+        """
+        Delete a vote and decrement the count. Returns the new count, or None
+        if there was no vote.
+        """
+        return self._execute(f"""
+            WITH deleted AS (
+                DELETE FROM {self.model._meta.db_table}
+                WHERE user_id = %s AND review_id = %s
+                RETURNING review_id
+            )
+            UPDATE {Review._meta.db_table} SET
+                helpful_count = GREATEST(helpful_count - 1, 0),
+                helpful_score = LOG(GREATEST(helpful_count - 1, 0) + 1) + EXTRACT(EPOCH FROM created_at) / %s
+            WHERE id IN (SELECT review_id FROM deleted)
+            RETURNING helpful_count
+        """, [user_id, review_id, HELPFUL_SCORE_DECAY_SECONDS])
+
+
 class ReviewHelpful(TimeStampedModel):
     """
     Track users who found reviews helpful.
@@ -104,6 +189,8 @@ class ReviewHelpful(TimeStampedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='helpful_votes')
 
+    objects = ReviewHelpfulManager()
+
     class Meta:
         db_table = 'review_helpful'
         unique_together = ['user', 'review']
@@ -127,6 +214,11 @@ class ReviewResponse(TimeStampedModel):
     def __str__(self):
         return f"Response to review {self.review.id}"
 
+    def save(self, *args, **kwargs):
+        # Committed with its summary deltas, like Review.save
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class ReviewReport(TimeStampedModel):
     """
@@ -161,4 +253,75 @@ class ReviewReport(TimeStampedModel):
         unique_together = ['review', 'reporter']
 
     def __str__(self):
-        return f"Report for review {self.review.id} by {self.reporter.email}"
\ No newline at end of file
+        return f"Report for review {self.review.id} by {self.reporter.email}"
+
+
+class ReviewSummary(models.Model):
+    """
+    Running review statistics for one product or one reviewed user,
+    maintained incrementally from review and response writes.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, null=True, blank=True, related_name='review_summary'
+    )
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name='review_summary'
+    )
+    
+    review_count = models.IntegerField(default=0)
+    verified_count = models.IntegerField(default=0)
+    response_count = models.IntegerField(default=0)
+    
+    # Overall rating sum and histogram
+    rating_sum = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+    
+    # Detailed ratings are optional, so each keeps its own count
+    communication_sum = models.IntegerField(default=0)
+    communication_count = models.IntegerField(default=0)
+    delivery_sum = models.IntegerField(default=0)
+    delivery_count = models.IntegerField(default=0)
+    description_sum = models.IntegerField(default=0)
+    description_count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'review_summaries'
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(product__isnull=False, user__isnull=True) | models.Q(product__isnull=True, user__isnull=False),
+                name='review_summary_single_target'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Review summary for {self.product or self.user}"
+
+    @staticmethod
+    def _average(total, count):
+        return round(total / count, 2) if count else 0
+
+    @property
+    def average_rating(self):
+        return self._average(self.rating_sum, self.review_count)
+
+    @property
+    def communication_avg(self):
+        return self._average(self.communication_sum, self.communication_count)
+
+    @property
+    def delivery_avg(self):
+        return self._average(self.delivery_sum, self.delivery_count)
+
+    @property
+    def description_avg(self):
+        return self._average(self.description_sum, self.description_count)
+
+    @property
+    def rating_distribution(self):
+        return {str(stars): getattr(self, f'rating_{stars}_count') for stars in range(1, 6)}
@@ -3,8 +3,10 @@ Serializers for reviews.
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 from .models import Review, ReviewImage, ReviewHelpful, ReviewResponse, ReviewReport
 from apps.accounts.serializers import PublicUserSerializer
+from apps.products.models import Product, ProductImage
 from apps.products.serializers import ProductListSerializer
 
 User = get_user_model()
@@ -53,6 +55,8 @@ class ReviewSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_helpful(self, obj):
+        if 'helpful_review_ids' in self.context:
+            return obj.id in self.context['helpful_review_ids']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return ReviewHelpful.objects.filter(
@@ -71,6 +75,78 @@ class ReviewSerializer(serializers.ModelSerializer):
         return False
 
 
+class ReviewerCardSerializer(serializers.ModelSerializer):
+    """
+    Minimal public identity shown next to a review.
+    """
+    full_name = serializers.ReadOnlyField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'full_name', 'avatar', 'is_verified']
+
+
+class ReviewProductStubSerializer(serializers.ModelSerializer):
+    """
+    Just enough of the reviewed product to render a link and thumbnail.
+    Expects product images to be prefetched, primary image first.
+    """
+    thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ['id', 'title', 'slug', 'thumbnail']
+
+    def get_thumbnail(self, obj):
+        images = obj.images.all()
+        if not images:
+            return None
+        field = images[0].thumbnail or images[0].image
+        request = self.context.get('request')
+        return request.build_absolute_uri(field.url) if request else field.url
+
+
+class ReviewListResponseSerializer(serializers.ModelSerializer):
+    """
+    Seller response with a reviewer card instead of a full profile.
+    """
+    responder = ReviewerCardSerializer(read_only=True)
+
+    class Meta:
+        model = ReviewResponse
+        fields = ['id', 'responder', 'response', 'created_at']
+
+
+class ReviewListSerializer(ReviewSerializer):
+    """
+    Compact review representation for lists. All related data comes from
+    the queryset built by with_list_relations(), so a page costs a fixed
+    number of queries.
+    """
+    reviewer = ReviewerCardSerializer(read_only=True)
+    reviewee = serializers.PrimaryKeyRelatedField(read_only=True)
+    product = ReviewProductStubSerializer(read_only=True)
+    response = ReviewListResponseSerializer(read_only=True)
+
+    def get_can_respond(self, obj):
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return obj.reviewee_id == request.user.id and not hasattr(obj, 'response')
+        return False
+
+
+def with_list_relations(queryset):
+    """
+    Load everything ReviewListSerializer reads up front.
+    """
+    return queryset.select_related(
+        'reviewer', 'product', 'response__responder'
+    ).prefetch_related(
+        'images',
+        Prefetch('product__images', queryset=ProductImage.objects.order_by('-is_primary', 'sort_order', 'created_at'))
+    )
+
+
 class ReviewCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating reviews.
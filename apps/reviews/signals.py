@@ -3,43 +3,91 @@ Signals for reviews app.
 """
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Avg
-from .models import Review
+from .aggregates import (
+    SUMMARY_SOURCE_FIELDS, apply_review_change, apply_summary_delta, update_profile_rating
+)
+from .models import Review, ReviewResponse
 
 
 @receiver(post_save, sender=Review)
-def update_user_rating(sender, instance, **kwargs):
+def update_user_rating(sender, instance, created, update_fields=None, **kwargs):
     """
-    Update user's average rating when a review is saved.
+    Apply the review's rating to the reviewee's running aggregates.
     """
-    user = instance.reviewee
-    profile = user.profile
+    if created:
+        update_profile_rating(instance.reviewee_id, added=instance.rating)
+        return
+    if update_fields is not None and not {'rating', 'reviewee'} & set(update_fields):
+        return
+    previous = getattr(instance, '_loaded_values', None)
+    if previous is None or not (instance.field_changed('rating') or instance.field_changed('reviewee_id')):
+        return
     
-    # Calculate new average rating
-    reviews = Review.objects.filter(reviewee=user)
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-    total_reviews = reviews.count()
-    
-    # Update profile
-    profile.seller_rating = round(avg_rating, 2)
-    profile.total_reviews = total_reviews
-    profile.save(update_fields=['seller_rating', 'total_reviews'])
+    if previous['reviewee_id'] != instance.reviewee_id:
+        update_profile_rating(previous['reviewee_id'], removed=previous['rating'])
+        update_profile_rating(instance.reviewee_id, added=instance.rating)
+    else:
+        update_profile_rating(instance.reviewee_id, added=instance.rating, removed=previous['rating'])
 
 
 @receiver(post_delete, sender=Review)
 def update_user_rating_on_delete(sender, instance, **kwargs):
     """
-    Update user's average rating when a review is deleted.
+    Remove the deleted review's rating from the reviewee's aggregates.
     """
-    user = instance.reviewee
-    profile = user.profile
-    
-    # Calculate new average rating
-    reviews = Review.objects.filter(reviewee=user)
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-    total_reviews = reviews.count()
+    update_profile_rating(instance.reviewee_id, removed=instance.rating)
+
+
+def summary_values(instance):
+    return {field: getattr(instance, field) for field in SUMMARY_SOURCE_FIELDS}
+
+
+@receiver(post_save, sender=Review)
+def update_review_summaries(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Apply the review's contribution to its product and user summaries.
+    """
+    if created:
+        apply_review_change(new=summary_values(instance))
+        return
+    if update_fields is not None and not {field.removesuffix('_id') for field in SUMMARY_SOURCE_FIELDS} & set(update_fields):
+        return
     
-    # Update profile
-    profile.seller_rating = round(avg_rating, 2)
-    profile.total_reviews = total_reviews
-    profile.save(update_fields=['seller_rating', 'total_reviews'])
\ No newline at end of file
+    previous = getattr(instance, '_loaded_values', None)
+    if previous is None or not SUMMARY_SOURCE_FIELDS <= previous.keys():
+        return
+    if any(instance.field_changed(field) for field in SUMMARY_SOURCE_FIELDS):
+        old = {field: previous[field] for field in SUMMARY_SOURCE_FIELDS}
+        apply_review_change(old=old, new=summary_values(instance))
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_review_summaries(sender, instance, **kwargs):
+    """
+    Take a deleted review out of its product and user summaries.
+    """
+    apply_review_change(old=summary_values(instance))
+
+
+def apply_response_delta(response, delta):
+    row = Review.objects.filter(id=response.review_id).values_list('product_id', 'reviewee_id').first()
+    if row:
+        apply_summary_delta({'response_count': delta}, product_id=row[0], create=delta > 0)
+        apply_summary_delta({'response_count': delta}, user_id=row[1], create=delta > 0)
+
+
+@receiver(post_save, sender=ReviewResponse)
+def count_review_response(sender, instance, created, **kwargs):
+    """
+    Count a new seller response on the product and user summaries.
+    """
+    if created:
+        apply_response_delta(instance, 1)
+
+
+@receiver(post_delete, sender=ReviewResponse)
+def uncount_review_response(sender, instance, **kwargs):
+    """
+    Remove a deleted seller response from the product and user summaries.
+    """
+    apply_response_delta(instance, -1)
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Tests for reviews.
+"""
+import threading
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.categories.models import Category
+from apps.products.models import Product, ProductImage
+from apps.accounts.models import UserProfile
+from .aggregates import get_or_build_review_summary
+from .models import Review, ReviewHelpful, ReviewImage, ReviewResponse, ReviewSummary
+
+User = get_user_model()
+
+
+class ReviewListQueryBudgetTests(TestCase):
+    """
+    A review list page costs the same number of queries at any page size.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user(
+            email='seller@example.com', username='seller', password='password'
+        )
+        category = Category.objects.create(name='Phones')
+        cls.product = Product.objects.create(
+            title='Used phone',
+            description='Works fine',
+            price='100.00',
+            category=category,
+            condition='used',
+            seller=cls.seller,
+            status='active'
+        )
+        ProductImage.objects.create(product=cls.product, image='products/phone.jpg', is_primary=True)
+
+    def create_reviews(self, count):
+        for index in range(count):
+            reviewer = User.objects.create_user(
+                email=f'buyer{index}@example.com', username=f'buyer{index}'
+            )
+            review = Review.objects.create(
+                reviewer=reviewer,
+                reviewee=self.seller,
+                product=self.product,
+                rating=index % 5 + 1,
+                comment='Great seller'
+            )
+            ReviewImage.objects.create(review=review, image=f'reviews/{index}.jpg')
+            ReviewResponse.objects.create(review=review, responder=self.seller, response='Thanks!')
+
+    def assert_list_queries(self, client, count, num_queries):
+        self.create_reviews(count)
+        with self.assertNumQueries(num_queries):
+            response = client.get(reverse('reviews:review-list'), {
+                'product': str(self.product.id),
+                'page_size': count,
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), count)
+
+    def test_anonymous_list_at_20_reviews(self):
+        # count, reviews with their joins, review images, product images
+        self.assert_list_queries(APIClient(), 20, 4)
+
+    def test_anonymous_list_at_100_reviews(self):
+        self.assert_list_queries(APIClient(), 100, 4)
+
+    def test_authenticated_list_at_20_reviews(self):
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        # plus the batched helpful-vote lookup
+        self.assert_list_queries(client, 20, 5)
+
+    def test_authenticated_list_at_100_reviews(self):
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        self.assert_list_queries(client, 100, 5)
+
+
+class ProfileRatingTests(TestCase):
+    """
+    Profile rating aggregates follow review writes.
+    """
+
+    def setUp(self):
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer')
+        category = Category.objects.create(name='Phones')
+        self.product = Product.objects.create(
+            title='Used phone',
+            description='Works fine',
+            price='100.00',
+            category=category,
+            condition='used',
+            seller=self.seller,
+            status='active'
+        )
+
+    def test_removing_a_review_from_an_unbackfilled_profile_stops_at_zero(self):
+        review = Review.objects.create(
+            reviewer=self.buyer, reviewee=self.seller, product=self.product,
+            rating=4, comment='Good'
+        )
+        # Simulate a profile whose counters were never backfilled
+        UserProfile.objects.filter(user=self.seller).update(
+            total_reviews=0, rating_sum=0, rating_4_count=0, seller_rating=0
+        )
+
+        review.delete()
+
+        profile = UserProfile.objects.get(user=self.seller)
+        self.assertEqual(profile.total_reviews, 0)
+        self.assertEqual(profile.rating_sum, 0)
+        self.assertEqual(profile.rating_4_count, 0)
+        self.assertEqual(profile.seller_rating, 0)
+
+
+class HelpfulVoteTests(TransactionTestCase):
+    """
+    Helpful votes are counted exactly once, under concurrency too, and full
+    saves never write stale counts back.
+    """
+
+    def setUp(self):
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.buyer = User.objects.create_user(email='buyer@example.com', username='buyer')
+        self.voters = [
+            User.objects.create_user(email=f'voter{index}@example.com', username=f'voter{index}')
+            for index in range(2)
+        ]
+        self.product = Product.objects.create(
+            title='Used phone',
+            description='Works fine',
+            price='100.00',
+            category=Category.objects.create(name='Phones'),
+            condition='used',
+            seller=self.seller,
+            status='active'
+        )
+        self.review = Review.objects.create(
+            reviewer=self.buyer, reviewee=self.seller, product=self.product,
+            rating=5, comment='Great'
+        )
+
+    def helpful_count(self):
+        return Review.objects.values_list('helpful_count', flat=True).get(id=self.review.id)
+
+    def test_repeated_vote_counts_once(self):
+        self.assertEqual(ReviewHelpful.objects.add_vote(self.voters[0].id, self.review.id), 1)
+        self.assertIsNone(ReviewHelpful.objects.add_vote(self.voters[0].id, self.review.id))
+        self.assertEqual(self.helpful_count(), 1)
+        self.assertEqual(ReviewHelpful.objects.filter(review=self.review).count(), 1)
+
+    def test_concurrent_votes_both_count(self):
+        barrier = threading.Barrier(len(self.voters))
+        errors = []
+
+        def vote(user_id):
+            try:
+                barrier.wait()
+                ReviewHelpful.objects.add_vote(user_id, self.review.id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote, args=(voter.id,)) for voter in self.voters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.helpful_count(), len(self.voters))
+
+    def test_full_save_keeps_vote_counts(self):
+        stale = Review.objects.get(id=self.review.id)
+        ReviewHelpful.objects.add_vote(self.voters[0].id, self.review.id)
+        score = Review.objects.values_list('helpful_score', flat=True).get(id=self.review.id)
+
+        stale.comment = 'Great, fast shipping'
+        stale.save()
+
+        saved = Review.objects.get(id=self.review.id)
+        self.assertEqual(saved.comment, 'Great, fast shipping')
+        self.assertEqual(saved.helpful_count, 1)
+        self.assertEqual(saved.helpful_score, score)
+
+
+class ReviewSummaryTests(TransactionTestCase):
+    """
+    Summary rows are built once, by the first write or read, and count
+    every review exactly once when writes and builds race.
+    """
+
+    def setUp(self):
+        self.seller = User.objects.create_user(email='seller@example.com', username='seller')
+        self.buyers = [
+            User.objects.create_user(email=f'buyer{index}@example.com', username=f'buyer{index}')
+            for index in range(4)
+        ]
+        self.product = Product.objects.create(
+            title='Used phone',
+            description='Works fine',
+            price='100.00',
+            category=Category.objects.create(name='Phones'),
+            condition='used',
+            seller=self.seller,
+            status='active'
+        )
+
+    def review(self, buyer, rating):
+        return Review.objects.create(
+            reviewer=buyer, reviewee=self.seller, product=self.product,
+            rating=rating, comment='Fine'
+        )
+
+    def test_first_write_builds_the_summary(self):
+        self.review(self.buyers[0], 4)
+        self.review(self.buyers[1], 2)
+
+        summary = ReviewSummary.objects.get(product=self.product)
+        self.assertEqual((summary.review_count, summary.rating_sum), (2, 6))
+        summary = ReviewSummary.objects.get(user=self.seller)
+        self.assertEqual((summary.review_count, summary.rating_sum), (2, 6))
+
+    def test_concurrent_writes_and_builds_count_each_review_once(self):
+        barrier = threading.Barrier(len(self.buyers) + 1)
+        errors = []
+
+        def run(action):
+            try:
+                barrier.wait()
+                action()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        actions = [lambda buyer=buyer: self.review(buyer, 5) for buyer in self.buyers]
+        actions.append(lambda: get_or_build_review_summary(product_id=self.product.id))
+        threads = [threading.Thread(target=run, args=(action,)) for action in actions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        summary = ReviewSummary.objects.get(product=self.product)
+        self.assertEqual(summary.review_count, len(self.buyers))
+        self.assertEqual(summary.rating_5_count, len(self.buyers))
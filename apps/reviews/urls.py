@@ -20,5 +20,6 @@ urlpatterns = [
     
     # Statistics
     path('product/<uuid:product_id>/stats/', views.product_review_stats, name='product-review-stats'),
+    path('product/<uuid:product_id>/top/', views.TopReviewsView.as_view(), name='product-top-reviews'),
     path('user/<uuid:user_id>/stats/', views.user_review_stats, name='user-review-stats'),
 ]
\ No newline at end of file
@@ -6,33 +6,49 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, Count
-from .models import Review, ReviewHelpful, ReviewResponse, ReviewReport
+from django.db import IntegrityError, transaction
+from .models import Review, ReviewHelpful, ReviewResponse, ReviewReport, ReviewSummary
+from .aggregates import get_or_build_review_summary
 from .serializers import (
-    ReviewSerializer, ReviewCreateSerializer, ReviewResponseCreateSerializer,
-    ReviewReportSerializer
+    ReviewSerializer, ReviewListSerializer, ReviewCreateSerializer,
+    ReviewResponseCreateSerializer, ReviewReportSerializer, with_list_relations
 )
 from apps.products.models import Product
-from apps.core.pagination import CustomPageNumberPagination
+from apps.core.pagination import CustomPageNumberPagination, HelpfulReviewCursorPagination
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class ReviewListView(generics.ListAPIView):
+class HelpfulStateMixin:
+    """
+    Resolve the requesting user's helpful votes for every serialized review
+    in one query and pass them to the serializer.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if args and self.request.user.is_authenticated:
+            reviews = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['helpful_review_ids'] = set(ReviewHelpful.objects.filter(
+                user=self.request.user,
+                review_id__in=[review.id for review in reviews]
+            ).values_list('review_id', flat=True))
+        return super().get_serializer(*args, **kwargs)
+
+
+class ReviewListView(HelpfulStateMixin, generics.ListAPIView):
     """
     List reviews with filtering options.
     """
-    serializer_class = ReviewSerializer
+    serializer_class = ReviewListSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['review_type', 'rating', 'is_verified', 'is_featured']
     pagination_class = CustomPageNumberPagination
 
     def get_queryset(self):
-        queryset = Review.objects.select_related(
-            'reviewer', 'reviewee', 'product'
-        ).prefetch_related('images', 'response')
+        queryset = with_list_relations(Review.objects.all())
         
         # Filter by product
         product_id = self.request.query_params.get('product')
@@ -44,9 +60,24 @@ class ReviewListView(generics.ListAPIView):
         if user_id:
             queryset = queryset.filter(reviewee_id=user_id)
         
+        if self.request.query_params.get('sort') == 'helpful':
+            return queryset.order_by('-helpful_score', '-created_at')
         return queryset.order_by('-created_at')
 
 
+class TopReviewsView(HelpfulStateMixin, generics.ListAPIView):
+    """
+    A product's most helpful reviews, cursor-paginated over the indexed
+    helpfulness score.
+    """
+    serializer_class = ReviewListSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = HelpfulReviewCursorPagination
+
+    def get_queryset(self):
+        return with_list_relations(Review.objects.filter(product_id=self.kwargs['product_id']))
+
+
 class ReviewCreateView(generics.CreateAPIView):
     """
     Create a new review.
@@ -67,7 +98,7 @@ class ReviewCreateView(generics.CreateAPIView):
         )
 
 
-class ReviewDetailView(generics.RetrieveAPIView):
+class ReviewDetailView(HelpfulStateMixin, generics.RetrieveAPIView):
     """
     Retrieve a specific review.
     """
@@ -78,11 +109,11 @@ class ReviewDetailView(generics.RetrieveAPIView):
     ).prefetch_related('images', 'response')
 
 
-class MyReviewsView(generics.ListAPIView):
+class MyReviewsView(HelpfulStateMixin, generics.ListAPIView):
     """
     List current user's reviews (given and received).
     """
-    serializer_class = ReviewSerializer
+    serializer_class = ReviewListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -90,43 +121,50 @@ class MyReviewsView(generics.ListAPIView):
         review_type = self.request.query_params.get('type', 'given')
         
         if review_type == 'received':
-            return Review.objects.filter(reviewee=user).select_related(
-                'reviewer', 'product'
-            ).prefetch_related('images', 'response')
+            return with_list_relations(Review.objects.filter(reviewee=user))
         else:
-            return Review.objects.filter(reviewer=user).select_related(
-                'reviewee', 'product'
-            ).prefetch_related('images', 'response')
+            return with_list_relations(Review.objects.filter(reviewer=user))
 
 
 class ReviewHelpfulView(APIView):
     """
     Mark a review as helpful or remove helpful mark.
+
+    Send {"helpful": true|false} to set the state idempotently; without it
+    the current state is toggled.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, review_id):
+        helpful = request.data.get('helpful')
+        if isinstance(helpful, str):
+            helpful = helpful.lower() in ('true', '1')
+        
         try:
-            review = Review.objects.get(id=review_id)
-            helpful, created = ReviewHelpful.objects.get_or_create(
-                user=request.user,
-                review=review
-            )
-            
-            if created:
-                # Increment helpful count
-                review.helpful_count += 1
-                review.save(update_fields=['helpful_count'])
-                return Response({'message': 'Marked as helpful', 'helpful': True})
-            else:
-                # Remove helpful mark
-                helpful.delete()
-                review.helpful_count = max(0, review.helpful_count - 1)
-                review.save(update_fields=['helpful_count'])
-                return Response({'message': 'Removed helpful mark', 'helpful': False})
-                
-        except Review.DoesNotExist:
+            with transaction.atomic():
+                if helpful is None:
+                    helpful_count = ReviewHelpful.objects.remove_vote(request.user.id, review_id)
+                    helpful = helpful_count is None
+                    if helpful:
+                        helpful_count = ReviewHelpful.objects.add_vote(request.user.id, review_id)
+                elif helpful:
+                    helpful_count = ReviewHelpful.objects.add_vote(request.user.id, review_id)
+                else:
+                    helpful_count = ReviewHelpful.objects.remove_vote(request.user.id, review_id)
+        except IntegrityError:
             return Response({'error': 'Review not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if helpful_count is None:
+            # Nothing changed: the vote was already in the requested state
+            helpful_count = Review.objects.filter(id=review_id).values_list('helpful_count', flat=True).first()
+            if helpful_count is None:
+                return Response({'error': 'Review not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'message': 'Marked as helpful' if helpful else 'Removed helpful mark',
+            'helpful': helpful,
+            'helpful_count': helpful_count,
+        })
 
 
 class ReviewResponseView(generics.CreateAPIView):
@@ -209,37 +247,21 @@ def product_review_stats(request, product_id):
     """
     Get review statistics for a product.
     """
-    try:
-        product = Product.objects.get(id=product_id)
-        reviews = Review.objects.filter(product=product)
-        
-        stats = {
-            'total_reviews': reviews.count(),
-            'average_rating': reviews.aggregate(Avg('rating'))['rating__avg'] or 0,
-            'rating_distribution': {},
-            'verified_reviews': reviews.filter(is_verified=True).count(),
-        }
-        
-        # Rating distribution
-        for i in range(1, 6):
-            stats['rating_distribution'][str(i)] = reviews.filter(rating=i).count()
-        
-        # Detailed ratings averages
-        stats['communication_avg'] = reviews.aggregate(
-            Avg('communication_rating')
-        )['communication_rating__avg'] or 0
-        
-        stats['delivery_avg'] = reviews.aggregate(
-            Avg('delivery_rating')
-        )['delivery_rating__avg'] or 0
-        
-        stats['description_avg'] = reviews.aggregate(
-            Avg('item_description_rating')
-        )['item_description_rating__avg'] or 0
-        
-        return Response(stats)
-    except Product.DoesNotExist:
-        return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    summary = ReviewSummary.objects.filter(product_id=product_id).first()
+    if summary is None:
+        if not Product.objects.filter(id=product_id).exists():
+            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+        summary, created = get_or_build_review_summary(product_id=product_id)
+    
+    return Response({
+        'total_reviews': summary.review_count,
+        'average_rating': summary.average_rating,
+        'rating_distribution': summary.rating_distribution,
+        'verified_reviews': summary.verified_count,
+        'communication_avg': summary.communication_avg,
+        'delivery_avg': summary.delivery_avg,
+        'description_avg': summary.description_avg,
+    })
 
 
 @api_view(['GET'])
@@ -248,31 +270,21 @@ def user_review_stats(request, user_id):
     """
     Get review statistics for a user (seller).
     """
-    try:
+    summary = ReviewSummary.objects.filter(user_id=user_id).first()
+    if summary is None:
         from django.contrib.auth import get_user_model
-        User = get_user_model()
-        user = User.objects.get(id=user_id)
-        
-        reviews = Review.objects.filter(reviewee=user)
-        
-        stats = {
-            'total_reviews': reviews.count(),
-            'average_rating': reviews.aggregate(Avg('rating'))['rating__avg'] or 0,
-            'rating_distribution': {},
-            'verified_reviews': reviews.filter(is_verified=True).count(),
-            'response_rate': 0,
-        }
-        
-        # Rating distribution
-        for i in range(1, 6):
-            stats['rating_distribution'][str(i)] = reviews.filter(rating=i).count()
-        
-        # Response rate
-        total_reviews = reviews.count()
-        if total_reviews > 0:
-            responded_reviews = reviews.filter(response__isnull=False).count()
-            stats['response_rate'] = (responded_reviews / total_reviews) * 100
-        
-        return Response(stats)
-    except User.DoesNotExist:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        if not get_user_model().objects.filter(id=user_id).exists():
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        summary, created = get_or_build_review_summary(user_id=user_id)
+    
+    response_rate = 0
+    if summary.review_count > 0:
+        response_rate = (summary.response_count / summary.review_count) * 100
+    
+    return Response({
+        'total_reviews': summary.review_count,
+        'average_rating': summary.average_rating,
+        'rating_distribution': summary.rating_distribution,
+        'verified_reviews': summary.verified_count,
+        'response_rate': response_rate,
+    })
\ No newline at end of file
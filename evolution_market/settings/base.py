@@ -265,6 +265,9 @@ DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='noreply@evolutionmarket.
 # Resend API configuration
 RESEND_API_KEY = env('RESEND_API_KEY', default='')
 
+# Frontend base URL for links in emails and notifications
+FRONTEND_URL = env('FRONTEND_URL', default='http://localhost:5173')
+
 # Celery Configuration
 CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://127.0.0.1:6379/0')
 CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default='redis://127.0.0.1:6379/0')
@@ -272,12 +275,56 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Listing quantile sketches can't drop old prices; rebuild them nightly
+    'rebuild-market-stats': {
+        'task': 'apps.products.tasks.rebuild_market_stats',
+        'schedule': 60 * 60 * 24,
+    },
+    'cleanup-expired-uploads': {
+        'task': 'apps.core.tasks.cleanup_expired_uploads',
+        'schedule': 60 * 60,
+    },
+}
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 FILE_UPLOAD_PERMISSIONS = 0o644
 
+# Images whose perceptual hashes differ by at most this many bits flag their
+# listings as likely duplicates; stored files are only reused on an exact
+# match (must stay below the 4 hash bands used for lookups)
+IMAGE_HASH_MAX_DISTANCE = 3
+
+# Direct-to-storage uploads (the local backend streams into default storage)
+DIRECT_UPLOAD_BACKEND = env('DIRECT_UPLOAD_BACKEND', default='apps.core.uploads.LocalUploadBackend')
+DIRECT_UPLOAD_MAX_SIZE = 25 * 1024 * 1024  # 25MB
+DIRECT_UPLOAD_EXPIRY_SECONDS = 60 * 60
+
+# Near-duplicate listing detection (estimated Jaccard similarity of title + description)
+LISTING_DUPLICATE_THRESHOLD = 0.8
+BLOCK_DUPLICATE_LISTINGS = env.bool('BLOCK_DUPLICATE_LISTINGS', default=False)
+
+# Price-drop alerts are fanned out to wishlisters and saved searches in chunks
+PRICE_DROP_FANOUT_CHUNK_SIZE = 500
+
+# Accuracy of the KLL quantile sketches behind per-category price guidance
+MARKET_SKETCH_K = 200
+
+# A conversation's last-message columns are written at most once per window
+CHAT_LAST_MESSAGE_WINDOW_SECONDS = 2
+
+# Messages sent over WebSockets are inserted in batches of up to this size,
+# at least this often
+CHAT_WRITE_BATCH_SIZE = 100
+CHAT_WRITE_BATCH_SECONDS = 0.05
+
+# Typing indicators are broadcast at most this often per user and
+# conversation, and expire when the client stops refreshing them
+CHAT_TYPING_MIN_INTERVAL_MS = 1000
+CHAT_TYPING_TIMEOUT_SECONDS = 5
+
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
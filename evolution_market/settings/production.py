@@ -46,6 +46,7 @@ if env.bool('USE_CLOUDINARY', default=True):
     }
     
     DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+    DIRECT_UPLOAD_BACKEND = 'apps.core.uploads.CloudinaryUploadBackend'
 
 # Email backend with Resend
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
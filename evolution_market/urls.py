@@ -29,6 +29,7 @@ urlpatterns = [
         path('chat/', include('apps.chat.urls')),
         path('analytics/', include('apps.analytics.urls')),
         path('support/', include('apps.support.urls')),
+        path('uploads/', include('apps.core.urls')),
     ])),
     
     # Django allauth